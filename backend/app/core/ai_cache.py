@@ -0,0 +1,83 @@
+"""
+Two-tier cache for AI responses: in-process LRU in front of MongoDB.
+"""
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from bson import Binary
+from .config import settings
+from .database import get_database
+from ..utils.cache import LRUCache
+
+# Responses shorter than this are stored as plain text; compression would not pay off
+COMPRESS_MIN_CHARS = 256
+
+
+def _encode_response(response: str) -> Dict[str, Any]:
+    if len(response) < COMPRESS_MIN_CHARS:
+        return {"response": response, "encoding": "text"}
+    return {"response": Binary(zlib.compress(response.encode("utf-8"))), "encoding": "zlib"}
+
+
+def _decode_response(doc: Dict[str, Any]) -> str:
+    if doc.get("encoding") == "zlib":
+        return zlib.decompress(doc["response"]).decode("utf-8")
+    return doc["response"]
+
+
+class AIResponseCache:
+    """Cached AI responses keyed by request hash.
+    
+    Documents live in the `ai_cache` collection (`_id` = key, expired by a TTL
+    index on `expires_at`, long responses zlib-compressed). A process-local LRU
+    serves repeat prompts without a database round trip.
+    """
+    
+    def __init__(self):
+        self.memory = LRUCache(maxsize=settings.ai_cache_memory_size, ttl_seconds=settings.cache_ttl_seconds)
+        self.db_hits = 0
+        self.db_misses = 0
+    
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached response from memory, then MongoDB."""
+        response = self.memory.get(key)
+        if response is not None:
+            return response
+        
+        now = datetime.utcnow()
+        doc = await get_database().ai_cache.find_one({"_id": key, "expires_at": {"$gt": now}})
+        if doc is None:
+            self.db_misses += 1
+            return None
+        
+        self.db_hits += 1
+        response = _decode_response(doc)
+        self.memory.set(key, response, ttl_seconds=(doc["expires_at"] - now).total_seconds())
+        return response
+    
+    async def set(self, key: str, response: str):
+        """Store a response in both tiers."""
+        self.memory.set(key, response)
+        now = datetime.utcnow()
+        await get_database().ai_cache.update_one(
+            {"_id": key},
+            {
+                "$set": {
+                    **_encode_response(response),
+                    "expires_at": now + timedelta(seconds=settings.cache_ttl_seconds),
+                    "created_at": now
+                }
+            },
+            upsert=True
+        )
+    
+    def stats(self) -> Dict[str, Any]:
+        """Memory-tier counters plus database hits and misses."""
+        memory = self.memory.stats()
+        lookups = memory["hits"] + memory["misses"]
+        return {
+            "memory": memory,
+            "db_hits": self.db_hits,
+            "db_misses": self.db_misses,
+            "hit_rate": (memory["hits"] + self.db_hits) / lookups if lookups else 0.0
+        }
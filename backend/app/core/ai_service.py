@@ -3,111 +3,196 @@ AI service with PDF knowledge integration.
 """
 import os
 import json
+import time
+import asyncio
 import hashlib
+import logging
+import functools
+import threading
 from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
-import openai
-from sentence_transformers import SentenceTransformer
-import PyPDF2
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from .ai_cache import AIResponseCache
 from .config import settings
-from .database import get_database
+from .knowledge_index import KnowledgeIndex, scan_signature
+from .llm_client import LLMClient
+from .pdf_ingest import check_chunking, extract_pdf_chunks
+from .semantic_cache import SemanticCache
+from .vector_search import IVFIndex, exact_search, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_DIR = os.path.join(os.path.dirname(__file__), "../../../ai_knowledge")
 
 
 class AIService:
-    """AI service with PDF knowledge base."""
+    """AI service with PDF knowledge base.
+    
+    Construction is cheap: the async OpenAI client, the embedding model (torch) and
+    the PDF knowledge base are only loaded on first use, or ahead of time by
+    `warm_up` running in the background after startup. `ready` tells whether
+    the knowledge base is loaded.
+    
+    The knowledge base is held as one (chunks, embeddings, ann_index) snapshot
+    so `watch_knowledge_dir` can swap in a refreshed index while queries run.
+    """
     
     def __init__(self):
-        self.client = openai.OpenAI(api_key=settings.openai_api_key)
-        self.embeddings_model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.knowledge_base = []
-        self.embeddings = None
-        self._load_knowledge_base()
+        self._client = None
+        self.embeddings_model = None
+        self._knowledge = ([], None, None)
+        self.index = None
+        self.response_cache = AIResponseCache()
+        self.semantic_cache: Optional[SemanticCache] = None
+        self.ready = False
+        self._load_lock = threading.Lock()
     
-    def _load_knowledge_base(self):
-        """Load and process PDF knowledge base."""
-        pdf_dir = os.path.join(os.path.dirname(__file__), "../../../ai_knowledge")
-        
-        if not os.path.exists(pdf_dir):
-            return
-        
-        for filename in os.listdir(pdf_dir):
-            if filename.endswith('.pdf'):
-                pdf_path = os.path.join(pdf_dir, filename)
-                text_chunks = self._extract_pdf_text(pdf_path)
-                self.knowledge_base.extend(text_chunks)
-        
-        if self.knowledge_base:
-            self.embeddings = self.embeddings_model.encode(self.knowledge_base)
+    @property
+    def knowledge_base(self) -> List[Dict[str, Any]]:
+        return self._knowledge[0]
     
-    def _extract_pdf_text(self, pdf_path: str) -> List[str]:
-        """Extract text chunks from PDF."""
-        chunks = []
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        return self._knowledge[1]
+    
+    @property
+    def client(self) -> LLMClient:
+        """Shared async OpenAI client, created on first use."""
+        if self._client is None:
+            self._client = LLMClient(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url,
+                max_connections=settings.openai_max_connections,
+                max_concurrency=settings.openai_max_concurrency,
+                timeout=settings.openai_timeout_seconds,
+                deadline=settings.openai_deadline_seconds,
+                max_retries=settings.openai_max_retries,
+                backoff_base=settings.openai_backoff_base_seconds
+            )
+        return self._client
+    
+    async def close(self):
+        """Release the OpenAI connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def load(self):
+        """Load the embedding model and the knowledge base (blocking, runs once)."""
+        with self._load_lock:
+            if self.ready:
+                return
+            
+            from sentence_transformers import SentenceTransformer
+            self.embeddings_model = SentenceTransformer(settings.ai_embedding_model)
+            self.semantic_cache = SemanticCache(
+                self.embeddings_model.get_sentence_embedding_dimension(),
+                capacity=settings.ai_semantic_cache_size,
+                threshold=settings.ai_semantic_cache_threshold,
+                ttl_seconds=settings.cache_ttl_seconds
+            )
+            self._load_knowledge_base()
+            self.ready = True
+    
+    async def ensure_ready(self):
+        """Load in a worker thread on first use so the event loop keeps serving."""
+        if not self.ready:
+            await asyncio.to_thread(self.load)
+    
+    async def warm_up(self):
+        """Load everything ahead of the first AI request."""
+        started = time.perf_counter()
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-                
-                # Split into chunks of ~500 words
-                words = text.split()
-                chunk_size = 500
-                for i in range(0, len(words), chunk_size):
-                    chunk = " ".join(words[i:i + chunk_size])
-                    if len(chunk.strip()) > 100:  # Only keep substantial chunks
-                        chunks.append(chunk.strip())
+            await self.ensure_ready()
         except Exception as e:
-            print(f"Error processing PDF {pdf_path}: {e}")
+            logger.error("AI warm-up failed: %s", e)
+            return
+        logger.info(
+            "AI service ready: %s knowledge chunks in %.1fs",
+            len(self.knowledge_base), time.perf_counter() - started
+        )
+    
+    def refresh_knowledge(self) -> bool:
+        """Re-sync the knowledge base with the PDF directory; True if it changed."""
+        with self._load_lock:
+            if not self.ready:
+                return False
+            return self._load_knowledge_base()
+    
+    async def watch_knowledge_dir(self):
+        """Poll the PDF directory and index added, changed or removed PDFs incrementally."""
+        signature = scan_signature(KNOWLEDGE_DIR)
+        while True:
+            await asyncio.sleep(settings.ai_knowledge_poll_seconds)
+            current = scan_signature(KNOWLEDGE_DIR)
+            # Keep the old signature until the model is loaded so early edits are not missed
+            if current == signature or not self.ready:
+                continue
+            try:
+                if await asyncio.to_thread(self.refresh_knowledge):
+                    logger.info("Knowledge base refreshed: %s chunks", len(self.knowledge_base))
+                signature = current
+            except Exception as e:
+                logger.error("Knowledge base refresh failed: %s", e)
+    
+    def _load_knowledge_base(self) -> bool:
+        """Load the PDF knowledge base from the on-disk index, refreshing changed PDFs."""
+        if self.index is None:
+            self.index = KnowledgeIndex(settings.ai_index_dir, settings.ai_embedding_model)
+        check_chunking(settings.ai_chunk_words, settings.ai_chunk_overlap_words)
+        extract = functools.partial(
+            extract_pdf_chunks,
+            chunk_words=settings.ai_chunk_words,
+            overlap_words=settings.ai_chunk_overlap_words
+        )
+        changed = self.index.sync(KNOWLEDGE_DIR, extract, self._encode, workers=settings.ai_ingest_workers)
+        if not changed and self.ready:
+            return False
         
-        return chunks
+        chunks, embeddings = self.index.chunks, self.index.embeddings
+        ann_index = None
+        # Large knowledge bases get an approximate index; small ones are searched exactly
+        if embeddings is not None and len(embeddings) >= settings.ai_ann_min_chunks:
+            n_lists = settings.ai_ann_lists or int(np.sqrt(len(embeddings)))
+            ann_index = IVFIndex(n_lists, n_probe=settings.ai_ann_probes).train(embeddings)
+        self._knowledge = (chunks, embeddings, ann_index)
+        return True
     
-    def _get_relevant_context(self, query: str, top_k: int = 3) -> str:
-        """Get relevant context from knowledge base."""
-        if not self.knowledge_base or self.embeddings is None:
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as an L2-normalized float32 matrix."""
+        return normalize_rows(self.embeddings_model.encode(texts, convert_to_numpy=True))
+    
+    def _get_relevant_context(self, query_embedding: np.ndarray, top_k: int = 3) -> str:
+        """Get relevant context from knowledge base for an encoded query."""
+        chunks, embeddings, ann_index = self._knowledge
+        if not chunks or embeddings is None:
             return ""
         
-        query_embedding = self.embeddings_model.encode([query])
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        # Embeddings are stored normalized, so cosine similarity is one matrix-vector product
+        if ann_index is not None:
+            indices, scores = ann_index.search(embeddings, query_embedding, top_k)
+        else:
+            indices, scores = exact_search(embeddings, query_embedding, top_k)
         
-        relevant_chunks = [self.knowledge_base[i] for i in top_indices if similarities[i] > 0.3]
+        relevant_chunks = [chunks[i]["text"] for i, score in zip(indices, scores) if score > 0.3]
         return "\n\n".join(relevant_chunks)
     
     async def _get_cached_response(self, cache_key: str) -> Optional[str]:
         """Get cached AI response."""
         if not settings.ai_cache_enabled:
             return None
-        
-        db = get_database()
-        cached = await db.ai_cache.find_one({"key": cache_key})
-        
-        if cached and cached["expires_at"] > datetime.utcnow():
-            return cached["response"]
-        
-        return None
+        return await self.response_cache.get(cache_key)
     
     async def _cache_response(self, cache_key: str, response: str):
         """Cache AI response."""
-        if not settings.ai_cache_enabled:
-            return
-        
-        db = get_database()
-        expires_at = datetime.utcnow() + timedelta(seconds=settings.cache_ttl_seconds)
-        
-        await db.ai_cache.update_one(
-            {"key": cache_key},
-            {
-                "$set": {
-                    "key": cache_key,
-                    "response": response,
-                    "expires_at": expires_at,
-                    "created_at": datetime.utcnow()
-                }
-            },
-            upsert=True
-        )
+        if settings.ai_cache_enabled:
+            await self.response_cache.set(cache_key, response)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Counters of the exact and semantic response caches."""
+        return {
+            "exact": self.response_cache.stats(),
+            "semantic": self.semantic_cache.stats() if self.semantic_cache is not None else None
+        }
     
     def _create_cache_key(self, prompt: str, context: str = "") -> str:
         """Create cache key for AI request."""
@@ -123,8 +208,20 @@ class AIService:
         if cached_response:
             return cached_response
         
+        # Encode the request once (loads the model on first use; encoding runs off the loop)
+        await self.ensure_ready()
+        prompt_embedding, context_embedding = await asyncio.to_thread(self._encode, [prompt, context])
+        
+        # Near-duplicate requests (e.g. the same template with slightly different figures) reuse an answer
+        use_semantic_cache = settings.ai_cache_enabled and settings.ai_semantic_cache_enabled
+        if use_semantic_cache:
+            match = self.semantic_cache.lookup(prompt_embedding, context_embedding)
+            if match is not None:
+                await self._cache_response(cache_key, match[0])
+                return match[0]
+        
         # Get relevant knowledge
-        relevant_context = self._get_relevant_context(prompt)
+        relevant_context = await asyncio.to_thread(self._get_relevant_context, prompt_embedding)
         
         # Construct system message
         system_message = """Eres un experto en experiencia del cliente y gestión de relaciones comerciales. 
@@ -138,20 +235,20 @@ class AIService:
             system_message += f"\n\nDatos del sistema:\n{context}"
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
+            ai_response = await self.client.complete(
+                [
                     {"role": "system", "content": system_message},
                     {"role": "user", "content": prompt}
                 ],
+                model=settings.openai_model,
                 max_tokens=settings.ai_max_tokens,
                 temperature=settings.ai_temperature
             )
             
-            ai_response = response.choices[0].message.content
-            
             # Cache the response
             await self._cache_response(cache_key, ai_response)
+            if use_semantic_cache:
+                self.semantic_cache.add(prompt_embedding, context_embedding, ai_response)
             
             return ai_response
             
@@ -207,17 +304,20 @@ class AIService:
         
         return await self._make_ai_request(prompt, context)
     
-    async def get_restock_plan(self, product_data: List[Dict[str, Any]], sales_data: List[Dict[str, Any]]) -> str:
-        """Get monthly restock plan suggestions."""
+    async def get_restock_plan(self, plan_summary: List[Dict[str, Any]]) -> str:
+        """Get monthly restock plan suggestions.
+        
+        `plan_summary` is the compact output of `ForecastService.summarize`; the
+        quantities are already computed, the model only explains and prioritizes.
+        """
         context = f"""
-        Productos en stock: {json.dumps(product_data, default=str)}
-        Datos de ventas: {json.dumps(sales_data, default=str)}
+        Productos que requieren reposición (pronóstico de demanda): {json.dumps(plan_summary, default=str)}
         """
         
         prompt = """
-        Basándote en los niveles de stock actuales y los patrones de venta,
-        ¿qué plan de reposición mensual recomendarías? Incluye cantidades específicas
-        y prioridades para cada producto.
+        Basándote en el pronóstico de demanda y las cantidades de reposición calculadas,
+        ¿qué prioridades y consideraciones recomendarías para el plan de reposición mensual?
+        Sé breve y concreto.
         """
         
         return await self._make_ai_request(prompt, context)
@@ -237,6 +337,13 @@ class AIService:
         return await self._make_ai_request(prompt, context)
 
 
-# Global AI service instance
-ai_service = AIService()
+_ai_service: Optional[AIService] = None
+
+
+def get_ai_service() -> AIService:
+    """Return the process-wide AI service, creating it (cheaply) on first use."""
+    global _ai_service
+    if _ai_service is None:
+        _ai_service = AIService()
+    return _ai_service
 
@@ -19,6 +19,14 @@ class Settings(BaseSettings):
     
     # OpenAI
     openai_api_key: str = ""
+    openai_base_url: str = ""  # empty = api.openai.com; e.g. http://127.0.0.1:8001/v1 for the local stub
+    openai_model: str = "gpt-3.5-turbo"
+    openai_max_connections: int = 20
+    openai_max_concurrency: int = 8  # in-flight completions; further requests wait for a slot
+    openai_timeout_seconds: float = 30  # per attempt
+    openai_deadline_seconds: float = 60  # per call, including queueing and retries
+    openai_max_retries: int = 2
+    openai_backoff_base_seconds: float = 0.5
     
     # Rate Limiting
     rate_limit_requests_per_minute: int = 60
@@ -28,6 +36,50 @@ class Settings(BaseSettings):
     cache_ttl_seconds: int = 300
     redis_url: str = "redis://localhost:6379"
     
+    # Streaming responses
+    stream_batch_size: int = 500
+    export_batch_size: int = 10000
+    export_watermark_lag_seconds: float = 5  # recent writes wait for the next incremental pull
+    
+    # Idempotency keys
+    idempotency_ttl_seconds: int = 86400
+    idempotency_cache_size: int = 1024
+    idempotency_lock_seconds: int = 30  # lease of a running request, renewed while it runs; retries take over after it
+    
+    # Uploads
+    uploads_dir: str = "uploads"
+    max_upload_bytes: int = 5 * 1024 * 1024
+    image_variant_sizes: List[int] = [128, 512]
+    image_url_size: int = 128  # variant that Product.imagen_url points at
+    image_workers: int = 2
+    
+    # Demand forecasting
+    forecast_history_days: int = 90
+    forecast_alpha: float = 0.3
+    forecast_lead_time_days: int = 7
+    forecast_review_days: int = 30
+    forecast_service_level_z: float = 1.65  # ~95% service level
+    
+    # Sales rollup days are business-local dates; rebuild the rollup after changing this
+    business_timezone: str = "UTC"
+    
+    # Dashboard cache
+    dashboard_cache_ttl_seconds: float = 5
+    dashboard_cache_stale_seconds: float = 30  # served while a background refresh runs
+    
+    # Dashboard live updates (Server-Sent Events)
+    dashboard_stream_debounce_seconds: float = 0.5
+    dashboard_stream_keepalive_seconds: float = 15
+    dashboard_stream_queue_size: int = 100
+    
+    # Materialized alerts
+    alerts_debounce_seconds: float = 0.5
+    alerts_refresh_minutes: int = 15
+    
+    # Stock ledger
+    stock_ledger_retention_days: int = 90
+    stock_ledger_compaction_hours: int = 24
+    
     # Application
     debug: bool = False
     cors_origins: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
@@ -36,6 +88,21 @@ class Settings(BaseSettings):
     ai_max_tokens: int = 500
     ai_temperature: float = 0.7
     ai_cache_enabled: bool = True
+    ai_cache_memory_size: int = 512  # responses kept in process in front of MongoDB
+    ai_semantic_cache_enabled: bool = True  # reuse answers of near-duplicate requests
+    ai_semantic_cache_threshold: float = 0.95  # min cosine similarity of both prompt and context
+    ai_semantic_cache_size: int = 1024
+    ai_embedding_model: str = "all-MiniLM-L6-v2"
+    ai_index_dir: str = "ai_index"  # persisted chunk embeddings, shared by workers
+    ai_chunk_words: int = 500
+    ai_chunk_overlap_words: int = 50  # words shared by consecutive chunks
+    ai_ingest_workers: int = 2  # processes extracting new PDFs in parallel
+    ai_knowledge_watch: bool = False  # poll the PDF directory and update the index incrementally
+    ai_knowledge_poll_seconds: int = 10
+    ai_ann_min_chunks: int = 100000  # use the approximate (IVF) index from this many chunks
+    ai_ann_lists: int = 0  # IVF lists; 0 = sqrt(chunks)
+    ai_ann_probes: int = 8
+    ai_warmup_on_startup: bool = False  # load the model in the background after startup
     
     class Config:
         env_file = ".env"
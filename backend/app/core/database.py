@@ -33,15 +33,41 @@ class DatabaseManager:
         # Clients collection indexes
         await self.database.clients.create_index("correo_electronico", unique=True)
         await self.database.clients.create_index("churn_score")
+        await self.database.clients.create_index("fecha_registro")
+        # Exports sort on updated_at and filter the date range from the same index keys
+        await self.database.clients.create_index([("updated_at", 1), ("fecha_registro", 1)])
         
         # Purchases collection indexes
         await self.database.purchases.create_index("cliente_id")
         await self.database.purchases.create_index("fecha")
         await self.database.purchases.create_index("producto_comprado")
+        await self.database.purchases.create_index("product_id")
+        await self.database.purchases.create_index([("updated_at", 1), ("fecha", 1)])
         
         # Products collection indexes
         await self.database.products.create_index("nombre_producto", unique=True)
         await self.database.products.create_index("stock_actual")
+        await self.database.products.create_index("fecha_creacion")
+        await self.database.products.create_index([("updated_at", 1), ("fecha_creacion", 1)])
+        
+        # Sales rollup indexes
+        await self.database.sales_daily.create_index([("day", 1), ("product", 1)], unique=True)
+        
+        # Stock ledger indexes
+        await self.database.stock_movements.create_index([("product_id", 1), ("seq", -1)])
+        await self.database.stock_movements.create_index("at")
+        await self.database.stock_snapshots.create_index([("product_id", 1), ("day", 1)], unique=True)
+        await self.database.stock_snapshots.create_index([("product_id", 1), ("last_seq", -1)])
+        
+        # Materialized alerts
+        await self.database.alerts.create_index([("order", 1), ("_id", 1)])
+        await self.database.alerts.create_index("rule")
+        
+        # Idempotency keys expire on their own
+        await self.database.idempotency_keys.create_index("expires_at", expireAfterSeconds=0)
+        
+        # Cached AI responses expire on their own
+        await self.database.ai_cache.create_index("expires_at", expireAfterSeconds=0)
 
 
 # Global database manager instance
@@ -0,0 +1,190 @@
+"""
+Persistent on-disk embedding index for the AI knowledge base.
+"""
+import os
+import json
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Bump when chunking or the stored embedding layout changes; old entries are ignored
+# (v2: embeddings are stored L2-normalized; v3: overlapping chunks with page metadata)
+INDEX_FORMAT = 3
+
+# Chunk dicts carry at least "text"; extractors must be picklable for the process pool
+Extractor = Callable[[str], List[Dict[str, Any]]]
+Encoder = Callable[[List[str]], np.ndarray]
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hex SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan_signature(pdf_dir: str) -> Dict[str, Tuple[int, int]]:
+    """Cheap change detection: filename -> (size, mtime) for every PDF in `pdf_dir`."""
+    if not os.path.isdir(pdf_dir):
+        return {}
+    signature = {}
+    for entry in os.scandir(pdf_dir):
+        if entry.name.endswith(".pdf") and entry.is_file():
+            stat = entry.stat()
+            signature[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return signature
+
+
+def _atomic_write(path: str, write: Callable[[Any], None], mode: str = "wb"):
+    """Write through a temporary file and rename, so readers never see partial files."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, mode) as file:
+        write(file)
+    os.replace(tmp_path, path)
+
+
+class KnowledgeIndex:
+    """
+    Chunk texts and float32 embeddings for a directory of PDFs, stored on disk.
+    
+    Layout under `<index_dir>/<model>/v<INDEX_FORMAT>/`:
+    
+    - `files/<sha256>.npy` / `files/<sha256>.json`: embeddings and chunks of one PDF,
+      keyed by its content hash, so unchanged PDFs are never re-extracted or re-encoded
+    - `embeddings.npy` / `chunks.json`: the combined index (chunks tagged with their
+      source file), memory-mapped at load so every worker shares the same page-cached matrix
+    - `manifest.json`: model, source file hashes and chunk count (written last)
+    """
+    
+    def __init__(self, index_dir: str, model_name: str):
+        self.model_name = model_name
+        self.root = os.path.join(index_dir, model_name.replace("/", "__"), f"v{INDEX_FORMAT}")
+        self.files_dir = os.path.join(self.root, "files")
+        self.chunks: List[Dict[str, Any]] = []
+        self.embeddings: Optional[np.ndarray] = None
+    
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, "manifest.json")
+    
+    def sync(self, pdf_dir: str, extract: Extractor, encode: Encoder, workers: int = 1) -> bool:
+        """
+        Bring the index in line with the PDFs in `pdf_dir` and load it.
+        
+        Only new or changed PDFs are extracted (in a pool of `workers` processes)
+        and encoded; chunks of unchanged or removed PDFs are reused or dropped.
+        Returns True if the combined index had to be rewritten.
+        """
+        sources = self._scan(pdf_dir)
+        manifest = self._read_manifest()
+        if (
+            manifest is not None
+            and manifest.get("model") == self.model_name
+            and manifest.get("sources") == sources
+        ):
+            self._load()
+            return False
+        
+        os.makedirs(self.files_dir, exist_ok=True)
+        missing = {
+            filename: sha256 for filename, sha256 in sources.items()
+            if not self._has_entry(sha256)
+        }
+        if missing:
+            self._ingest(pdf_dir, missing, extract, encode, workers)
+        
+        chunks: List[Dict[str, Any]] = []
+        matrices: List[np.ndarray] = []
+        for filename, sha256 in sorted(sources.items()):
+            file_chunks, file_embeddings = self._read_entry(sha256)
+            chunks.extend({**chunk, "source": filename} for chunk in file_chunks)
+            if len(file_chunks):
+                matrices.append(file_embeddings)
+        
+        embeddings = np.concatenate(matrices).astype(np.float32) if matrices else np.zeros((0, 0), np.float32)
+        _atomic_write(os.path.join(self.root, "embeddings.npy"), lambda f: np.save(f, embeddings))
+        _atomic_write(os.path.join(self.root, "chunks.json"), lambda f: json.dump(chunks, f), mode="w")
+        _atomic_write(
+            self.manifest_path,
+            lambda f: json.dump({
+                "model": self.model_name,
+                "format": INDEX_FORMAT,
+                "sources": sources,
+                "chunks": len(chunks)
+            }, f, indent=2),
+            mode="w"
+        )
+        logger.info(
+            "Rebuilt knowledge index: %s files (%s ingested), %s chunks",
+            len(sources), len(missing), len(chunks)
+        )
+        
+        self._load()
+        return True
+    
+    def _scan(self, pdf_dir: str) -> Dict[str, str]:
+        """Filename -> content hash for every PDF in `pdf_dir`."""
+        if not os.path.isdir(pdf_dir):
+            return {}
+        return {
+            filename: file_sha256(os.path.join(pdf_dir, filename))
+            for filename in os.listdir(pdf_dir)
+            if filename.endswith(".pdf")
+        }
+    
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+    
+    def _entry_paths(self, sha256: str) -> Tuple[str, str]:
+        return (
+            os.path.join(self.files_dir, f"{sha256}.npy"),
+            os.path.join(self.files_dir, f"{sha256}.json")
+        )
+    
+    def _has_entry(self, sha256: str) -> bool:
+        return all(os.path.exists(path) for path in self._entry_paths(sha256))
+    
+    def _read_entry(self, sha256: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        npy_path, json_path = self._entry_paths(sha256)
+        with open(json_path) as file:
+            return json.load(file), np.load(npy_path, mmap_mode="r")
+    
+    def _ingest(self, pdf_dir: str, files: Dict[str, str], extract: Extractor, encode: Encoder, workers: int):
+        """Extract `files` in parallel, encode all their chunks in one batch and store per-file entries."""
+        paths = [os.path.join(pdf_dir, filename) for filename in files]
+        if workers > 1 and len(paths) > 1:
+            # Spawned workers do not inherit the server's threads, locks or loaded model
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(paths)), mp_context=context) as pool:
+                extracted = list(pool.map(extract, paths))
+        else:
+            extracted = [extract(path) for path in paths]
+        
+        texts = [chunk["text"] for file_chunks in extracted for chunk in file_chunks]
+        embeddings = np.asarray(encode(texts), dtype=np.float32) if texts else np.zeros((0, 0), np.float32)
+        
+        offset = 0
+        for sha256, file_chunks in zip(files.values(), extracted):
+            file_embeddings = embeddings[offset:offset + len(file_chunks)] if file_chunks else np.zeros((0, 0), np.float32)
+            offset += len(file_chunks)
+            npy_path, json_path = self._entry_paths(sha256)
+            _atomic_write(npy_path, lambda f: np.save(f, file_embeddings))
+            _atomic_write(json_path, lambda f: json.dump(file_chunks, f), mode="w")
+    
+    def _load(self):
+        """Memory-map the combined index."""
+        with open(os.path.join(self.root, "chunks.json")) as file:
+            self.chunks = json.load(file)
+        embeddings = np.load(os.path.join(self.root, "embeddings.npy"), mmap_mode="r")
+        self.embeddings = embeddings if len(self.chunks) else None
@@ -0,0 +1,101 @@
+"""
+Async OpenAI chat client with a pooled transport, deadlines and retries.
+"""
+import asyncio
+import logging
+import random
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    """Timeouts, connection errors, rate limits and 5xx responses are worth retrying."""
+    import openai
+    
+    return isinstance(exc, (
+        TimeoutError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError
+    ))
+
+
+class LLMClient:
+    """
+    Chat-completions client shared by every AI request.
+    
+    All calls go through one `AsyncOpenAI` client over a single pooled httpx
+    transport. At most `max_concurrency` requests are in flight; each attempt
+    gets `timeout` seconds and the whole call, including waiting for a slot and
+    retries with full-jitter exponential backoff, must finish within `deadline`.
+    """
+    
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "",
+        max_connections: int = 20,
+        max_concurrency: int = 8,
+        timeout: float = 30,
+        deadline: float = 60,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8
+    ):
+        import httpx
+        import openai
+        
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5))
+        )
+        # Retries are handled here so they share the call deadline and the concurrency cap
+        self._client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url or None,
+            http_client=self._http,
+            max_retries=0
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+    
+    async def complete(self, messages: List[Dict[str, str]], model: str, **params: Any) -> str:
+        """Return the first completion for `messages`; raises once retries or the deadline run out."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        self.stats["requests"] += 1
+        
+        attempt = 0
+        while True:
+            remaining = deadline - loop.time()
+            try:
+                async with asyncio.timeout(remaining):
+                    async with self._semaphore:
+                        response = await self._client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            timeout=min(self.timeout, remaining),
+                            **params
+                        )
+                return response.choices[0].message.content
+            except Exception as e:
+                attempt += 1
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if not _is_retryable(e) or attempt > self.max_retries or loop.time() + delay >= deadline:
+                    self.stats["failures"] += 1
+                    raise
+                
+                self.stats["retries"] += 1
+                logger.warning("AI request attempt %s failed (%s), retrying in %.2fs", attempt, e, delay)
+                await asyncio.sleep(delay)
+    
+    async def aclose(self):
+        """Close the pooled connections."""
+        await self._http.aclose()
@@ -0,0 +1,61 @@
+"""
+PDF text extraction and overlap-aware chunking for the AI knowledge base.
+"""
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Chunks shorter than this (in characters) carry too little context to be useful
+MIN_CHUNK_CHARS = 100
+
+
+def check_chunking(chunk_words: int, overlap_words: int):
+    """Reject window settings that would not advance through the text."""
+    if chunk_words <= 0:
+        raise ValueError("chunk_words must be positive")
+    if not 0 <= overlap_words < chunk_words:
+        raise ValueError("overlap_words must be at least 0 and smaller than chunk_words")
+
+
+def chunk_pages(pages: List[str], chunk_words: int = 500, overlap_words: int = 50) -> List[Dict[str, Any]]:
+    """
+    Split page texts into word windows of `chunk_words`, consecutive windows
+    sharing `overlap_words` words.
+    
+    Each chunk records the (1-based) pages it starts and ends on. Words are
+    collected once and each chunk is built with a single join.
+    Raises ValueError unless 0 <= `overlap_words` < `chunk_words`.
+    """
+    check_chunking(chunk_words, overlap_words)
+    
+    words: List[str] = []
+    word_pages: List[int] = []
+    for page_number, text in enumerate(pages, start=1):
+        page_words = (text or "").split()
+        words.extend(page_words)
+        word_pages.extend([page_number] * len(page_words))
+    
+    step = chunk_words - overlap_words
+    chunks = []
+    for start in range(0, len(words), step):
+        end = min(start + chunk_words, len(words))
+        text = " ".join(words[start:end])
+        if len(text) > MIN_CHUNK_CHARS:
+            chunks.append({"text": text, "page": word_pages[start], "page_end": word_pages[end - 1]})
+        if end == len(words):
+            break
+    return chunks
+
+
+def extract_pdf_chunks(pdf_path: str, chunk_words: int = 500, overlap_words: int = 50) -> List[Dict[str, Any]]:
+    """Extract and chunk one PDF (module-level so it can run in a process pool)."""
+    import PyPDF2
+    
+    try:
+        with open(pdf_path, "rb") as file:
+            pages = [page.extract_text() for page in PyPDF2.PdfReader(file).pages]
+    except Exception as e:
+        logger.error("Error processing PDF %s: %s", pdf_path, e)
+        return []
+    return chunk_pages(pages, chunk_words, overlap_words)
@@ -0,0 +1,70 @@
+"""
+Embedding-similarity cache for near-duplicate AI requests.
+"""
+import time
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Fixed-capacity in-memory vector index of answered (prompt, context) pairs.
+    
+    Entries are stored as L2-normalized prompt and context embeddings in
+    preallocated matrices. A lookup scores every slot with two matrix-vector
+    products and reuses the best answer whose prompt *and* context similarity
+    both reach `threshold`. When full, the least recently used slot is replaced;
+    entries older than `ttl_seconds` are ignored and reused first.
+    """
+    
+    def __init__(self, dim: int, capacity: int = 1024, threshold: float = 0.95, ttl_seconds: float = 300):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.prompts = np.zeros((capacity, dim), dtype=np.float32)
+        self.contexts = np.zeros((capacity, dim), dtype=np.float32)
+        self.expires_at = np.full(capacity, -np.inf)
+        self.last_used = np.full(capacity, -np.inf)
+        self.responses = [None] * capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def lookup(self, prompt: np.ndarray, context: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Return `(response, similarity)` of the closest live entry above the threshold."""
+        now = time.monotonic()
+        scores = np.minimum(self.prompts @ prompt, self.contexts @ context)
+        scores[self.expires_at <= now] = -np.inf
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        self.last_used[best] = now
+        return self.responses[best], float(scores[best])
+    
+    def add(self, prompt: np.ndarray, context: np.ndarray, response: str):
+        """Store an answer, replacing an expired or the least recently used slot."""
+        now = time.monotonic()
+        expired = self.expires_at <= now
+        slot = int(np.argmax(expired)) if expired.any() else int(np.argmin(self.last_used))
+        if self.responses[slot] is not None and not expired[slot]:
+            self.evictions += 1
+        
+        self.prompts[slot] = prompt
+        self.contexts[slot] = context
+        self.responses[slot] = response
+        self.expires_at[slot] = now + self.ttl_seconds
+        self.last_used[slot] = now
+    
+    def stats(self) -> Dict[str, float]:
+        """Size, threshold and hit/miss/eviction counters."""
+        return {
+            "size": int((self.expires_at > time.monotonic()).sum()),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
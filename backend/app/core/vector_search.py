@@ -0,0 +1,92 @@
+"""
+Top-k cosine retrieval over pre-normalized embedding matrices.
+"""
+from typing import Optional, Tuple
+import numpy as np
+
+# Rows scored per matrix product when assigning a large matrix to centroids
+ASSIGN_BATCH_ROWS = 65536
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows as float32 so cosine similarity is a dot product (zero rows stay zero)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` highest scores, best first, in O(n + k log k)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    
+    indices = np.argpartition(-scores, k - 1)[:k]
+    return indices[np.argsort(-scores[indices])]
+
+
+def exact_search(matrix: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Brute-force search: one matrix-vector product over the normalized matrix."""
+    scores = matrix @ query
+    indices = top_k(scores, k)
+    return indices, scores[indices]
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate index in pure NumPy.
+    
+    Rows are clustered with spherical k-means into `n_lists` lists; a query
+    scores the centroids and then only the rows of its `n_probe` nearest lists.
+    Row ids are stored grouped by list, so each list is one contiguous slice.
+    """
+    
+    def __init__(self, n_lists: int, n_probe: int = 8, n_iter: int = 10, seed: int = 0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.ids: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+    
+    def train(self, matrix: np.ndarray, sample_per_list: int = 64) -> "IVFIndex":
+        """Fit centroids on a sample of `matrix` and assign every row to a list."""
+        rng = np.random.default_rng(self.seed)
+        n_rows = len(matrix)
+        self.n_lists = max(1, min(self.n_lists, n_rows))
+        
+        sample_size = min(n_rows, self.n_lists * sample_per_list)
+        sample = np.asarray(matrix[np.sort(rng.choice(n_rows, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, self.n_lists, replace=False)].copy()
+        
+        for _ in range(self.n_iter):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=self.n_lists)
+            nonempty = counts > 0
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+            # Empty lists keep their previous centroid
+            centroids[nonempty] = np.add.reduceat(sample[order], starts, axis=0)
+            centroids = normalize_rows(centroids)
+        
+        self.centroids = centroids
+        assign = np.concatenate([
+            np.argmax(np.asarray(matrix[start:start + ASSIGN_BATCH_ROWS]) @ centroids.T, axis=1)
+            for start in range(0, n_rows, ASSIGN_BATCH_ROWS)
+        ])
+        self.ids = np.argsort(assign, kind="stable")
+        self.offsets = np.searchsorted(assign[self.ids], np.arange(self.n_lists + 1))
+        return self
+    
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k over the rows of the `n_probe` closest lists."""
+        probes = top_k(self.centroids @ query, self.n_probe)
+        # Sorted ids read a memory-mapped matrix front to back
+        candidates = np.sort(np.concatenate([self.ids[self.offsets[p]:self.offsets[p + 1]] for p in probes]))
+        if not len(candidates):
+            return candidates, np.empty(0, dtype=np.float32)
+        
+        scores = matrix[candidates] @ query
+        indices = top_k(scores, k)
+        return candidates[indices], scores[indices]
@@ -6,8 +6,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
+from .core.ai_service import get_ai_service
+from .core.config import settings
+from .services.alert_service import alert_service
+from .services.image_service import image_service
+from .services.stock_ledger_service import stock_ledger_service
+from .utils.background import run_in_background
+
 # Import routers
-from .routers import auth, clients, purchases, stock, dashboard, ai
+from .routers import auth, clients, purchases, stock, dashboard, ai, export, images
 
 # Create FastAPI app
 app = FastAPI(
@@ -25,13 +32,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files for image uploads
-uploads_dir = "uploads"
-if not os.path.exists(uploads_dir):
-    os.makedirs(uploads_dir)
-
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
-
 # Include routers
 app.include_router(auth.router)
 app.include_router(clients.router)
@@ -39,6 +39,48 @@ app.include_router(purchases.router)
 app.include_router(stock.router)
 app.include_router(dashboard.router)
 app.include_router(ai.router)
+app.include_router(export.router)
+app.include_router(images.router)
+
+# Mount static files for legacy image uploads (content-addressed images are
+# served by the images router above, which must be registered first)
+uploads_dir = settings.uploads_dir
+if not os.path.exists(uploads_dir):
+    os.makedirs(uploads_dir)
+
+app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+
+@app.on_event("startup")
+async def start_stock_ledger_compaction():
+    """Periodically fold old stock movements into daily snapshots."""
+    run_in_background(stock_ledger_service.run_compaction_loop(), name="stock_ledger_compaction")
+
+@app.on_event("startup")
+async def start_alert_refresh():
+    """Evaluate alert rules at startup and whenever their time windows move."""
+    run_in_background(alert_service.run_refresh_loop(), name="alert_refresh")
+
+@app.on_event("startup")
+async def warm_up_ai_service():
+    """Optionally load the embedding model and knowledge base off the request path."""
+    if settings.ai_warmup_on_startup:
+        run_in_background(get_ai_service().warm_up(), name="ai_warmup")
+
+@app.on_event("startup")
+async def watch_ai_knowledge():
+    """Optionally index PDFs added to or changed in the knowledge directory while running."""
+    if settings.ai_knowledge_watch:
+        run_in_background(get_ai_service().watch_knowledge_dir(), name="ai_knowledge_watch")
+
+@app.on_event("shutdown")
+async def shutdown_image_workers():
+    """Stop the thumbnailing process pool."""
+    image_service.shutdown()
+
+@app.on_event("shutdown")
+async def close_ai_client():
+    """Close pooled OpenAI connections."""
+    await get_ai_service().close()
 
 @app.get("/")
 async def root():
@@ -52,5 +94,5 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {"status": "healthy", "ai_ready": get_ai_service().ready}
 
@@ -0,0 +1,30 @@
+"""
+Demand forecast models.
+"""
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class ProductForecast(BaseModel):
+    """Demand forecast and reorder recommendation for one product."""
+    product_id: str
+    nombre_producto: str
+    stock_actual: int
+    stock_minimo: int
+    demanda_diaria: float
+    desviacion_diaria: float
+    dias_cobertura: Optional[float] = None  # None when there is no demand
+    punto_reorden: int
+    cantidad_reorden: int
+    requiere_reposicion: bool
+
+
+class RestockPlan(BaseModel):
+    """Restock plan for every product."""
+    generated_at: datetime
+    history_days: int
+    lead_time_days: int
+    review_days: int
+    products: List[ProductForecast]
+    suggestions: Optional[str] = None
@@ -33,6 +33,7 @@ class Product(ProductBase):
     stock_actual: int = Field(default=0, ge=0)
     stock_minimo: int = Field(default=5, ge=0)
     imagen_url: Optional[str] = None
+    imagen_hash: Optional[str] = None
     fecha_creacion: datetime
     
     class Config:
@@ -12,6 +12,7 @@ class PurchaseBase(BaseModel):
     cliente_id: str = Field(..., min_length=1)
     cantidad: int = Field(..., gt=0)
     fecha: datetime
+    product_id: Optional[str] = None
 
 
 class PurchaseCreate(PurchaseBase):
@@ -26,6 +27,7 @@ class PurchaseUpdate(BaseModel):
     cantidad: Optional[int] = Field(None, gt=0)
     fecha: Optional[datetime] = None
     precio_unitario: Optional[float] = Field(None, gt=0)
+    product_id: Optional[str] = None
 
 
 class Purchase(PurchaseBase):
@@ -0,0 +1,94 @@
+"""
+Stock movement ledger models.
+"""
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+
+MOVEMENT_KINDS = ("initial", "sale", "restock", "adjustment")
+
+
+class StockMovementCreate(BaseModel):
+    """Manual stock movement (restock or adjustment)."""
+    delta: int
+    kind: str = Field(default="adjustment", pattern="^(restock|adjustment)$")
+    reference: Optional[str] = Field(None, max_length=200)
+
+
+class StockMovement(BaseModel):
+    """One append-only ledger entry with the balance it produced."""
+    id: Optional[str] = Field(None, alias="_id")
+    product_id: str
+    seq: int
+    kind: str  # "initial", "sale", "restock", "adjustment"
+    delta: int
+    balance: int
+    reference: Optional[str] = None
+    at: datetime
+    
+    class Config:
+        populate_by_name = True
+
+
+class StockVelocity(BaseModel):
+    """Units moved per kind over a window."""
+    product_id: str
+    days: int
+    unidades_vendidas: int
+    unidades_repuestas: int
+    ajustes: int
+    ventas_diarias: float
+
+
+class StockReconciliation(BaseModel):
+    """Comparison of the product's stock with the ledger balance."""
+    product_id: str
+    stock_actual: int
+    ledger_balance: Optional[int] = None
+    last_seq: int
+    missing_movements: int
+    consistent: bool
+
+
+class StockAdjustmentItem(BaseModel):
+    """One line of a bulk adjustment, identified by product ID or name."""
+    product_id: Optional[str] = None
+    nombre_producto: Optional[str] = None
+    delta: int
+    
+    @model_validator(mode="after")
+    def check_identifier(self):
+        if not self.product_id and not self.nombre_producto:
+            raise ValueError("product_id or nombre_producto is required")
+        return self
+
+
+class StockAdjustmentRequest(BaseModel):
+    """Bulk stock adjustment, e.g. a supplier delivery."""
+    items: List[StockAdjustmentItem] = Field(..., min_length=1, max_length=1000)
+    reference: Optional[str] = Field(None, max_length=200)
+
+
+class StockAdjustmentResult(BaseModel):
+    """New level of one adjusted product."""
+    product_id: str
+    nombre_producto: str
+    delta: int
+    stock_anterior: int
+    stock_actual: int
+    stock_minimo: int
+    transition: Optional[str] = None  # "low_stock", "out_of_stock", "recovered"
+
+
+class StockAdjustmentError(BaseModel):
+    """An adjustment line that could not be applied."""
+    product_id: Optional[str] = None
+    nombre_producto: Optional[str] = None
+    delta: int
+    error: str
+
+
+class StockAdjustmentResponse(BaseModel):
+    """Outcome of a bulk adjustment."""
+    results: List[StockAdjustmentResult]
+    errors: List[StockAdjustmentError]
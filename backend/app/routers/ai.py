@@ -6,11 +6,13 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from ..models.user import User
 from ..core.auth import get_current_active_user
+from ..core.ai_service import get_ai_service
 from ..core.ai_service_mock import mock_ai_service
 from ..services.client_service import client_service
 from ..services.purchase_service import purchase_service
 from ..services.stock_service import stock_service
 from ..services.dashboard_service import dashboard_service
+from ..services.forecast_service import ForecastService, forecast_service
 from ..utils.rate_limiter import check_rate_limit
 
 
@@ -89,13 +91,19 @@ async def get_restock_plan(
     request: Request,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get AI monthly restock plan suggestions."""
+    """Get the monthly restock plan: forecast-driven quantities plus AI commentary."""
     check_rate_limit(request, f"ai_restock_{current_user.username}")
     
-    # Get AI suggestions using mock service
-    suggestions = await mock_ai_service.get_restock_plan()
+    plan = await forecast_service.get_restock_plan()
     
-    return {"suggestions": suggestions}
+    # The model only sees the compact summary; quantities come from the forecast
+    try:
+        suggestions = await get_ai_service().get_restock_plan(ForecastService.summarize(plan))
+    except Exception:
+        # Embedding model or API unavailable: fall back to the mock commentary
+        suggestions = await mock_ai_service.get_restock_plan()
+    
+    return {"suggestions": suggestions, "plan": plan}
 
 
 @router.post("/global-insights")
@@ -111,3 +119,14 @@ async def get_global_insights(
     
     return {"insights": insights}
 
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get AI response cache (exact and semantic) hit/miss/eviction counters."""
+    check_rate_limit(request)
+    
+    return get_ai_service().cache_stats()
@@ -1,12 +1,14 @@
 """
 Client endpoints.
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Request, Response
 from ..models.client import Client, ClientCreate, ClientUpdate, ClientChurnAnalysis
 from ..models.user import User
 from ..core.auth import get_current_active_user
 from ..services.client_service import client_service
+from ..services.idempotency_service import idempotency_service, IdempotencyError
+from ..utils.conditional import conditional_response
 from ..utils.rate_limiter import check_rate_limit
 
 
@@ -17,13 +19,21 @@ router = APIRouter(prefix="/api/clients", tags=["clients"])
 async def create_client(
     request: Request,
     client_data: ClientCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Create a new client."""
+    """Create a new client. Retries with the same `Idempotency-Key` replay the first result."""
     check_rate_limit(request)
     
     try:
-        return await client_service.create_client(client_data)
+        return await idempotency_service.run(
+            f"clients:{current_user.username}",
+            idempotency_key,
+            client_data,
+            lambda: client_service.create_client(client_data)
+        )
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -31,23 +41,31 @@ async def create_client(
 @router.get("/", response_model=List[Client])
 async def get_clients(
     request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get list of clients."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "clients")
+    if not_modified:
+        return not_modified
     return await client_service.get_clients(skip=skip, limit=limit)
 
 
 @router.get("/{client_id}", response_model=Client)
 async def get_client(
     request: Request,
+    response: Response,
     client_id: str,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get client by ID."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "clients")
+    if not_modified:
+        return not_modified
     
     client = await client_service.get_client(client_id)
     if not client:
@@ -96,21 +114,29 @@ async def delete_client(
 @router.get("/analytics/top-loyal", response_model=List[Client])
 async def get_top_loyal_clients(
     request: Request,
+    response: Response,
     limit: int = 5,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get top loyal clients."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "clients")
+    if not_modified:
+        return not_modified
     return await client_service.get_top_loyal_clients(limit=limit)
 
 
 @router.get("/analytics/churn-risk", response_model=List[ClientChurnAnalysis])
 async def get_churn_risk_clients(
     request: Request,
+    response: Response,
     limit: int = 5,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get clients with high churn risk."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "clients")
+    if not_modified:
+        return not_modified
     return await client_service.get_churn_risk_clients(limit=limit)
 
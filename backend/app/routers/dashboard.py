@@ -1,54 +1,134 @@
 """
 Dashboard endpoints.
 """
-from typing import List
-from fastapi import APIRouter, Depends, Request
+import asyncio
+from typing import AsyncIterator, List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from ..models.dashboard import DashboardMetrics, DashboardData, Alert, ChartData
 from ..models.user import User
 from ..core.auth import get_current_active_user
+from ..core.config import settings
+from ..services.alert_service import alert_service
 from ..services.dashboard_service import dashboard_service
+from ..utils.changes import collection_versions
+from ..utils.conditional import check_not_modified, conditional_response
 from ..utils.rate_limiter import check_rate_limit
+from ..utils.streaming import sse_event, sse_response
 
 
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
+# Collections the dashboard metrics are computed from (for ETags)
+METRICS_COLLECTIONS = ("clients", "products", "purchases")
+
 
 @router.get("/metrics", response_model=DashboardMetrics)
 async def get_dashboard_metrics(
     request: Request,
+    response: Response,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get dashboard metrics."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, *METRICS_COLLECTIONS, daily=True)
+    if not_modified:
+        return not_modified
     return await dashboard_service.get_dashboard_metrics()
 
 
 @router.get("/alerts", response_model=List[Alert])
 async def get_alerts(
     request: Request,
+    response: Response,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get system alerts."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "alerts")
+    if not_modified:
+        return not_modified
     return await dashboard_service.get_alerts()
 
 
+@router.post("/alerts/{alert_id}/read")
+async def mark_alert_read(
+    request: Request,
+    alert_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Mark an alert as read."""
+    check_rate_limit(request)
+    
+    success = await alert_service.mark_read(alert_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    
+    return {"message": "Alert marked as read"}
+
+
 @router.get("/sales-chart", response_model=ChartData)
 async def get_sales_chart_data(
     request: Request,
+    response: Response,
+    days: int = 7,
+    granularity: str = "day",
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get sales chart data."""
+    """Get sales chart data (`days`: 7, 30, 90 or 365; `granularity`: day, week or month)."""
     check_rate_limit(request)
-    return await dashboard_service.get_sales_chart_data()
+    not_modified = await conditional_response(request, response, "purchases", daily=True)
+    if not_modified:
+        return not_modified
+    
+    try:
+        return await dashboard_service.get_sales_chart_data(days=days, granularity=granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/", response_model=DashboardData)
 async def get_complete_dashboard_data(
     request: Request,
+    response: Response,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get complete dashboard data."""
+    """Get complete dashboard data (cache state and section timings in `Server-Timing`)."""
     check_rate_limit(request)
-    return await dashboard_service.get_complete_dashboard_data()
+    versions = await collection_versions(*METRICS_COLLECTIONS, "alerts")
+    not_modified = check_not_modified(request, response, versions, daily=True)
+    if not_modified:
+        return not_modified
+    
+    data, timings, state = await dashboard_service.get_cached_dashboard_data(versions)
+    server_timing = [f"cache;desc={state}"]
+    if state in ("miss", "coalesced"):
+        server_timing.extend(f"{name};dur={duration:.1f}" for name, duration in timings.items())
+    response.headers["Server-Timing"] = ", ".join(server_timing)
+    return data
+
 
+
+async def _dashboard_events(request: Request) -> AsyncIterator[str]:
+    """Snapshot first, then deltas as they are published, with keepalive comments."""
+    async with dashboard_service.broadcaster.subscribe() as queue:
+        yield sse_event("snapshot", await dashboard_service.get_live_snapshot())
+        
+        while not await request.is_disconnected():
+            try:
+                event, data = await asyncio.wait_for(
+                    queue.get(), timeout=settings.dashboard_stream_keepalive_seconds
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield sse_event(event, data)
+
+
+@router.get("/stream")
+async def stream_dashboard_updates(
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream metric and alert deltas as Server-Sent Events."""
+    check_rate_limit(request)
+    return sse_response(_dashboard_events(request))
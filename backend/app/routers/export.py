@@ -0,0 +1,50 @@
+"""
+Bulk export endpoints.
+"""
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from ..models.user import User
+from ..core.auth import get_current_active_user
+from ..services.export_service import export_service, MEDIA_TYPES
+from ..utils.rate_limiter import check_rate_limit
+
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+
+@router.get("/{collection}")
+async def export_collection(
+    request: Request,
+    collection: str,
+    format: str = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    since: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream purchases, clients or products as CSV, Parquet or Arrow.
+    
+    `start`/`end` bound the collection's date field; `since` exports only
+    documents written (created or updated) after a previous export's
+    `X-Export-Watermark`. Rows may repeat across pulls; dedupe on `id`.
+    """
+    check_rate_limit(request)
+    
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    try:
+        watermark = await export_service.get_watermark(collection, start, end, since)
+        chunks = export_service.iter_export(
+            collection, format, start=start, end=end, since=since, upper=watermark
+        )
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    headers = {"Content-Disposition": f'attachment; filename="{collection}.{format}"'}
+    if watermark is not None:
+        headers["X-Export-Watermark"] = watermark.isoformat()
+    
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[format], headers=headers)
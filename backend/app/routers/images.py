@@ -0,0 +1,51 @@
+"""
+Content-addressed product image endpoints.
+"""
+import os
+import re
+from fastapi import APIRouter, HTTPException, Request
+from ..core.config import settings
+from ..utils.file_response import cached_file_response
+
+
+router = APIRouter(prefix="/uploads/images", tags=["images"])
+
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+FILENAME_PATTERN = re.compile(r"^(original\.(jpg|jpeg|png|gif|webp)|\d+\.(webp|jpg))$")
+MEDIA_TYPES = {
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp"
+}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@router.api_route("/{prefix}/{content_hash}/{filename}", methods=["GET", "HEAD"])
+async def get_image(request: Request, prefix: str, content_hash: str, filename: str):
+    """Serve an original or size variant.
+    
+    Paths embed the content hash, so responses are cached as immutable. A
+    variant that hasn't been rendered yet falls back to the original with
+    a revalidating cache policy.
+    """
+    if not HASH_PATTERN.match(content_hash) or prefix != content_hash[:2] or not FILENAME_PATTERN.match(filename):
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    directory = os.path.join(settings.uploads_dir, "images", prefix, content_hash)
+    path = os.path.join(directory, filename)
+    cache_control = IMMUTABLE
+    
+    if not os.path.isfile(path):
+        originals = [name for name in os.listdir(directory) if name.startswith("original.")] \
+            if os.path.isdir(directory) else []
+        if filename.startswith("original.") or not originals:
+            raise HTTPException(status_code=404, detail="Image not found")
+        filename = originals[0]
+        path = os.path.join(directory, filename)
+        cache_control = "no-cache"
+    
+    etag = f'"{content_hash}-{filename}"'
+    media_type = MEDIA_TYPES[filename.rsplit(".", 1)[-1]]
+    return cached_file_response(request, path, etag, cache_control, media_type)
@@ -1,13 +1,16 @@
 """
 Purchase endpoints.
 """
-from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Request, Response
 from ..models.purchase import Purchase, PurchaseCreate, PurchaseUpdate, PurchaseWithClient
 from ..models.user import User
 from ..core.auth import get_current_active_user
 from ..services.purchase_service import purchase_service
+from ..services.idempotency_service import idempotency_service, IdempotencyError
+from ..utils.conditional import conditional_response
 from ..utils.rate_limiter import check_rate_limit
+from ..utils.streaming import ndjson_response
 
 
 router = APIRouter(prefix="/api/purchases", tags=["purchases"])
@@ -17,13 +20,21 @@ router = APIRouter(prefix="/api/purchases", tags=["purchases"])
 async def create_purchase(
     request: Request,
     purchase_data: PurchaseCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Create a new purchase."""
+    """Create a new purchase. Retries with the same `Idempotency-Key` replay the first result."""
     check_rate_limit(request)
     
     try:
-        return await purchase_service.create_purchase(purchase_data)
+        return await idempotency_service.run(
+            f"purchases:{current_user.username}",
+            idempotency_key,
+            purchase_data,
+            lambda: purchase_service.create_purchase(purchase_data)
+        )
+    except IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -31,23 +42,31 @@ async def create_purchase(
 @router.get("/", response_model=List[PurchaseWithClient])
 async def get_purchases(
     request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get list of purchases."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "purchases")
+    if not_modified:
+        return not_modified
     return await purchase_service.get_purchases(skip=skip, limit=limit)
 
 
 @router.get("/{purchase_id}", response_model=Purchase)
 async def get_purchase(
     request: Request,
+    response: Response,
     purchase_id: str,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get purchase by ID."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "purchases")
+    if not_modified:
+        return not_modified
     
     purchase = await purchase_service.get_purchase(purchase_id)
     if not purchase:
@@ -65,10 +84,13 @@ async def update_purchase(
     """Update purchase."""
     check_rate_limit(request)
     
-    purchase = await purchase_service.update_purchase(purchase_id, purchase_data)
-    if not purchase:
-        raise HTTPException(status_code=404, detail="Purchase not found")
-    return purchase
+    try:
+        purchase = await purchase_service.update_purchase(purchase_id, purchase_data)
+        if not purchase:
+            raise HTTPException(status_code=404, detail="Purchase not found")
+        return purchase
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.delete("/{purchase_id}")
@@ -93,31 +115,49 @@ async def delete_purchase(
 @router.get("/client/{client_id}", response_model=List[Purchase])
 async def get_purchases_by_client(
     request: Request,
+    response: Response,
     client_id: str,
+    stream: bool = False,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get purchases by client ID."""
+    """Get purchases by client ID. Pass `stream=true` for an NDJSON stream."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "purchases")
+    if not_modified:
+        return not_modified
+    if stream:
+        return ndjson_response(purchase_service.purchases_by_client_cursor(client_id), Purchase)
     return await purchase_service.get_purchases_by_client(client_id)
 
 
 @router.get("/analytics/recent", response_model=List[PurchaseWithClient])
 async def get_recent_purchases(
     request: Request,
+    response: Response,
     days: int = 30,
+    stream: bool = False,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get recent purchases."""
+    """Get recent purchases. Pass `stream=true` for an NDJSON stream."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "purchases", daily=True)
+    if not_modified:
+        return not_modified
+    if stream:
+        return ndjson_response(purchase_service.recent_purchases_cursor(days=days), PurchaseWithClient)
     return await purchase_service.get_recent_purchases(days=days)
 
 
 @router.get("/analytics/sales", response_model=Dict[str, Any])
 async def get_sales_analytics(
     request: Request,
+    response: Response,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get sales analytics."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "purchases", daily=True)
+    if not_modified:
+        return not_modified
     return await purchase_service.get_sales_analytics()
 
@@ -1,15 +1,26 @@
 """
 Stock/Product endpoints.
 """
-import os
-import uuid
 from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, UploadFile, File
 from ..models.product import Product, ProductCreate, ProductUpdate, ProductSalesStats, StockAlert
+from ..models.stock_movement import (
+    StockMovement,
+    StockMovementCreate,
+    StockVelocity,
+    StockReconciliation,
+    StockAdjustmentRequest,
+    StockAdjustmentResponse
+)
 from ..models.user import User
 from ..core.auth import get_current_active_user
+from ..core.config import settings
 from ..services.stock_service import stock_service
+from ..services.stock_ledger_service import stock_ledger_service
+from ..services.image_service import image_service, UploadTooLargeError
+from ..utils.conditional import conditional_response
 from ..utils.rate_limiter import check_rate_limit
+from ..utils.streaming import ndjson_response
 
 
 router = APIRouter(prefix="/api/stock", tags=["stock"])
@@ -33,23 +44,47 @@ async def create_product(
 @router.get("/", response_model=List[Product])
 async def get_products(
     request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get list of products."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "products")
+    if not_modified:
+        return not_modified
     return await stock_service.get_products(skip=skip, limit=limit)
 
 
+@router.post("/adjustments", response_model=StockAdjustmentResponse)
+async def apply_stock_adjustments(
+    request: Request,
+    adjustment_data: StockAdjustmentRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Apply many stock deltas at once (e.g. a supplier delivery).
+    
+    Returns the new level of every product and any low-stock transitions.
+    """
+    check_rate_limit(request)
+    return await stock_ledger_service.apply_adjustments(
+        adjustment_data.items, reference=adjustment_data.reference
+    )
+
+
 @router.get("/{product_id}", response_model=Product)
 async def get_product(
     request: Request,
+    response: Response,
     product_id: str,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get product by ID."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "products")
+    if not_modified:
+        return not_modified
     
     product = await stock_service.get_product(product_id)
     if not product:
@@ -106,68 +141,150 @@ async def upload_product_image(
     check_rate_limit(request)
     
     # Validate file type
-    if not file.content_type.startswith("image/"):
+    if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    # Create uploads directory if it doesn't exist
-    upload_dir = "/tmp/uploads"
-    os.makedirs(upload_dir, exist_ok=True)
+    product = await stock_service.get_product(product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
     
-    # Generate unique filename
-    file_extension = file.filename.split(".")[-1] if "." in file.filename else "jpg"
-    filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = os.path.join(upload_dir, filename)
+    # Stream to disk under the content hash (identical re-uploads are deduplicated)
+    try:
+        stored = await image_service.save_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    # Resized variants are rendered in a worker process after responding (once per image)
+    if not await image_service.variants_exist(stored):
+        image_service.schedule_variants(stored)
     
-    # Update product with image URL
-    product = await stock_service.upload_product_image(product_id, f"/uploads/{filename}")
+    # Point the product at its thumbnail variant
+    image_url = stored.variant_url(settings.image_url_size)
+    product = await stock_service.upload_product_image(product_id, image_url, stored.content_hash)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     return product
 
 
+@router.post("/{product_id}/movements", response_model=StockMovement, status_code=status.HTTP_201_CREATED)
+async def create_stock_movement(
+    request: Request,
+    product_id: str,
+    movement_data: StockMovementCreate,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Record a restock or manual adjustment."""
+    check_rate_limit(request)
+    
+    try:
+        movement = await stock_ledger_service.record(
+            product_id, movement_data.delta, movement_data.kind, reference=movement_data.reference
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not movement:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return movement
+
+
+@router.get("/{product_id}/movements", response_model=List[StockMovement])
+async def get_stock_movements(
+    request: Request,
+    product_id: str,
+    limit: int = 100,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the most recent stock movements for a product."""
+    check_rate_limit(request)
+    return await stock_ledger_service.get_movements(product_id, limit=limit)
+
+
+@router.get("/{product_id}/velocity", response_model=StockVelocity)
+async def get_stock_velocity(
+    request: Request,
+    product_id: str,
+    days: int = 30,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get units sold, restocked and adjusted over the last `days` days."""
+    check_rate_limit(request)
+    return await stock_ledger_service.get_velocity(product_id, days=days)
+
+
+@router.get("/{product_id}/reconcile", response_model=StockReconciliation)
+async def reconcile_stock(
+    request: Request,
+    product_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Compare a product's stock with its ledger."""
+    check_rate_limit(request)
+    
+    reconciliation = await stock_ledger_service.reconcile(product_id)
+    if not reconciliation:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return reconciliation
+
+
 @router.get("/analytics/low-stock", response_model=List[Product])
 async def get_low_stock_products(
     request: Request,
+    response: Response,
+    stream: bool = False,
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get products with low stock."""
+    """Get products with low stock. Pass `stream=true` for an NDJSON stream."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "products")
+    if not_modified:
+        return not_modified
+    if stream:
+        return ndjson_response(stock_service.low_stock_products_cursor(), Product)
     return await stock_service.get_low_stock_products()
 
 
 @router.get("/analytics/alerts", response_model=List[StockAlert])
 async def get_stock_alerts(
     request: Request,
+    response: Response,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get stock alerts."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "products")
+    if not_modified:
+        return not_modified
     return await stock_service.get_stock_alerts()
 
 
 @router.get("/analytics/sales-stats", response_model=List[ProductSalesStats])
 async def get_product_sales_stats(
     request: Request,
+    response: Response,
     limit: int = 10,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get product sales statistics."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "products", "purchases", daily=True)
+    if not_modified:
+        return not_modified
     return await stock_service.get_product_sales_stats(limit=limit)
 
 
 @router.get("/analytics/charts", response_model=Dict[str, Any])
 async def get_stock_chart_data(
     request: Request,
+    response: Response,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get stock chart data."""
     check_rate_limit(request)
+    not_modified = await conditional_response(request, response, "products", "purchases", daily=True)
+    if not_modified:
+        return not_modified
     return await stock_service.get_stock_chart_data()
 
@@ -0,0 +1,238 @@
+"""
+Alert service with business logic.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DeleteMany, UpdateOne
+from ..models.dashboard import Alert
+from ..core.config import settings
+from ..core.database import get_database
+from ..utils.background import run_in_background
+from ..utils.changes import notify_change, on_change
+
+logger = logging.getLogger(__name__)
+
+# Collections each rule reads; a write to one of them re-evaluates the rule
+RULE_COLLECTIONS = {
+    "churn": ("clients",),
+    "stock": ("products",),
+    "sales": ("purchases",),
+    "acquisition": ("clients",)
+}
+
+# Display order of alert types on the dashboard
+ALERT_ORDER = ["churn", "stock", "sales", "general"]
+
+ALERT_CONTENT_FIELDS = ("type", "title", "message", "severity")
+
+
+def _alert(alert_id: str, alert_type: str, title: str, message: str, severity: str) -> Dict[str, Any]:
+    return {
+        "_id": alert_id,
+        "type": alert_type,
+        "title": title,
+        "message": message,
+        "severity": severity,
+        "order": ALERT_ORDER.index(alert_type)
+    }
+
+
+class AlertService:
+    """Materialized alerts with incremental rule evaluation.
+    
+    Alerts live in the `alerts` collection under deterministic IDs
+    (`<rule>:<condition>`). A rule is re-evaluated only after writes to the
+    collections it reads, plus a periodic pass for its time windows; only
+    alerts whose content changed are written, and a changed alert is marked
+    unread again.
+    """
+    
+    def __init__(self, db: AsyncIOMotorDatabase = None):
+        self.db = db if db is not None else get_database()
+        self._rules: Dict[str, Callable[[datetime], Awaitable[List[Dict[str, Any]]]]] = {
+            "churn": self._churn_rule,
+            "stock": self._stock_rule,
+            "sales": self._sales_rule,
+            "acquisition": self._acquisition_rule
+        }
+        self._lock = asyncio.Lock()
+        self._evaluated = False
+        self._pending: Set[str] = set()
+        self._scheduled = False
+        on_change(self._on_write, "purchases", "clients", "products")
+    
+    async def get_alerts(self) -> List[Alert]:
+        """Get the active alerts, evaluating every rule on first use."""
+        if not self._evaluated:
+            await self.evaluate()
+        
+        alerts = await self.db.alerts.find().sort([("order", 1), ("_id", 1)]).to_list(length=None)
+        return [self._to_model(alert) for alert in alerts]
+    
+    async def mark_read(self, alert_id: str) -> bool:
+        """Mark an alert as read."""
+        result = await self.db.alerts.update_one({"_id": alert_id}, {"$set": {"is_read": True}})
+        if result.modified_count:
+            await notify_change("alerts", self.db)
+        return result.matched_count > 0
+    
+    async def evaluate(self, rules: Optional[Iterable[str]] = None) -> int:
+        """Re-run `rules` (all by default) and persist what changed. Returns the number of writes."""
+        rules = list(rules or self._rules)
+        
+        async with self._lock:
+            now = datetime.utcnow()
+            results = await asyncio.gather(*(self._rules[rule](now) for rule in rules))
+            desired = {
+                alert["_id"]: {**alert, "rule": rule}
+                for rule, alerts in zip(rules, results)
+                for alert in alerts
+            }
+            existing = {
+                alert["_id"]: alert
+                async for alert in self.db.alerts.find({"rule": {"$in": rules}})
+            }
+            
+            operations = []
+            for alert_id, alert in desired.items():
+                current = existing.get(alert_id)
+                if current is None:
+                    operations.append(UpdateOne(
+                        {"_id": alert_id},
+                        {
+                            "$set": {**alert, "updated_at": now},
+                            "$setOnInsert": {"created_at": now, "is_read": False}
+                        },
+                        upsert=True
+                    ))
+                elif any(current.get(field) != alert[field] for field in ALERT_CONTENT_FIELDS):
+                    operations.append(UpdateOne(
+                        {"_id": alert_id},
+                        {"$set": {**alert, "updated_at": now, "is_read": False}}
+                    ))
+            
+            resolved = [alert_id for alert_id in existing if alert_id not in desired]
+            if resolved:
+                operations.append(DeleteMany({"_id": {"$in": resolved}}))
+            
+            if operations:
+                await self.db.alerts.bulk_write(operations, ordered=False)
+            if set(rules) == set(self._rules):
+                self._evaluated = True
+        
+        if operations:
+            await notify_change("alerts", self.db)
+        return len(operations)
+    
+    async def run_refresh_loop(self):
+        """Re-evaluate every rule every `alerts_refresh_minutes` minutes (time windows move)."""
+        interval = settings.alerts_refresh_minutes * 60
+        while True:
+            try:
+                await self.evaluate()
+            except Exception as e:
+                logger.error("Alert evaluation failed: %s", e)
+            await asyncio.sleep(interval)
+    
+    def _on_write(self, collection: str):
+        """Queue the rules that read `collection` for one debounced evaluation."""
+        self._pending.update(rule for rule, collections in RULE_COLLECTIONS.items() if collection in collections)
+        if not self._scheduled:
+            self._scheduled = True
+            run_in_background(self._evaluate_pending(), name="alert-evaluation")
+    
+    async def _evaluate_pending(self):
+        await asyncio.sleep(settings.alerts_debounce_seconds)
+        rules, self._pending = self._pending, set()
+        self._scheduled = False
+        await self.evaluate(rules)
+    
+    async def _churn_rule(self, now: datetime) -> List[Dict[str, Any]]:
+        high_churn_count = await self.db.clients.count_documents({"churn_score": {"$gte": 0.7}})
+        if not high_churn_count:
+            return []
+        return [_alert(
+            "churn:high_risk",
+            "churn",
+            "Clientes con alto riesgo de abandono",
+            f"{high_churn_count} clientes tienen alto riesgo de abandono",
+            "high"
+        )]
+    
+    async def _stock_rule(self, now: datetime) -> List[Dict[str, Any]]:
+        # Low stock products, counted server-side instead of loading every document
+        pipeline = [
+            {"$match": {"$expr": {"$lte": ["$stock_actual", "$stock_minimo"]}}},
+            {
+                "$group": {
+                    "_id": None,
+                    "out_of_stock": {"$sum": {"$cond": [{"$lte": ["$stock_actual", 0]}, 1, 0]}},
+                    "low_stock": {"$sum": {"$cond": [{"$gt": ["$stock_actual", 0]}, 1, 0]}}
+                }
+            }
+        ]
+        result = await self.db.products.aggregate(pipeline).to_list(length=1)
+        counts = result[0] if result else {"out_of_stock": 0, "low_stock": 0}
+        
+        alerts = []
+        if counts["out_of_stock"]:
+            alerts.append(_alert(
+                "stock:out_of_stock",
+                "stock",
+                "Productos sin stock",
+                f"{counts['out_of_stock']} productos están sin stock",
+                "critical"
+            ))
+        if counts["low_stock"]:
+            alerts.append(_alert(
+                "stock:low_stock",
+                "stock",
+                "Productos con stock bajo",
+                f"{counts['low_stock']} productos tienen stock bajo",
+                "medium"
+            ))
+        return alerts
+    
+    async def _sales_rule(self, now: datetime) -> List[Dict[str, Any]]:
+        recent_sales = await self.db.purchases.count_documents({"fecha": {"$gte": now - timedelta(days=7)}})
+        if recent_sales >= 5:  # Threshold for low sales
+            return []
+        return [_alert(
+            "sales:low_week",
+            "sales",
+            "Ventas bajas esta semana",
+            f"Solo {recent_sales} ventas en los últimos 7 días",
+            "medium"
+        )]
+    
+    async def _acquisition_rule(self, now: datetime) -> List[Dict[str, Any]]:
+        new_clients = await self.db.clients.count_documents(
+            {"fecha_registro": {"$gte": now - timedelta(days=30)}}, limit=1
+        )
+        if new_clients:
+            return []
+        return [_alert(
+            "general:no_new_clients",
+            "general",
+            "Sin nuevos clientes",
+            "No se han registrado nuevos clientes en el último mes",
+            "medium"
+        )]
+    
+    def _to_model(self, alert: Dict[str, Any]) -> Alert:
+        return Alert(
+            id=alert["_id"],
+            type=alert["type"],
+            title=alert["title"],
+            message=alert["message"],
+            severity=alert["severity"],
+            created_at=alert["created_at"],
+            is_read=alert.get("is_read", False)
+        )
+
+
+# Global service instance
+alert_service = AlertService()
@@ -3,17 +3,19 @@ Client service with business logic.
 """
 import uuid
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from ..models.client import Client, ClientCreate, ClientUpdate, ClientChurnAnalysis
 from ..core.database import get_database
+from ..utils.background import run_in_background
+from ..utils.changes import notify_change
 
 
 class ClientService:
     """Client service for business logic."""
     
     def __init__(self, db: AsyncIOMotorDatabase = None):
-        self.db = db or get_database()
+        self.db = db if db is not None else get_database()
     
     async def create_client(self, client_data: ClientCreate) -> Client:
         """Create a new client."""
@@ -23,7 +25,8 @@ class ClientService:
             "fecha_registro": datetime.utcnow(),
             "churn_score": 0.0,
             "total_compras": 0,
-            "valor_total": 0.0
+            "valor_total": 0.0,
+            "updated_at": datetime.utcnow()
         })
         
         # Check if email already exists
@@ -34,6 +37,7 @@ class ClientService:
             raise ValueError("Email already exists")
         
         await self.db.clients.insert_one(client_dict)
+        await notify_change("clients", self.db)
         return Client(**client_dict)
     
     async def get_client(self, client_id: str) -> Optional[Client]:
@@ -63,18 +67,38 @@ class ClientService:
             if existing_client:
                 raise ValueError("Email already exists")
         
-        result = await self.db.clients.update_one(
-            {"_id": client_id},
-            {"$set": update_data}
-        )
+        renamed = "nombre" in update_data or "apellido" in update_data
+        update: Dict[str, Any] = {"$set": {**update_data, "updated_at": datetime.utcnow()}}
+        if renamed:
+            # Orders name syncs: an older sync never overwrites a newer name on purchases
+            update["$inc"] = {"name_version": 1}
+        result = await self.db.clients.update_one({"_id": client_id}, update)
         
         if result.modified_count:
+            await notify_change("clients", self.db)
+            
+            # Purchases carry a denormalized copy of the name; refresh it off the request path
+            if renamed:
+                names = await self.db.clients.find_one(
+                    {"_id": client_id}, {"nombre": 1, "apellido": 1, "name_version": 1}
+                )
+                if names:
+                    from .purchase_service import purchase_service
+                    run_in_background(
+                        purchase_service.sync_client_names(
+                            client_id, names.get("nombre"), names.get("apellido"), names.get("name_version", 0)
+                        ),
+                        name=f"sync_client_names:{client_id}"
+                    )
+            
             return await self.get_client(client_id)
         return None
     
     async def delete_client(self, client_id: str) -> bool:
         """Delete client."""
         result = await self.db.clients.delete_one({"_id": client_id})
+        if result.deleted_count:
+            await notify_change("clients", self.db)
         return result.deleted_count > 0
     
     async def calculate_churn_score(self, client_id: str) -> float:
@@ -116,10 +140,12 @@ class ClientService:
                 "$set": {
                     "total_compras": total_compras,
                     "valor_total": valor_total,
-                    "churn_score": churn_score
+                    "churn_score": churn_score,
+                    "updated_at": datetime.utcnow()
                 }
             }
         )
+        await notify_change("clients", self.db)
     
     async def get_top_loyal_clients(self, limit: int = 5) -> List[Client]:
         """Get top loyal clients (lowest churn score + highest value)."""
@@ -1,50 +1,92 @@
 """
 Dashboard service with business logic.
 """
-import uuid
+import asyncio
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Awaitable, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from ..models.dashboard import DashboardMetrics, DashboardData, Alert, ChartData
+from ..core.config import settings
 from ..core.database import get_database
+from ..utils.background import run_in_background
+from ..utils.broadcast import Broadcaster
+from ..utils.cache import SingleFlightCache
+from ..utils.changes import on_change
+from .sales_rollup_service import (
+    SalesRollupService,
+    EMPTY_TOTALS,
+    CHART_GRANULARITIES,
+    bucket_start,
+    business_day_start,
+    business_today,
+    iter_buckets
+)
+
+# Sales chart ranges (days) and bucket label formats
+CHART_RANGES = (7, 30, 90, 365)
+CHART_LABEL_FORMATS = {"day": "%d/%m", "week": "%d/%m", "month": "%m/%Y"}
 
 
 class DashboardService:
     """Dashboard service for business logic."""
     
     def __init__(self, db: AsyncIOMotorDatabase = None):
-        self.db = db or get_database()
+        self.db = db if db is not None else get_database()
+        self.sales_rollup = SalesRollupService(self.db)
+        self.cache = SingleFlightCache(
+            settings.dashboard_cache_ttl_seconds,
+            stale_seconds=settings.dashboard_cache_stale_seconds
+        )
+        on_change(self.cache.invalidate, "purchases", "clients", "products", "alerts")
+        # Persisted versions and business day the cached payload belongs to
+        self._cache_stamp: Optional[Tuple[Tuple[Tuple[str, str], ...], datetime]] = None
+        
+        # Live updates: last published metrics/alerts, diffed after each write
+        self.broadcaster = Broadcaster(settings.dashboard_stream_queue_size)
+        self._live_state: Optional[Tuple[Dict[str, Any], Dict[str, Alert]]] = None
+        self._live_lock = asyncio.Lock()
+        self._push_pending = False
+        on_change(self._on_write, "purchases", "clients", "products", "alerts")
     
-    async def get_dashboard_metrics(self) -> DashboardMetrics:
-        """Get dashboard metrics."""
-        # Total counts
-        total_clientes = await self.db.clients.count_documents({})
-        total_productos = await self.db.products.count_documents({})
-        total_compras = await self.db.purchases.count_documents({})
-        
-        # Total revenue
-        revenue_pipeline = [{"$group": {"_id": None, "total": {"$sum": "$total"}}}]
-        revenue_result = await self.db.purchases.aggregate(revenue_pipeline).to_list(length=1)
-        ingresos_totales = revenue_result[0]["total"] if revenue_result else 0
-        
-        # Monthly revenue
-        current_month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_pipeline = [
-            {"$match": {"fecha": {"$gte": current_month_start}}},
-            {"$group": {"_id": None, "total": {"$sum": "$total"}}}
-        ]
-        monthly_result = await self.db.purchases.aggregate(monthly_pipeline).to_list(length=1)
-        ingresos_mes_actual = monthly_result[0]["total"] if monthly_result else 0
-        
-        # New clients this month
-        new_clients_count = await self.db.clients.count_documents({
-            "fecha_registro": {"$gte": current_month_start}
-        })
-        
-        # Products with low stock
-        productos_bajo_stock = await self.db.products.count_documents({
-            "$expr": {"$lte": ["$stock_actual", "$stock_minimo"]}
-        })
+    async def get_dashboard_metrics(self, include_low_stock: bool = True) -> DashboardMetrics:
+        """Get dashboard metrics.
+        
+        Totals come from collection metadata and new clients from the
+        `fecha_registro` index; the low-stock count compares two fields with
+        `$expr`, which no index can serve, so it scans the (small) product
+        catalog. All run concurrently with one `$facet` over the sales_daily
+        rollup. `include_low_stock=False` skips the low-stock count for callers
+        that have it.
+        """
+        # One business-timezone month for both new clients and monthly revenue
+        current_month_start = business_today().replace(day=1)
+        
+        async def count_low_stock() -> int:
+            if not include_low_stock:
+                return 0
+            return await self.db.products.count_documents({
+                "$expr": {"$lte": ["$stock_actual", "$stock_minimo"]}
+            })
+        
+        (
+            total_clientes,
+            new_clients_count,
+            total_productos,
+            productos_bajo_stock,
+            sales_summary
+        ) = await asyncio.gather(
+            self.db.clients.estimated_document_count(),
+            self.db.clients.count_documents({"fecha_registro": {"$gte": business_day_start(current_month_start)}}),
+            self.db.products.estimated_document_count(),
+            count_low_stock(),
+            self.sales_rollup.get_summary(current_month_start)
+        )
+        
+        # Sales totals come from the sales_daily rollup
+        total_compras = sales_summary["totals"]["ventas"]
+        ingresos_totales = sales_summary["totals"]["ingresos"]
+        ingresos_mes_actual = sales_summary["monthly"]["ingresos"]
         
         return DashboardMetrics(
             total_clientes=total_clientes,
@@ -57,134 +99,35 @@ class DashboardService:
         )
     
     async def get_alerts(self) -> List[Alert]:
-        """Get system alerts."""
-        alerts = []
-        
-        # High churn risk clients
-        high_churn_clients = await self.db.clients.find({"churn_score": {"$gte": 0.7}}).to_list(length=None)
-        if high_churn_clients:
-            alerts.append(Alert(
-                id=str(uuid.uuid4()),
-                type="churn",
-                title="Clientes con alto riesgo de abandono",
-                message=f"{len(high_churn_clients)} clientes tienen alto riesgo de abandono",
-                severity="high",
-                created_at=datetime.utcnow()
-            ))
-        
-        # Low stock products
-        low_stock_products = await self.db.products.find({
-            "$expr": {"$lte": ["$stock_actual", "$stock_minimo"]}
-        }).to_list(length=None)
-        
-        if low_stock_products:
-            out_of_stock = [p for p in low_stock_products if p["stock_actual"] == 0]
-            if out_of_stock:
-                alerts.append(Alert(
-                    id=str(uuid.uuid4()),
-                    type="stock",
-                    title="Productos sin stock",
-                    message=f"{len(out_of_stock)} productos están sin stock",
-                    severity="critical",
-                    created_at=datetime.utcnow()
-                ))
-            
-            low_stock = [p for p in low_stock_products if p["stock_actual"] > 0]
-            if low_stock:
-                alerts.append(Alert(
-                    id=str(uuid.uuid4()),
-                    type="stock",
-                    title="Productos con stock bajo",
-                    message=f"{len(low_stock)} productos tienen stock bajo",
-                    severity="medium",
-                    created_at=datetime.utcnow()
-                ))
-        
-        # Sales performance alerts
-        last_week = datetime.utcnow() - timedelta(days=7)
-        recent_sales = await self.db.purchases.count_documents({"fecha": {"$gte": last_week}})
-        
-        if recent_sales < 5:  # Threshold for low sales
-            alerts.append(Alert(
-                id=str(uuid.uuid4()),
-                type="sales",
-                title="Ventas bajas esta semana",
-                message=f"Solo {recent_sales} ventas en los últimos 7 días",
-                severity="medium",
-                created_at=datetime.utcnow()
-            ))
-        
-        # New client acquisition
-        last_month = datetime.utcnow() - timedelta(days=30)
-        new_clients = await self.db.clients.count_documents({"fecha_registro": {"$gte": last_month}})
-        
-        if new_clients == 0:
-            alerts.append(Alert(
-                id=str(uuid.uuid4()),
-                type="general",
-                title="Sin nuevos clientes",
-                message="No se han registrado nuevos clientes en el último mes",
-                severity="medium",
-                created_at=datetime.utcnow()
-            ))
-        
-        return alerts
+        """Get system alerts (materialized by the alert service)."""
+        from .alert_service import alert_service
+        return await alert_service.get_alerts()
     
-    async def get_sales_chart_data(self) -> ChartData:
-        """Get sales chart data for the last 7 days."""
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=6)
+    async def get_sales_chart_data(self, days: int = 7, granularity: str = "day") -> ChartData:
+        """Get sales chart data for the last `days` business days, by day, week or month.
         
-        # Generate date labels
-        labels = []
-        current_date = start_date
-        while current_date <= end_date:
-            labels.append(current_date.strftime("%d/%m"))
-            current_date += timedelta(days=1)
-        
-        # Get daily sales data
-        pipeline = [
-            {
-                "$match": {
-                    "fecha": {
-                        "$gte": start_date.replace(hour=0, minute=0, second=0, microsecond=0),
-                        "$lte": end_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-                    }
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "$dateToString": {
-                            "format": "%Y-%m-%d",
-                            "date": "$fecha"
-                        }
-                    },
-                    "ventas": {"$sum": 1},
-                    "ingresos": {"$sum": "$total"}
-                }
-            },
-            {"$sort": {"_id": 1}}
-        ]
+        The range is widened back to the start of the week or month containing
+        its first day, so every bucket but the current one covers a full period.
+        """
+        if days not in CHART_RANGES:
+            raise ValueError(f"days must be one of {', '.join(map(str, CHART_RANGES))}")
+        if granularity not in CHART_GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(CHART_GRANULARITIES)}")
+        
+        end_day = business_today()
+        start_day = bucket_start(end_day - timedelta(days=days - 1), granularity)
         
-        daily_data = await self.db.purchases.aggregate(pipeline).to_list(length=None)
+        # Pre-aggregated day totals folded into buckets; empty buckets are zero
+        buckets = await self.sales_rollup.get_bucket_totals(start_day, end_day, granularity)
         
-        # Create data arrays
+        labels = []
         sales_data = []
         revenue_data = []
-        
-        current_date = start_date
-        data_dict = {item["_id"]: item for item in daily_data}
-        
-        while current_date <= end_date:
-            date_str = current_date.strftime("%Y-%m-%d")
-            if date_str in data_dict:
-                sales_data.append(data_dict[date_str]["ventas"])
-                revenue_data.append(data_dict[date_str]["ingresos"])
-            else:
-                sales_data.append(0)
-                revenue_data.append(0)
-            current_date += timedelta(days=1)
+        for bucket in iter_buckets(start_day, end_day, granularity):
+            totals = buckets.get(bucket, EMPTY_TOTALS)
+            labels.append(bucket.strftime(CHART_LABEL_FORMATS[granularity]))
+            sales_data.append(totals["ventas"])
+            revenue_data.append(totals["ingresos"])
         
         return ChartData(
             labels=labels,
@@ -204,18 +147,44 @@ class DashboardService:
             ]
         )
     
-    async def get_complete_dashboard_data(self) -> DashboardData:
-        """Get complete dashboard data."""
+    async def get_complete_dashboard_data(self, timings: Optional[Dict[str, float]] = None) -> DashboardData:
+        """Get complete dashboard data.
+        
+        All sections are fetched concurrently. Low-stock products are loaded once
+        and shared by the metrics and stock alerts sections. When a
+        `timings` dict is passed it is filled with each section's duration in ms.
+        """
         from .client_service import client_service
         from .stock_service import stock_service
         
-        # Get all dashboard components
-        metrics = await self.get_dashboard_metrics()
-        alerts = await self.get_alerts()
-        top_clients = await client_service.get_top_loyal_clients(limit=5)
-        churn_clients = await client_service.get_churn_risk_clients(limit=5)
-        stock_alerts = await stock_service.get_stock_alerts()
-        sales_chart = await self.get_sales_chart_data()
+        timings = {} if timings is None else timings
+        
+        async def timed(name: str, awaitable: Awaitable[Any]) -> Any:
+            started = time.perf_counter()
+            try:
+                return await awaitable
+            finally:
+                timings[name] = (time.perf_counter() - started) * 1000
+        
+        (
+            low_stock_products,
+            metrics,
+            alerts,
+            top_clients,
+            churn_clients,
+            sales_chart
+        ) = await asyncio.gather(
+            timed("low_stock", stock_service.get_low_stock_products()),
+            timed("metrics", self.get_dashboard_metrics(include_low_stock=False)),
+            timed("alerts", self.get_alerts()),
+            timed("top_clients", client_service.get_top_loyal_clients(limit=5)),
+            timed("churn_clients", client_service.get_churn_risk_clients(limit=5)),
+            timed("sales_chart", self.get_sales_chart_data())
+        )
+        
+        # Derive the low-stock dependent pieces from the shared list
+        metrics.productos_bajo_stock = len(low_stock_products)
+        stock_alerts = stock_service.build_stock_alerts(low_stock_products)
         
         return DashboardData(
             metrics=metrics,
@@ -228,6 +197,91 @@ class DashboardService:
             stock_alerts=stock_alerts,
             sales_chart=sales_chart
         )
+    
+    
+    async def get_cached_dashboard_data(
+        self,
+        versions: Optional[Dict[str, str]] = None
+    ) -> Tuple[DashboardData, Dict[str, float], str]:
+        """Get complete dashboard data through the single-flight cache.
+        
+        `versions` are the persisted collection versions the caller's ETag was
+        built from. Local writes invalidate the cache through `on_change`; when
+        the versions (or the business day) move without one, e.g. after a write
+        through another worker or a script, the cache is dropped too, so a
+        payload is never served under a newer ETag than the data it reflects.
+        
+        Returns the data, the section timings of the computation that produced it
+        and the cache state ("hit", "stale", "coalesced" or "miss").
+        """
+        if versions is not None:
+            stamp = (tuple(sorted(versions.items())), business_today())
+            if stamp != self._cache_stamp:
+                self.cache.invalidate()
+                self._cache_stamp = stamp
+        
+        async def load() -> Tuple[DashboardData, Dict[str, float]]:
+            timings: Dict[str, float] = {}
+            data = await self.get_complete_dashboard_data(timings=timings)
+            return data, timings
+        
+        (data, timings), state = await self.cache.get_or_load("complete", load)
+        return data, timings, state
+    
+    
+    async def get_live_snapshot(self) -> Dict[str, Any]:
+        """Current metrics and alerts, sent to a new stream subscriber."""
+        async with self._live_lock:
+            if self._live_state is None:
+                self._live_state = await self._compute_live_state()
+            metrics, alerts = self._live_state
+        return {"metrics": metrics, "alerts": list(alerts.values())}
+    
+    async def _compute_live_state(self) -> Tuple[Dict[str, Any], Dict[str, Alert]]:
+        data, _, _ = await self.get_cached_dashboard_data()
+        return data.metrics.dict(), {alert.id: alert for alert in data.alerts}
+    
+    def _on_write(self, collection: str):
+        """Schedule one debounced delta push per burst of writes."""
+        if not len(self.broadcaster):
+            # Nobody is listening; the next subscriber gets a fresh snapshot
+            self._live_state = None
+            return
+        if not self._push_pending:
+            self._push_pending = True
+            run_in_background(self._push_deltas(), name="dashboard-push")
+    
+    async def _push_deltas(self):
+        """Publish the metrics and alerts that changed since the last push.
+        
+        Events: "metrics" carries only the changed fields; "alerts" carries
+        `upserted` alerts and the IDs of `removed` ones.
+        """
+        await asyncio.sleep(settings.dashboard_stream_debounce_seconds)
+        self._push_pending = False
+        
+        async with self._live_lock:
+            previous = self._live_state
+            metrics, alerts = await self._compute_live_state()
+            self._live_state = (metrics, alerts)
+        
+        if previous is None:
+            self.broadcaster.publish("snapshot", {"metrics": metrics, "alerts": list(alerts.values())})
+            return
+        
+        previous_metrics, previous_alerts = previous
+        changed_metrics = {
+            name: value for name, value in metrics.items()
+            if previous_metrics.get(name) != value
+        }
+        
+        upserted = [alert for alert_id, alert in alerts.items() if previous_alerts.get(alert_id) != alert]
+        removed = [alert_id for alert_id in previous_alerts if alert_id not in alerts]
+        
+        if changed_metrics:
+            self.broadcaster.publish("metrics", changed_metrics)
+        if upserted or removed:
+            self.broadcaster.publish("alerts", {"upserted": upserted, "removed": removed})
 
 
 # Global service instance
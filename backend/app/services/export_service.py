@@ -0,0 +1,316 @@
+"""
+Columnar export service for BI pulls.
+"""
+import asyncio
+import csv
+import io
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from ..core.config import settings
+from ..core.database import get_database
+
+EXPORT_FORMATS = ("csv", "parquet", "arrow")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+# Server-assigned on every write (indexed); incremental pulls are watermarked on it
+WATERMARK_FIELD = "updated_at"
+
+# Per collection: business date field used for `start`/`end` filters, and
+# the exported columns as (column name, document key, type)
+EXPORT_SPECS: Dict[str, Dict[str, Any]] = {
+    "purchases": {
+        "timestamp": "fecha",
+        "columns": [
+            ("id", "_id", "string"),
+            ("fecha", "fecha", "timestamp"),
+            ("cliente_id", "cliente_id", "string"),
+            ("cliente_nombre", "cliente_nombre", "string"),
+            ("cliente_apellido", "cliente_apellido", "string"),
+            ("product_id", "product_id", "string"),
+            ("producto_comprado", "producto_comprado", "string"),
+            ("cantidad", "cantidad", "int"),
+            ("precio_unitario", "precio_unitario", "float"),
+            ("total", "total", "float"),
+            ("updated_at", "updated_at", "timestamp")
+        ]
+    },
+    "clients": {
+        "timestamp": "fecha_registro",
+        "columns": [
+            ("id", "_id", "string"),
+            ("nombre", "nombre", "string"),
+            ("apellido", "apellido", "string"),
+            ("correo_electronico", "correo_electronico", "string"),
+            ("fecha_registro", "fecha_registro", "timestamp"),
+            ("churn_score", "churn_score", "float"),
+            ("total_compras", "total_compras", "int"),
+            ("valor_total", "valor_total", "float"),
+            ("updated_at", "updated_at", "timestamp")
+        ]
+    },
+    "products": {
+        "timestamp": "fecha_creacion",
+        "columns": [
+            ("id", "_id", "string"),
+            ("nombre_producto", "nombre_producto", "string"),
+            ("precio", "precio", "float"),
+            ("stock_actual", "stock_actual", "int"),
+            ("stock_minimo", "stock_minimo", "int"),
+            ("imagen_url", "imagen_url", "string"),
+            ("fecha_creacion", "fecha_creacion", "timestamp"),
+            ("updated_at", "updated_at", "timestamp")
+        ]
+    }
+}
+
+
+def _import_pyarrow():
+    """Import pyarrow lazily; it is only needed for parquet/arrow exports."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet/Arrow export requires the 'pyarrow' package")
+    return pyarrow
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the caller."""
+    
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class _CsvEncoder:
+    """Encodes column batches as CSV."""
+    
+    def __init__(self, columns: List[Tuple[str, str, str]]):
+        self.names = [name for name, _, _ in columns]
+        self.header_written = False
+    
+    def encode(self, batch: Dict[str, list]) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not self.header_written:
+            writer.writerow(self.names)
+            self.header_written = True
+        
+        columns = [batch[name] for name in self.names]
+        for row in zip(*columns):
+            writer.writerow(
+                value.isoformat() if isinstance(value, datetime) else value for value in row
+            )
+        return buffer.getvalue().encode("utf-8")
+    
+    def finish(self) -> bytes:
+        if not self.header_written:
+            return self.encode({name: [] for name in self.names})
+        return b""
+
+
+class _ArrowEncoder:
+    """Encodes column batches as Parquet row groups or an Arrow IPC stream."""
+    
+    def __init__(self, columns: List[Tuple[str, str, str]], fmt: str):
+        pa = _import_pyarrow()
+        types = {
+            "string": pa.string(),
+            "int": pa.int64(),
+            "float": pa.float64(),
+            "timestamp": pa.timestamp("ms")
+        }
+        self.pa = pa
+        self.fmt = fmt
+        self.schema = pa.schema([(name, types[kind]) for name, _, kind in columns])
+        self.sink = _ChunkSink()
+        stream = pa.PythonFile(self.sink, mode="w")
+        if fmt == "parquet":
+            self.writer = pa.parquet.ParquetWriter(stream, self.schema, compression="snappy")
+        else:
+            self.writer = pa.ipc.new_stream(stream, self.schema)
+    
+    def encode(self, batch: Dict[str, list]) -> bytes:
+        record_batch = self.pa.RecordBatch.from_pydict(batch, schema=self.schema)
+        if self.fmt == "parquet":
+            # Each batch becomes one row group
+            self.writer.write_table(self.pa.Table.from_batches([record_batch]))
+        else:
+            self.writer.write_batch(record_batch)
+        return self.sink.drain()
+    
+    def finish(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+class ExportService:
+    """Streams collections out of Motor cursors in columnar batches."""
+    
+    def __init__(self, db: AsyncIOMotorDatabase = None):
+        self.db = db if db is not None else get_database()
+    
+    def _build_filter(
+        self,
+        collection: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        since: Optional[datetime] = None,
+        upper: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """`start`/`end` on the collection's date field, `since`/`upper` on `updated_at`."""
+        query: Dict[str, Any] = {}
+        dates: Dict[str, Any] = {}
+        if start is not None:
+            dates["$gte"] = start
+        if end is not None:
+            dates["$lte"] = end
+        if dates:
+            query[EXPORT_SPECS[collection]["timestamp"]] = dates
+        
+        changes: Dict[str, Any] = {}
+        if since is not None:
+            changes["$gt"] = since
+        if upper is not None:
+            changes["$lte"] = upper
+        if changes:
+            if since is None:
+                # A full pull also covers documents written before `updated_at` existed
+                query["$or"] = [{WATERMARK_FIELD: changes}, {WATERMARK_FIELD: None}]
+            else:
+                query[WATERMARK_FIELD] = changes
+        return query
+    
+    async def get_watermark(
+        self,
+        collection: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        since: Optional[datetime] = None
+    ) -> Optional[datetime]:
+        """Latest `updated_at` an export with these filters would include.
+        
+        Pinning the upper bound before streaming makes the export a consistent
+        slice: pass the returned value as `since` for the next incremental pull.
+        Writes from the last `export_watermark_lag_seconds` are left for the
+        next pull, so a write whose timestamp was taken just before the pin but
+        that lands just after it is not skipped. Any write (backdated purchases,
+        edits to exported rows) moves `updated_at` past the watermark.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.export_watermark_lag_seconds)
+        query = self._build_filter(collection, start, end, since, cutoff)
+        document = await self.db[collection].find_one(
+            query, {WATERMARK_FIELD: 1}, sort=[(WATERMARK_FIELD, -1)]
+        )
+        if document and document.get(WATERMARK_FIELD) is not None:
+            return document[WATERMARK_FIELD]
+        return since
+    
+    def iter_export(
+        self,
+        collection: str,
+        fmt: str = "csv",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        since: Optional[datetime] = None,
+        upper: Optional[datetime] = None,
+        batch_size: int = None
+    ) -> AsyncIterator[bytes]:
+        """Encoded export as an async iterator, one chunk per batch of documents.
+        
+        Validation happens eagerly so callers can report bad requests before
+        they start streaming.
+        """
+        if collection not in EXPORT_SPECS:
+            raise ValueError(f"Unknown export collection: {collection}")
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        
+        batch_size = batch_size or settings.export_batch_size
+        columns = EXPORT_SPECS[collection]["columns"]
+        encoder = _CsvEncoder(columns) if fmt == "csv" else _ArrowEncoder(columns, fmt)
+        cursor = self._cursor(collection, start, end, since, upper).batch_size(batch_size)
+        return self._stream(cursor, encoder, columns, batch_size)
+    
+    async def explain_export(
+        self,
+        collection: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        since: Optional[datetime] = None,
+        upper: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Query plan of an export, to check it walks the (updated_at, date) index without a blocking sort."""
+        if collection not in EXPORT_SPECS:
+            raise ValueError(f"Unknown export collection: {collection}")
+        return await self._cursor(collection, start, end, since, upper).explain()
+    
+    def _cursor(
+        self,
+        collection: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        since: Optional[datetime],
+        upper: Optional[datetime]
+    ):
+        projection = {key: 1 for _, key, _ in EXPORT_SPECS[collection]["columns"]}
+        return self.db[collection].find(
+            self._build_filter(collection, start, end, since, upper), projection
+        ).sort(WATERMARK_FIELD, 1)
+    
+    async def _stream(self, cursor, encoder, columns: List[Tuple[str, str, str]], batch_size: int) -> AsyncIterator[bytes]:
+        """Buffer cursor rows into column lists and flush every `batch_size` rows.
+        
+        Encoding (CSV formatting, Arrow/Parquet serialization and compression)
+        runs in the default thread pool so it doesn't block the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        batch: Dict[str, list] = {name: [] for name, _, _ in columns}
+        size = 0
+        async for document in cursor:
+            for name, key, _ in columns:
+                batch[name].append(document.get(key))
+            size += 1
+            
+            if size >= batch_size:
+                yield await loop.run_in_executor(None, encoder.encode, batch)
+                batch = {name: [] for name, _, _ in columns}
+                size = 0
+        
+        if size:
+            yield await loop.run_in_executor(None, encoder.encode, batch)
+        
+        tail = await loop.run_in_executor(None, encoder.finish)
+        if tail:
+            yield tail
+
+
+# Global service instance
+export_service = ExportService()
@@ -0,0 +1,144 @@
+"""
+Demand forecasting and restock planning.
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from ..models.forecast import ProductForecast, RestockPlan
+from ..core.config import settings
+from ..core.database import get_database
+from .sales_rollup_service import business_today
+
+
+def exponential_smoothing(series: np.ndarray, alpha: float) -> Dict[str, np.ndarray]:
+    """Simple exponential smoothing over every row of a (products x days) matrix.
+    
+    Each row starts at its first sale, so products introduced mid-window are
+    not dragged down by the days before they were sold; rows without sales
+    forecast zero. Returns the final smoothed level (next-day forecast) per
+    product and the RMS of its one-step-ahead errors, used as the demand
+    deviation.
+    """
+    n_products, n_days = series.shape
+    sold = series > 0
+    first = np.where(sold.any(axis=1), sold.argmax(axis=1), n_days)
+    
+    level = np.zeros(n_products, dtype=np.float64)
+    squared_errors = np.zeros(n_products, dtype=np.float64)
+    for t in range(n_days):
+        observed = series[:, t]
+        active = t > first
+        squared_errors += np.where(active, (observed - level) ** 2, 0.0)
+        level = np.where(active, alpha * observed + (1 - alpha) * level, np.where(t == first, observed, level))
+    
+    steps = np.maximum(n_days - 1 - first, 0)
+    sigma = np.sqrt(squared_errors / np.maximum(steps, 1))
+    return {"level": level, "sigma": sigma}
+
+
+class ForecastService:
+    """Builds demand series from the sales_daily rollup and plans restocks."""
+    
+    def __init__(self, db: AsyncIOMotorDatabase = None):
+        self.db = db if db is not None else get_database()
+    
+    async def build_demand_matrix(self, history_days: int) -> Dict[str, Any]:
+        """Daily units sold per product over the last `history_days` days."""
+        end = business_today()
+        start = end - timedelta(days=history_days - 1)
+        
+        products = await self.db.products.find(
+            {}, {"nombre_producto": 1, "stock_actual": 1, "stock_minimo": 1}
+        ).to_list(length=None)
+        row_by_id = {product["_id"]: i for i, product in enumerate(products)}
+        row_by_name = {product["nombre_producto"]: i for i, product in enumerate(products)}
+        
+        series = np.zeros((len(products), history_days), dtype=np.float64)
+        cursor = self.db.sales_daily.find(
+            {"product": {"$ne": None}, "day": {"$gte": start, "$lte": end}},
+            {"day": 1, "product": 1, "product_id": 1, "unidades": 1}
+        )
+        async for bucket in cursor:
+            row = row_by_id.get(bucket.get("product_id"), row_by_name.get(bucket["product"]))
+            if row is None:
+                continue
+            series[row, (bucket["day"] - start).days] += bucket["unidades"]
+        
+        return {"products": products, "series": series}
+    
+    async def get_restock_plan(self) -> RestockPlan:
+        """Forecast demand for all products at once and compute reorder points."""
+        history_days = settings.forecast_history_days
+        lead_time = settings.forecast_lead_time_days
+        review_days = settings.forecast_review_days
+        
+        data = await self.build_demand_matrix(history_days)
+        products = data["products"]
+        forecasts: List[ProductForecast] = []
+        
+        if products:
+            smoothed = exponential_smoothing(data["series"], settings.forecast_alpha)
+            demand = np.maximum(smoothed["level"], 0.0)
+            sigma = smoothed["sigma"]
+            
+            stock = np.array([p.get("stock_actual", 0) for p in products], dtype=np.float64)
+            minimum = np.array([p.get("stock_minimo", 0) for p in products], dtype=np.float64)
+            
+            # Reorder when stock can't cover lead-time demand plus safety stock,
+            # never below the product's configured minimum
+            safety_stock = settings.forecast_service_level_z * sigma * math.sqrt(lead_time)
+            reorder_point = np.maximum(np.ceil(demand * lead_time + safety_stock), minimum)
+            target_level = reorder_point + np.ceil(demand * review_days)
+            needs_restock = stock <= reorder_point
+            quantity = np.where(needs_restock, np.maximum(target_level - stock, 0), 0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                coverage = np.where(demand > 0, stock / demand, np.nan)
+            
+            for i, product in enumerate(products):
+                forecasts.append(ProductForecast(
+                    product_id=product["_id"],
+                    nombre_producto=product["nombre_producto"],
+                    stock_actual=int(stock[i]),
+                    stock_minimo=int(minimum[i]),
+                    demanda_diaria=round(float(demand[i]), 3),
+                    desviacion_diaria=round(float(sigma[i]), 3),
+                    dias_cobertura=None if np.isnan(coverage[i]) else round(float(coverage[i]), 1),
+                    punto_reorden=int(reorder_point[i]),
+                    cantidad_reorden=int(quantity[i]),
+                    requiere_reposicion=bool(needs_restock[i])
+                ))
+        
+        # Most urgent first: products needing restock, then by days of coverage
+        forecasts.sort(key=lambda f: (
+            not f.requiere_reposicion,
+            f.dias_cobertura if f.dias_cobertura is not None else math.inf
+        ))
+        
+        return RestockPlan(
+            generated_at=datetime.utcnow(),
+            history_days=history_days,
+            lead_time_days=lead_time,
+            review_days=review_days,
+            products=forecasts
+        )
+    
+    @staticmethod
+    def summarize(plan: RestockPlan, limit: int = 20) -> List[Dict[str, Any]]:
+        """Compact view of the plan for LLM prompts (only products that need action)."""
+        return [
+            {
+                "producto": f.nombre_producto,
+                "stock": f.stock_actual,
+                "demanda_diaria": f.demanda_diaria,
+                "dias_cobertura": f.dias_cobertura,
+                "reponer": f.cantidad_reorden
+            }
+            for f in plan.products
+            if f.requiere_reposicion
+        ][:limit]
+
+
+# Global service instance
+forecast_service = ForecastService()
@@ -0,0 +1,165 @@
+"""
+Idempotency-Key handling for retried create requests.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
+from ..core.config import settings
+from ..core.database import get_database
+from ..utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Attempts at storing a response once the handler's writes are committed
+COMPLETE_ATTEMPTS = 4
+
+
+class IdempotencyError(Exception):
+    """Raised when an Idempotency-Key cannot be honoured."""
+    
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _fingerprint(payload: BaseModel) -> str:
+    """Stable hash of the request body, to detect key reuse with another payload."""
+    body = json.dumps(payload.model_dump(mode="json"), sort_keys=True)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class IdempotencyService:
+    """Stores the response of keyed requests so retries replay instead of re-running.
+    
+    Completed responses live in the `idempotency_keys` collection (expired by a
+    TTL index on `expires_at`) with a process-local LRU in front of it.
+    
+    A running request holds its key with a short lease (`locked_until`),
+    extended every third of `idempotency_lock_seconds` while the handler runs.
+    If the process dies without releasing it, a retry takes the key over once
+    the lease expires instead of getting 409 until the TTL. The key is released
+    only when the handler itself fails; once it has returned, its response is
+    stored even if the request is cancelled meanwhile.
+    """
+    
+    def __init__(self, db: AsyncIOMotorDatabase = None):
+        self.db = db if db is not None else get_database()
+        self.cache = LRUCache(
+            maxsize=settings.idempotency_cache_size,
+            ttl_seconds=settings.idempotency_ttl_seconds
+        )
+    
+    async def run(
+        self,
+        scope: str,
+        key: Optional[str],
+        payload: BaseModel,
+        handler: Callable[[], Awaitable[BaseModel]]
+    ) -> Any:
+        """Run `handler` once per (scope, key) and replay its result afterwards."""
+        if not key:
+            return await handler()
+        
+        record_id = f"{scope}:{key}"
+        fingerprint = _fingerprint(payload)
+        
+        # Replays are served from memory or with a single lookup
+        record = self.cache.get(record_id)
+        if record is None:
+            record = await self.db.idempotency_keys.find_one({"_id": record_id})
+        if record is not None and record["status"] == "completed":
+            return self._replay(record, fingerprint)
+        
+        # Reserve the key so concurrent retries don't run the handler twice
+        lock = uuid.uuid4().hex
+        now = datetime.utcnow()
+        try:
+            await self.db.idempotency_keys.insert_one({
+                "_id": record_id,
+                "fingerprint": fingerprint,
+                "status": "pending",
+                "lock": lock,
+                "locked_until": now + timedelta(seconds=settings.idempotency_lock_seconds),
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=settings.idempotency_ttl_seconds)
+            })
+        except DuplicateKeyError:
+            record = await self.db.idempotency_keys.find_one({"_id": record_id})
+            if not await self._take_over(record, fingerprint, lock):
+                return self._replay(record, fingerprint)
+        
+        heartbeat = asyncio.create_task(self._hold_lease(record_id, lock))
+        try:
+            try:
+                result = await handler()
+            except BaseException:
+                # Nothing was created: failed or cancelled requests may be retried with the same key
+                await asyncio.shield(self.db.idempotency_keys.delete_one({"_id": record_id, "lock": lock}))
+                raise
+            
+            # The handler's writes are committed from here on, so the key is never released
+            response = result.model_dump(mode="json", by_alias=True)
+            self.cache.set(record_id, {"fingerprint": fingerprint, "status": "completed", "response": response})
+            await asyncio.shield(self._complete(record_id, lock, response))
+        finally:
+            heartbeat.cancel()
+        return result
+    
+    async def _hold_lease(self, record_id: str, lock: str):
+        """Keep extending the lease of a running request so it is not taken over."""
+        lease = timedelta(seconds=settings.idempotency_lock_seconds)
+        while True:
+            await asyncio.sleep(lease.total_seconds() / 3)
+            try:
+                await self.db.idempotency_keys.update_one(
+                    {"_id": record_id, "lock": lock},
+                    {"$set": {"locked_until": datetime.utcnow() + lease}}
+                )
+            except Exception as e:
+                logger.warning("Could not extend the lease of %s: %s", record_id, e)
+    
+    async def _complete(self, record_id: str, lock: str, response: Any):
+        """Store a response, retrying: a lost write would let a retry run the handler again."""
+        for attempt in range(COMPLETE_ATTEMPTS):
+            try:
+                await self.db.idempotency_keys.update_one(
+                    {"_id": record_id, "lock": lock},
+                    {"$set": {"status": "completed", "response": response}, "$unset": {"lock": "", "locked_until": ""}}
+                )
+                return
+            except Exception as e:
+                logger.warning("Could not store the response of %s (attempt %s): %s", record_id, attempt + 1, e)
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        logger.error("Gave up storing the response of %s; it is replayed by this process only", record_id)
+    
+    async def _take_over(self, record: Optional[dict], fingerprint: str, lock: str) -> bool:
+        """Claim a pending key whose lease expired (its request died without releasing it)."""
+        if record is None or record["status"] != "pending" or record["fingerprint"] != fingerprint:
+            return False
+        
+        now = datetime.utcnow()
+        claimed = await self.db.idempotency_keys.update_one(
+            {"_id": record["_id"], "status": "pending", "locked_until": {"$not": {"$gt": now}}},
+            {"$set": {"lock": lock, "locked_until": now + timedelta(seconds=settings.idempotency_lock_seconds)}}
+        )
+        return claimed.modified_count == 1
+    
+    def _replay(self, record: Optional[dict], fingerprint: str) -> Any:
+        """Return a stored response, or explain why it can't be replayed."""
+        if record is not None and record["fingerprint"] != fingerprint:
+            raise IdempotencyError(422, "Idempotency-Key was already used with a different request body")
+        if record is None or record["status"] != "completed":
+            raise IdempotencyError(409, "A request with this Idempotency-Key is still in progress")
+        return record["response"]
+
+
+# Global service instance
+idempotency_service = IdempotencyService()
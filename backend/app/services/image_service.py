@@ -0,0 +1,203 @@
+"""
+Product image storage: streamed uploads and background thumbnailing.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+from ..core.config import settings
+from ..utils.background import run_in_background
+
+ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "webp"}
+CHUNK_SIZE = 64 * 1024
+
+# Pillow format -> stored extension; the original is named after what it really is
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+VARIANT_EXTENSIONS = ("webp", "jpg")
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds `settings.max_upload_bytes`."""
+
+
+@dataclass
+class StoredImage:
+    """An original image stored under its content hash."""
+    content_hash: str
+    extension: str
+    directory: str
+    
+    @property
+    def original_path(self) -> str:
+        return os.path.join(self.directory, f"original.{self.extension}")
+    
+    @property
+    def url(self) -> str:
+        return self._url(os.path.basename(self.original_path))
+    
+    def variant_paths(self, sizes: List[int]) -> List[str]:
+        return [
+            os.path.join(self.directory, f"{size}.{extension}")
+            for size in sizes
+            for extension in VARIANT_EXTENSIONS
+        ]
+    
+    def variant_url(self, size: int, extension: str = "webp") -> str:
+        """URL of a resized variant (served from the original until it is rendered)."""
+        return self._url(f"{size}.{extension}")
+    
+    def _url(self, filename: str) -> str:
+        return f"/uploads/images/{self.content_hash[:2]}/{self.content_hash}/{filename}"
+
+
+def _verify_image(path: str) -> Optional[str]:
+    """Pillow format of a file if it is a readable image, else None (runs in a worker process)."""
+    from PIL import Image
+    
+    try:
+        with Image.open(path) as image:
+            image.verify()
+            return image.format
+    except Exception:
+        return None
+
+
+def _render_variants(source_path: str, directory: str, sizes: List[int]) -> List[str]:
+    """Write resized WebP and JPEG variants next to the original (runs in a worker process)."""
+    from PIL import Image
+    
+    written = []
+    with Image.open(source_path) as image:
+        image.load()
+        rgb = image.convert("RGB")
+        for size in sizes:
+            variant = rgb.copy()
+            variant.thumbnail((size, size))
+            for extension, fmt, options in (
+                ("webp", "WEBP", {"quality": 80, "method": 4}),
+                ("jpg", "JPEG", {"quality": 85, "optimize": True, "progressive": True})
+            ):
+                path = os.path.join(directory, f"{size}.{extension}")
+                if os.path.exists(path):
+                    continue
+                tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                variant.save(tmp_path, fmt, **options)
+                os.replace(tmp_path, path)
+                written.append(path)
+    return written
+
+
+class ImageService:
+    """Stores product images by content hash and renders size variants off the event loop."""
+    
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned, not forked: the server process has threads and locks a fork would copy
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.image_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+    
+    async def save_upload(self, file: UploadFile) -> StoredImage:
+        """Stream an upload to disk in chunks, enforcing the size cap.
+        
+        The file is hashed while it is written; re-uploads of an image that is
+        already stored are discarded and reuse the existing original and variants.
+        New files are checked with Pillow in the process pool and stored under
+        the extension of their actual format.
+        """
+        extension = file.filename.rsplit(".", 1)[-1].lower() if file.filename and "." in file.filename else "jpg"
+        if extension not in ALLOWED_EXTENSIONS:
+            raise ValueError("Unsupported image type")
+        
+        images_dir = os.path.join(settings.uploads_dir, "images")
+        await aiofiles.os.makedirs(images_dir, exist_ok=True)
+        tmp_path = os.path.join(images_dir, f".{uuid.uuid4().hex}.upload")
+        
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(tmp_path, "wb") as buffer:
+                while chunk := await file.read(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > settings.max_upload_bytes:
+                        raise UploadTooLargeError(
+                            f"Image exceeds the {settings.max_upload_bytes} byte limit"
+                        )
+                    digest.update(chunk)
+                    await buffer.write(chunk)
+            
+            content_hash = digest.hexdigest()
+            directory = os.path.join(images_dir, content_hash[:2], content_hash)
+            existing = await self._find_original(directory)
+            if existing is not None:
+                await aiofiles.os.remove(tmp_path)
+                return StoredImage(content_hash, existing.rsplit(".", 1)[-1], directory)
+            
+            loop = asyncio.get_running_loop()
+            image_format = await loop.run_in_executor(self.pool, _verify_image, tmp_path)
+            if image_format not in FORMAT_EXTENSIONS:
+                raise ValueError("File is not a valid image")
+            
+            stored = StoredImage(content_hash, FORMAT_EXTENSIONS[image_format], directory)
+            await aiofiles.os.makedirs(stored.directory, exist_ok=True)
+            await aiofiles.os.replace(tmp_path, stored.original_path)
+        except BaseException:
+            if await aiofiles.os.path.exists(tmp_path):
+                await aiofiles.os.remove(tmp_path)
+            raise
+        
+        return stored
+    
+    async def _find_original(self, directory: str) -> Optional[str]:
+        """Filename of the original already stored in `directory`, if any."""
+        if not await aiofiles.os.path.isdir(directory):
+            return None
+        for name in await aiofiles.os.listdir(directory):
+            if name.startswith("original."):
+                return name
+        return None
+    
+    async def variants_exist(self, stored: StoredImage) -> bool:
+        """Whether every configured size variant has been rendered already."""
+        for path in stored.variant_paths(settings.image_variant_sizes):
+            if not await aiofiles.os.path.exists(path):
+                return False
+        return True
+    
+    async def render_variants(self, stored: StoredImage) -> List[str]:
+        """Render the configured size variants in the process pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.pool,
+            _render_variants,
+            stored.original_path,
+            stored.directory,
+            settings.image_variant_sizes
+        )
+    
+    def schedule_variants(self, stored: StoredImage) -> asyncio.Task:
+        """Render variants in the background without delaying the response."""
+        return run_in_background(self.render_variants(stored), name=f"image_variants:{stored.content_hash}")
+    
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Global service instance
+image_service = ImageService()
@@ -1,19 +1,29 @@
 """
 Purchase service with business logic.
 """
+import asyncio
 import uuid
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
 from ..models.purchase import Purchase, PurchaseCreate, PurchaseUpdate, PurchaseWithClient
 from ..core.database import get_database
+from ..utils.changes import notify_change
+from .sales_rollup_service import SalesRollupService, business_today
+from .stock_ledger_service import StockLedgerService
+
+# Purchase fields that feed the sales_daily rollup
+ROLLUP_FIELDS = ("fecha", "producto_comprado", "cantidad", "total")
 
 
 class PurchaseService:
     """Purchase service for business logic."""
     
     def __init__(self, db: AsyncIOMotorDatabase = None):
-        self.db = db or get_database()
+        self.db = db if db is not None else get_database()
+        self.sales_rollup = SalesRollupService(self.db)
+        self.stock_ledger = StockLedgerService(self.db)
     
     async def create_purchase(self, purchase_data: PurchaseCreate) -> Purchase:
         """Create a new purchase."""
@@ -22,24 +32,45 @@ class PurchaseService:
         if not client:
             raise ValueError("Client not found")
         
+        # Resolve the product once so stock and analytics can join on its primary key
+        product = await self._resolve_product(purchase_data.product_id, purchase_data.producto_comprado)
+        
         # Calculate total
         total = purchase_data.cantidad * purchase_data.precio_unitario
         
+        purchase_id = str(uuid.uuid4())
+        # Take the units first: an oversell is rejected before anything is written
+        if product:
+            await self._update_product_stock(product["_id"], purchase_data.cantidad, purchase_id)
+        
         purchase_dict = purchase_data.dict()
         purchase_dict.update({
-            "_id": str(uuid.uuid4()),
-            "total": total
+            "_id": purchase_id,
+            "total": total,
+            "product_id": product["_id"] if product else None,
+            # Denormalized so listings don't need a $lookup into clients
+            "cliente_nombre": client.get("nombre"),
+            "cliente_apellido": client.get("apellido"),
+            "cliente_nombre_version": client.get("name_version", 0),
+            "updated_at": datetime.utcnow()
         })
         
-        await self.db.purchases.insert_one(purchase_dict)
+        try:
+            await self.db.purchases.insert_one(purchase_dict)
+        except BaseException:
+            if product:
+                # Give the units back (a positive sale movement cancels the one above)
+                await asyncio.shield(self.stock_ledger.record(
+                    product["_id"], purchase_data.cantidad, "sale", reference=purchase_id
+                ))
+            raise
+        await self.sales_rollup.record_purchase(purchase_dict)
+        await notify_change("purchases", self.db)
         
         # Update client metrics
         from .client_service import client_service
         await client_service.update_client_metrics(purchase_data.cliente_id)
         
-        # Update product stock if exists
-        await self._update_product_stock(purchase_data.producto_comprado, purchase_data.cantidad)
-        
         return Purchase(**purchase_dict)
     
     async def get_purchase(self, purchase_id: str) -> Optional[Purchase]:
@@ -49,28 +80,7 @@ class PurchaseService:
     
     async def get_purchases(self, skip: int = 0, limit: int = 100) -> List[PurchaseWithClient]:
         """Get list of purchases with client information."""
-        pipeline = [
-            {
-                "$lookup": {
-                    "from": "clients",
-                    "localField": "cliente_id",
-                    "foreignField": "_id",
-                    "as": "client_info"
-                }
-            },
-            {
-                "$addFields": {
-                    "cliente_nombre": {"$arrayElemAt": ["$client_info.nombre", 0]},
-                    "cliente_apellido": {"$arrayElemAt": ["$client_info.apellido", 0]}
-                }
-            },
-            {"$project": {"client_info": 0}},
-            {"$sort": {"fecha": -1}},
-            {"$skip": skip},
-            {"$limit": limit}
-        ]
-        
-        cursor = self.db.purchases.aggregate(pipeline)
+        cursor = self.db.purchases.find().sort("fecha", -1).skip(skip).limit(limit)
         purchases = await cursor.to_list(length=limit)
         return [PurchaseWithClient(**purchase) for purchase in purchases]
     
@@ -91,116 +101,174 @@ class PurchaseService:
             precio_unitario = update_data.get("precio_unitario", current_purchase.precio_unitario)
             update_data["total"] = cantidad * precio_unitario
         
-        result = await self.db.purchases.update_one(
+        # Re-resolve the product reference when the product changes
+        if "product_id" in update_data or "producto_comprado" in update_data:
+            current = await self.db.purchases.find_one(
+                {"_id": purchase_id}, {"producto_comprado": 1, "product_id": 1}
+            )
+            if not current:
+                return None
+            
+            product_id = update_data.get("product_id")
+            if product_id is None and "producto_comprado" not in update_data:
+                product_id = current.get("product_id")
+            product = await self._resolve_product(
+                product_id, update_data.get("producto_comprado", current["producto_comprado"])
+            )
+            update_data["product_id"] = product["_id"] if product else None
+            if product:
+                update_data["producto_comprado"] = product["nombre_producto"]
+        
+        # Keep denormalized client name in sync when the purchase changes owner
+        if "cliente_id" in update_data:
+            client = await self.db.clients.find_one(
+                {"_id": update_data["cliente_id"]},
+                {"nombre": 1, "apellido": 1, "name_version": 1}
+            )
+            if not client:
+                raise ValueError("Client not found")
+            update_data["cliente_nombre"] = client.get("nombre")
+            update_data["cliente_apellido"] = client.get("apellido")
+            update_data["cliente_nombre_version"] = client.get("name_version", 0)
+        
+        previous = await self.db.purchases.find_one_and_update(
             {"_id": purchase_id},
-            {"$set": update_data}
+            {"$set": {**update_data, "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.BEFORE
         )
+        if not previous:
+            return None
+        await notify_change("purchases", self.db)
         
-        if result.modified_count:
-            # Update client metrics if client changed
-            if "cliente_id" in update_data:
-                from .client_service import client_service
-                await client_service.update_client_metrics(update_data["cliente_id"])
-            
-            return await self.get_purchase(purchase_id)
-        return None
+        # Move the purchase between rollup buckets if anything it contributes changed
+        updated = {**previous, **update_data}
+        if any(previous.get(field) != updated.get(field) for field in ROLLUP_FIELDS):
+            await self.sales_rollup.record_purchase(previous, sign=-1)
+            await self.sales_rollup.record_purchase(updated)
+        
+        # Update client metrics if client changed
+        if "cliente_id" in update_data:
+            from .client_service import client_service
+            await client_service.update_client_metrics(update_data["cliente_id"])
+        
+        return Purchase(**updated)
     
     async def delete_purchase(self, purchase_id: str) -> bool:
         """Delete purchase."""
-        purchase = await self.get_purchase(purchase_id)
+        purchase = await self.db.purchases.find_one_and_delete({"_id": purchase_id})
         if not purchase:
             return False
         
-        result = await self.db.purchases.delete_one({"_id": purchase_id})
+        await self.sales_rollup.record_purchase(purchase, sign=-1)
+        await notify_change("purchases", self.db)
         
-        if result.deleted_count:
-            # Update client metrics
-            from .client_service import client_service
-            await client_service.update_client_metrics(purchase.cliente_id)
-            return True
-        
-        return False
+        # Update client metrics
+        from .client_service import client_service
+        await client_service.update_client_metrics(purchase["cliente_id"])
+        return True
+    
+    def purchases_by_client_cursor(self, client_id: str):
+        """Cursor over a client's purchases, newest first."""
+        return self.db.purchases.find({"cliente_id": client_id}).sort("fecha", -1)
     
     async def get_purchases_by_client(self, client_id: str) -> List[Purchase]:
         """Get purchases by client ID."""
-        cursor = self.db.purchases.find({"cliente_id": client_id}).sort("fecha", -1)
-        purchases = await cursor.to_list(length=None)
+        purchases = await self.purchases_by_client_cursor(client_id).to_list(length=None)
         return [Purchase(**purchase) for purchase in purchases]
     
+    def recent_purchases_cursor(self, days: int = 30):
+        """Cursor over purchases from the last `days` days, newest first."""
+        start_date = datetime.utcnow() - timedelta(days=days)
+        return self.db.purchases.find({"fecha": {"$gte": start_date}}).sort("fecha", -1)
+    
     async def get_recent_purchases(self, days: int = 30) -> List[PurchaseWithClient]:
         """Get recent purchases."""
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        pipeline = [
-            {"$match": {"fecha": {"$gte": start_date}}},
-            {
-                "$lookup": {
-                    "from": "clients",
-                    "localField": "cliente_id",
-                    "foreignField": "_id",
-                    "as": "client_info"
-                }
-            },
-            {
-                "$addFields": {
-                    "cliente_nombre": {"$arrayElemAt": ["$client_info.nombre", 0]},
-                    "cliente_apellido": {"$arrayElemAt": ["$client_info.apellido", 0]}
-                }
-            },
-            {"$project": {"client_info": 0}},
-            {"$sort": {"fecha": -1}}
-        ]
-        
-        cursor = self.db.purchases.aggregate(pipeline)
-        purchases = await cursor.to_list(length=None)
+        purchases = await self.recent_purchases_cursor(days).to_list(length=None)
         return [PurchaseWithClient(**purchase) for purchase in purchases]
     
     async def get_sales_analytics(self) -> Dict[str, Any]:
-        """Get sales analytics data."""
-        # Total sales
-        total_sales = await self.db.purchases.count_documents({})
-        
-        # Total revenue
-        pipeline = [{"$group": {"_id": None, "total_revenue": {"$sum": "$total"}}}]
-        revenue_result = await self.db.purchases.aggregate(pipeline).to_list(length=1)
-        total_revenue = revenue_result[0]["total_revenue"] if revenue_result else 0
-        
-        # Monthly revenue
-        current_month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_pipeline = [
-            {"$match": {"fecha": {"$gte": current_month_start}}},
-            {"$group": {"_id": None, "monthly_revenue": {"$sum": "$total"}}}
-        ]
-        monthly_result = await self.db.purchases.aggregate(monthly_pipeline).to_list(length=1)
-        monthly_revenue = monthly_result[0]["monthly_revenue"] if monthly_result else 0
-        
-        # Top products
-        top_products_pipeline = [
-            {
-                "$group": {
-                    "_id": "$producto_comprado",
-                    "total_vendido": {"$sum": "$cantidad"},
-                    "ingresos": {"$sum": "$total"}
-                }
-            },
-            {"$sort": {"total_vendido": -1}},
-            {"$limit": 10}
-        ]
-        top_products = await self.db.purchases.aggregate(top_products_pipeline).to_list(length=10)
+        """Get sales analytics data (one $facet over the sales_daily rollup)."""
+        current_month_start = business_today().replace(day=1)
+        summary = await self.sales_rollup.get_summary(current_month_start, top_products=10)
         
         return {
-            "total_sales": total_sales,
-            "total_revenue": total_revenue,
-            "monthly_revenue": monthly_revenue,
-            "top_products": top_products
+            "total_sales": summary["totals"]["ventas"],
+            "total_revenue": summary["totals"]["ingresos"],
+            "monthly_revenue": summary["monthly"]["ingresos"],
+            "top_products": summary["top_products"]
         }
     
-    async def _update_product_stock(self, product_name: str, quantity_sold: int):
-        """Update product stock after purchase."""
-        await self.db.products.update_one(
-            {"nombre_producto": product_name},
-            {"$inc": {"stock_actual": -quantity_sold}}
+    async def sync_client_names(self, client_id: str, nombre: str, apellido: str, version: int = 0) -> int:
+        """Propagate a client's name to the denormalized copy on its purchases.
+        
+        `version` is the client's `name_version` the name was read with; purchases
+        already holding a newer name are left alone, so concurrent syncs of quick
+        successive renames can finish in any order.
+        """
+        result = await self.db.purchases.update_many(
+            {"cliente_id": client_id, "cliente_nombre_version": {"$not": {"$gt": version}}},
+            {
+                "$set": {
+                    "cliente_nombre": nombre,
+                    "cliente_apellido": apellido,
+                    "cliente_nombre_version": version,
+                    "updated_at": datetime.utcnow()
+                }
+            }
+        )
+        if result.modified_count:
+            await notify_change("purchases", self.db)
+        return result.modified_count
+    
+    async def backfill_client_names(self) -> int:
+        """Fill client names on purchases stored before they were denormalized."""
+        updated = 0
+        client_ids = await self.db.purchases.distinct(
+            "cliente_id", {"cliente_nombre": {"$exists": False}}
         )
+        async for client in self.db.clients.find(
+            {"_id": {"$in": client_ids}}, {"nombre": 1, "apellido": 1, "name_version": 1}
+        ):
+            updated += await self.sync_client_names(
+                client["_id"], client.get("nombre"), client.get("apellido"), client.get("name_version", 0)
+            )
+        return updated
+    
+    async def backfill_product_ids(self) -> int:
+        """Set `product_id` on purchases that only reference their product by name."""
+        updated = 0
+        names = await self.db.purchases.distinct(
+            "producto_comprado", {"product_id": {"$in": [None]}}
+        )
+        async for product in self.db.products.find(
+            {"nombre_producto": {"$in": names}}, {"nombre_producto": 1}
+        ):
+            result = await self.db.purchases.update_many(
+                {"producto_comprado": product["nombre_producto"], "product_id": {"$in": [None]}},
+                {"$set": {"product_id": product["_id"], "updated_at": datetime.utcnow()}}
+            )
+            updated += result.modified_count
+        if updated:
+            await notify_change("purchases", self.db)
+        return updated
+    
+    async def _resolve_product(self, product_id: Optional[str], product_name: str) -> Optional[Dict[str, Any]]:
+        """Find the purchased product by ID, falling back to its name."""
+        projection = {"nombre_producto": 1}
+        if product_id:
+            product = await self.db.products.find_one({"_id": product_id}, projection)
+            if not product:
+                raise ValueError("Product not found")
+            return product
+        
+        return await self.db.products.find_one({"nombre_producto": product_name}, projection)
+    
+    async def _update_product_stock(self, product_id: str, quantity_sold: int, purchase_id: str):
+        """Take the sold units from the product's stock (recorded as a sale in the stock ledger).
+        
+        Raises ValueError if the product doesn't have `quantity_sold` units left.
+        """
+        await self.stock_ledger.record(product_id, -quantity_sold, "sale", reference=purchase_id)
 
 
 # Global service instance
@@ -0,0 +1,261 @@
+"""
+Daily sales rollup maintained on purchase writes.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Dict, Any
+from zoneinfo import ZoneInfo
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+from ..core.config import settings
+from ..core.database import get_database
+from ..utils.changes import notify_change
+
+EMPTY_TOTALS = {"ventas": 0, "unidades": 0, "ingresos": 0}
+
+CHART_GRANULARITIES = ("day", "week", "month")
+
+BUSINESS_TZ = ZoneInfo(settings.business_timezone)
+
+
+def day_bucket(fecha: datetime) -> datetime:
+    """Truncate a date to midnight."""
+    return fecha.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def business_day(fecha: datetime) -> datetime:
+    """Rollup day of a (naive UTC) timestamp: its date in the business timezone, as naive midnight."""
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return day_bucket(fecha.astimezone(BUSINESS_TZ).replace(tzinfo=None))
+
+
+def business_today() -> datetime:
+    """Today's rollup day."""
+    return business_day(datetime.utcnow())
+
+
+def business_day_start(day: datetime) -> datetime:
+    """Naive UTC instant at which a rollup day starts, for filtering raw timestamps."""
+    return day.replace(tzinfo=BUSINESS_TZ).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_start(day: datetime, granularity: str) -> datetime:
+    """First rollup day of the day/week (Monday)/month bucket containing `day`."""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def iter_buckets(start: datetime, end: datetime, granularity: str) -> Iterator[datetime]:
+    """Bucket starts covering `start`..`end`, oldest first."""
+    bucket = bucket_start(day_bucket(start), granularity)
+    while bucket <= end:
+        yield bucket
+        if granularity == "month":
+            bucket = (bucket.replace(day=28) + timedelta(days=4)).replace(day=1)
+        elif granularity == "week":
+            bucket += timedelta(days=7)
+        else:
+            bucket += timedelta(days=1)
+
+
+class SalesRollupService:
+    """Maintains the `sales_daily` collection.
+    
+    Two kinds of documents live in the collection, both keyed by `day`:
+    day totals (`product` is None) and per-product day totals. Each holds
+    `ventas` (purchase count), `unidades` (units sold) and `ingresos` (revenue).
+    `day` is the purchase date in the business timezone, stored as naive midnight;
+    range arguments below are in the same day space (see `business_today`).
+    """
+    
+    def __init__(self, db: AsyncIOMotorDatabase = None):
+        self.db = db if db is not None else get_database()
+    
+    async def record_purchase(self, purchase: Dict[str, Any], sign: int = 1):
+        """Apply a purchase to the rollup (`sign=-1` reverts it)."""
+        day = business_day(purchase["fecha"])
+        inc = {
+            "ventas": sign,
+            "unidades": sign * purchase["cantidad"],
+            "ingresos": sign * purchase["total"]
+        }
+        await self._apply({"day": day, "product": None}, {"$inc": inc})
+        
+        product_update: Dict[str, Any] = {"$inc": inc}
+        if purchase.get("product_id"):
+            # Carry the primary key so readers can join products by _id
+            product_update["$max"] = {"product_id": purchase["product_id"]}
+        await self._apply({"day": day, "product": purchase["producto_comprado"]}, product_update)
+    
+    async def _apply(self, key: Dict[str, Any], update: Dict[str, Any]):
+        """Upsert one rollup document."""
+        try:
+            await self.db.sales_daily.update_one(key, update, upsert=True)
+        except DuplicateKeyError:
+            # Lost an upsert race against a concurrent writer; the doc exists now
+            await self.db.sales_daily.update_one(key, update)
+    
+    async def rebuild(self) -> int:
+        """Recompute the whole rollup from the purchases collection.
+        
+        Both document kinds are produced by one aggregation and written with
+        `$out`, which builds a temporary collection and swaps it in atomically
+        (keeping the indexes), so readers never see a partial rollup. Purchases
+        written while the aggregation runs may be missing from the result; run
+        the rebuild while writes are paused.
+        """
+        local_date = {"date": "$fecha", "timezone": settings.business_timezone}
+        day_expr = {
+            "$dateFromParts": {
+                "year": {"$year": local_date},
+                "month": {"$month": local_date},
+                "day": {"$dayOfMonth": local_date}
+            }
+        }
+        totals = {
+            "ventas": {"$sum": 1},
+            "unidades": {"$sum": "$cantidad"},
+            "ingresos": {"$sum": "$total"}
+        }
+        project = {
+            "_id": 0,
+            "day": "$_id.day",
+            "product": "$_id.product",
+            "ventas": 1,
+            "unidades": 1,
+            "ingresos": 1,
+            "product_id": 1
+        }
+        
+        day_stages = [
+            {"$group": {"_id": {"day": day_expr, "product": None}, **totals}},
+            {"$project": project}
+        ]
+        product_stages = [
+            {
+                "$group": {
+                    "_id": {"day": day_expr, "product": "$producto_comprado"},
+                    **totals,
+                    "product_id": {"$max": "$product_id"}
+                }
+            },
+            {"$project": project}
+        ]
+        pipeline = [
+            *day_stages,
+            {"$unionWith": {"coll": "purchases", "pipeline": product_stages}},
+            {"$out": "sales_daily"}
+        ]
+        await self.db.purchases.aggregate(pipeline).to_list(length=None)
+        # Sales analytics are versioned (ETags) under "purchases"
+        await notify_change("purchases", self.db)
+        
+        return await self.db.sales_daily.count_documents({})
+    
+    def _totals_stages(self, start: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Pipeline stages summing the day totals, optionally from `start` onwards."""
+        match: Dict[str, Any] = {"product": None}
+        if start is not None:
+            match["day"] = {"$gte": day_bucket(start)}
+        
+        return [
+            {"$match": match},
+            {
+                "$group": {
+                    "_id": None,
+                    "ventas": {"$sum": "$ventas"},
+                    "unidades": {"$sum": "$unidades"},
+                    "ingresos": {"$sum": "$ingresos"}
+                }
+            }
+        ]
+    
+    def _product_stages(self, limit: int, month_start: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Pipeline stages ranking products by units sold."""
+        group: Dict[str, Any] = {
+            "_id": "$product",
+            "product_id": {"$max": "$product_id"},
+            "total_vendido": {"$sum": "$unidades"},
+            "ingresos": {"$sum": "$ingresos"}
+        }
+        if month_start is not None:
+            group["ventas_ultimo_mes"] = {
+                "$sum": {"$cond": [{"$gte": ["$day", day_bucket(month_start)]}, "$unidades", 0]}
+            }
+        
+        return [
+            {"$match": {"product": {"$ne": None}}},
+            {"$group": group},
+            {"$sort": {"total_vendido": -1}},
+            {"$limit": limit}
+        ]
+    
+    async def get_totals(self, start: Optional[datetime] = None) -> Dict[str, Any]:
+        """Sum the day totals, optionally from `start` onwards."""
+        pipeline = self._totals_stages(start)
+        result = await self.db.sales_daily.aggregate(pipeline).to_list(length=1)
+        return result[0] if result else dict(EMPTY_TOTALS)
+    
+    async def get_summary(self, month_start: datetime, top_products: int = 0) -> Dict[str, Any]:
+        """All-time totals, totals since `month_start` and optionally the top products.
+        
+        Runs as a single `$facet` aggregation, i.e. one round trip.
+        """
+        facets: Dict[str, Any] = {
+            "totals": self._totals_stages(),
+            "monthly": self._totals_stages(month_start)
+        }
+        if top_products:
+            facets["top_products"] = self._product_stages(top_products)
+        
+        result = await self.db.sales_daily.aggregate([{"$facet": facets}]).to_list(length=1)
+        facet = result[0]
+        return {
+            "totals": facet["totals"][0] if facet["totals"] else dict(EMPTY_TOTALS),
+            "monthly": facet["monthly"][0] if facet["monthly"] else dict(EMPTY_TOTALS),
+            "top_products": facet.get("top_products", [])
+        }
+    
+    async def get_daily_totals(self, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+        """Day total documents between `start` and `end` (inclusive), oldest first."""
+        cursor = self.db.sales_daily.find(
+            {"product": None, "day": {"$gte": day_bucket(start), "$lte": day_bucket(end)}}
+        ).sort("day", 1)
+        return await cursor.to_list(length=None)
+    
+    async def get_bucket_totals(
+        self,
+        start: datetime,
+        end: datetime,
+        granularity: str = "day"
+    ) -> Dict[datetime, Dict[str, Any]]:
+        """Day totals between `start` and `end` folded into day/week/month buckets.
+        
+        At most one small document per day is read, so a yearly range stays cheap.
+        """
+        buckets: Dict[datetime, Dict[str, Any]] = {}
+        cursor = self.db.sales_daily.find(
+            {"product": None, "day": {"$gte": day_bucket(start), "$lte": day_bucket(end)}},
+            {"day": 1, "ventas": 1, "unidades": 1, "ingresos": 1}
+        )
+        async for day_totals in cursor:
+            bucket = buckets.setdefault(bucket_start(day_totals["day"], granularity), dict(EMPTY_TOTALS))
+            for field in EMPTY_TOTALS:
+                bucket[field] += day_totals.get(field, 0)
+        return buckets
+    
+    async def get_product_totals(
+        self,
+        limit: int = 10,
+        month_start: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Best selling products by units, with optional units sold since `month_start`."""
+        pipeline = self._product_stages(limit, month_start)
+        return await self.db.sales_daily.aggregate(pipeline).to_list(length=limit)
+
+
+# Global service instance
+sales_rollup_service = SalesRollupService()
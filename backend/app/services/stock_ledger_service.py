@@ -0,0 +1,457 @@
+"""
+Append-only stock movement ledger with periodic compaction.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from ..models.stock_movement import (
+    StockMovement,
+    StockVelocity,
+    StockReconciliation,
+    StockAdjustmentItem,
+    StockAdjustmentResult,
+    StockAdjustmentError,
+    StockAdjustmentResponse
+)
+from ..core.config import settings
+from ..core.database import get_database
+from ..utils.changes import notify_change
+from .sales_rollup_service import day_bucket
+
+logger = logging.getLogger(__name__)
+
+# Ledger days are UTC calendar days; this is `ledger_day` evaluated by MongoDB
+# (its date operators work in UTC unless given a timezone)
+LEDGER_DAY_EXPR = {
+    "$dateFromParts": {
+        "year": {"$year": "$at"},
+        "month": {"$month": "$at"},
+        "day": {"$dayOfMonth": "$at"}
+    }
+}
+
+
+def ledger_day(at: datetime) -> datetime:
+    """Ledger day (UTC midnight) of a naive UTC timestamp; snapshots are keyed by it."""
+    return day_bucket(at)
+
+
+def stock_transition(before: int, after: int, minimum: int) -> Optional[str]:
+    """Classify how a stock change crossed the low-stock / out-of-stock thresholds."""
+    if before > 0 and after <= 0:
+        return "out_of_stock"
+    if before > minimum >= after:
+        return "low_stock"
+    if before <= minimum < after:
+        return "recovered"
+    return None
+
+
+class StockLedgerService:
+    """Records every stock change as a movement in `stock_movements`.
+    
+    Each change bumps the product's `ledger_seq` in the same atomic update as
+    its `stock_actual`, and the movement is stored under `<product_id>:<seq>`
+    with the resulting balance. Compaction folds movements older than the
+    retention window into per-day `stock_snapshots`.
+    """
+    
+    def __init__(self, db: AsyncIOMotorDatabase = None):
+        self.db = db if db is not None else get_database()
+    
+    async def record(
+        self,
+        product_id: str,
+        delta: int,
+        kind: str,
+        reference: Optional[str] = None
+    ) -> Optional[StockMovement]:
+        """Apply `delta` to the product's stock and append the movement.
+        
+        Returns None if the product doesn't exist and raises ValueError if a
+        decrement would take the stock below zero.
+        """
+        query: Dict[str, Any] = {"_id": product_id}
+        if delta < 0:
+            query["stock_actual"] = {"$gte": -delta}
+        product = await self.db.products.find_one_and_update(
+            query,
+            {"$inc": {"stock_actual": delta, "ledger_seq": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            projection={"stock_actual": 1, "ledger_seq": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not product:
+            if "stock_actual" in query and await self.db.products.count_documents({"_id": product_id}, limit=1):
+                raise ValueError("Insufficient stock")
+            return None
+        return await self._append(product, delta, kind, reference)
+    
+    async def set_balance(
+        self,
+        product_id: str,
+        balance: int,
+        kind: str = "adjustment",
+        reference: Optional[str] = None
+    ) -> Optional[StockMovement]:
+        """Set the product's stock to `balance`, recording the difference."""
+        previous = await self.db.products.find_one_and_update(
+            {"_id": product_id},
+            {"$set": {"stock_actual": balance, "updated_at": datetime.utcnow()}, "$inc": {"ledger_seq": 1}},
+            projection={"stock_actual": 1, "ledger_seq": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if not previous:
+            return None
+        
+        product = {
+            "_id": product_id,
+            "stock_actual": balance,
+            "ledger_seq": previous.get("ledger_seq", 0) + 1
+        }
+        return await self._append(product, balance - previous.get("stock_actual", 0), kind, reference)
+    
+    async def apply_adjustments(
+        self,
+        items: List[StockAdjustmentItem],
+        reference: Optional[str] = None
+    ) -> StockAdjustmentResponse:
+        """Apply many stock deltas with one unordered bulk write.
+        
+        Products are resolved (by ID or name) in one query, and lines for the same
+        product are merged. Each update is conditional on the `ledger_seq` that was
+        read, so the balance it produced is known exactly and its movement can be
+        appended with `insert_many`. Updates that lost a race with a concurrent
+        writer (detected through a per-batch marker) fall back to `record`.
+        """
+        ids = [item.product_id for item in items if item.product_id]
+        names = [item.nombre_producto for item in items if not item.product_id]
+        projection = {"nombre_producto": 1, "stock_actual": 1, "stock_minimo": 1, "ledger_seq": 1}
+        products = await self.db.products.find(
+            {"$or": [{"_id": {"$in": ids}}, {"nombre_producto": {"$in": names}}]}, projection
+        ).to_list(length=None)
+        by_id = {product["_id"]: product for product in products}
+        by_name = {product["nombre_producto"]: product for product in products}
+        
+        errors: List[StockAdjustmentError] = []
+        deltas: Dict[str, int] = {}
+        for item in items:
+            product = by_id.get(item.product_id) if item.product_id else by_name.get(item.nombre_producto)
+            if not product:
+                errors.append(StockAdjustmentError(**item.model_dump(), error="Product not found"))
+                continue
+            deltas[product["_id"]] = deltas.get(product["_id"], 0) + item.delta
+        
+        for product_id, delta in list(deltas.items()):
+            product = by_id[product_id]
+            if product.get("stock_actual", 0) + delta < 0:
+                del deltas[product_id]
+                errors.append(StockAdjustmentError(
+                    product_id=product_id,
+                    nombre_producto=product["nombre_producto"],
+                    delta=delta,
+                    error="Insufficient stock"
+                ))
+        
+        if not deltas:
+            return StockAdjustmentResponse(results=[], errors=errors)
+        
+        batch_id = uuid.uuid4().hex
+        operations = [
+            UpdateOne(
+                {"_id": product_id, "ledger_seq": by_id[product_id].get("ledger_seq", 0)}
+                if "ledger_seq" in by_id[product_id]
+                else {"_id": product_id, "ledger_seq": {"$exists": False}},
+                {
+                    "$inc": {"stock_actual": delta, "ledger_seq": 1},
+                    "$set": {"updated_at": datetime.utcnow()},
+                    "$push": {"ledger_batches": {"$each": [batch_id], "$slice": -10}}
+                }
+            )
+            for product_id, delta in deltas.items()
+        ]
+        await self.db.products.bulk_write(operations, ordered=False)
+        
+        # Which conditional updates applied? One read-back for the whole batch
+        applied = set()
+        async for product in self.db.products.find(
+            {"_id": {"$in": list(deltas)}, "ledger_batches": batch_id}, {"_id": 1}
+        ):
+            applied.add(product["_id"])
+        
+        movements = []
+        results: List[StockAdjustmentResult] = []
+        for product_id, delta in deltas.items():
+            product = by_id[product_id]
+            before = product.get("stock_actual", 0)
+            kind = "restock" if delta > 0 else "adjustment"
+            
+            if product_id in applied:
+                after = before + delta
+                movements.append(self._movement(
+                    product_id, product.get("ledger_seq", 0) + 1, kind, delta, after, reference
+                ))
+            else:
+                try:
+                    movement = await self.record(product_id, delta, kind, reference=reference)
+                except ValueError as e:
+                    errors.append(StockAdjustmentError(
+                        product_id=product_id,
+                        nombre_producto=product["nombre_producto"],
+                        delta=delta,
+                        error=str(e)
+                    ))
+                    continue
+                if not movement:
+                    errors.append(StockAdjustmentError(product_id=product_id, delta=delta, error="Product not found"))
+                    continue
+                before, after = movement.balance - delta, movement.balance
+            
+            minimum = product.get("stock_minimo", 0)
+            results.append(StockAdjustmentResult(
+                product_id=product_id,
+                nombre_producto=product["nombre_producto"],
+                delta=delta,
+                stock_anterior=before,
+                stock_actual=after,
+                stock_minimo=minimum,
+                transition=stock_transition(before, after, minimum)
+            ))
+        
+        if movements:
+            await self.db.stock_movements.insert_many(movements, ordered=False)
+        if results:
+            await notify_change("products", self.db)
+        
+        return StockAdjustmentResponse(results=results, errors=errors)
+    
+    def initial_movement(self, product_id: str, balance: int) -> Dict[str, Any]:
+        """Movement document for a newly created product (stored with `ledger_seq=1`)."""
+        return self._movement(product_id, 1, "initial", balance, balance, None)
+    
+    async def _append(
+        self,
+        product: Dict[str, Any],
+        delta: int,
+        kind: str,
+        reference: Optional[str]
+    ) -> StockMovement:
+        movement = self._movement(
+            product["_id"], product["ledger_seq"], kind, delta, product["stock_actual"], reference
+        )
+        await self.db.stock_movements.insert_one(movement)
+        await notify_change("products", self.db)
+        return StockMovement(**movement)
+    
+    def _movement(
+        self,
+        product_id: str,
+        seq: int,
+        kind: str,
+        delta: int,
+        balance: int,
+        reference: Optional[str]
+    ) -> Dict[str, Any]:
+        return {
+            "_id": f"{product_id}:{seq}",
+            "product_id": product_id,
+            "seq": seq,
+            "kind": kind,
+            "delta": delta,
+            "balance": balance,
+            "reference": reference,
+            "at": datetime.utcnow()
+        }
+    
+    async def get_movements(self, product_id: str, limit: int = 100) -> List[StockMovement]:
+        """Most recent movements for a product."""
+        cursor = self.db.stock_movements.find({"product_id": product_id}).sort("seq", -1).limit(limit)
+        movements = await cursor.to_list(length=limit)
+        return [StockMovement(**movement) for movement in movements]
+    
+    async def compact(self, retention_days: int = None) -> int:
+        """Fold movements older than the retention window into daily snapshots.
+        
+        Snapshots are keyed by (product_id, day) and accumulate per-kind totals,
+        the movement count, and the closing balance/seq of the day. A group is
+        only applied if its snapshot doesn't cover its first seq yet: the check
+        is part of the upsert filter, and the unique (product_id, day) index
+        rejects a second insert. Groups already covered by a concurrent or
+        earlier failed run are only deleted, so overlapping runs (several
+        workers, the script) never double count.
+        
+        Groups are applied day by day, so each product's snapshots always cover
+        a prefix of its seqs. Readers skip movements at or below the highest
+        snapshot `last_seq`, which keeps totals right if a run stops between a
+        snapshot upsert and the delete of its movements.
+        """
+        retention_days = retention_days or settings.stock_ledger_retention_days
+        # A whole ledger day, so no day is split between a snapshot and movements
+        cutoff = ledger_day(datetime.utcnow() - timedelta(days=retention_days))
+        
+        pipeline = [
+            {"$match": {"at": {"$lt": cutoff}}},
+            {"$sort": {"seq": 1}},
+            {
+                "$group": {
+                    "_id": {"product_id": "$product_id", "day": LEDGER_DAY_EXPR},
+                    "vendidas": {"$sum": {"$cond": [{"$eq": ["$kind", "sale"]}, {"$multiply": ["$delta", -1]}, 0]}},
+                    "repuestas": {"$sum": {"$cond": [{"$in": ["$kind", ["restock", "initial"]]}, "$delta", 0]}},
+                    "ajustes": {"$sum": {"$cond": [{"$eq": ["$kind", "adjustment"]}, "$delta", 0]}},
+                    "movimientos": {"$sum": 1},
+                    "first_seq": {"$first": "$seq"},
+                    "last_seq": {"$last": "$seq"},
+                    "closing_balance": {"$last": "$balance"},
+                    "ids": {"$push": "$_id"}
+                }
+            },
+            {"$sort": {"_id.day": 1}}
+        ]
+        
+        compacted = 0
+        async for group in self.db.stock_movements.aggregate(pipeline, allowDiskUse=True):
+            key = group["_id"]
+            try:
+                await self.db.stock_snapshots.update_one(
+                    {
+                        "product_id": key["product_id"],
+                        "day": key["day"],
+                        "last_seq": {"$not": {"$gte": group["first_seq"]}}
+                    },
+                    {
+                        "$inc": {
+                            "vendidas": group["vendidas"],
+                            "repuestas": group["repuestas"],
+                            "ajustes": group["ajustes"],
+                            "movimientos": group["movimientos"]
+                        },
+                        "$max": {"last_seq": group["last_seq"]},
+                        "$set": {"closing_balance": group["closing_balance"]}
+                    },
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # The snapshot already covers this group
+                pass
+            result = await self.db.stock_movements.delete_many({"_id": {"$in": group["ids"]}})
+            compacted += result.deleted_count
+        
+        return compacted
+    
+    async def run_compaction_loop(self):
+        """Compact the ledger every `stock_ledger_compaction_hours` hours."""
+        interval = settings.stock_ledger_compaction_hours * 3600
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                compacted = await self.compact()
+                logger.info("Compacted %s stock movements", compacted)
+            except Exception as e:
+                logger.error("Stock ledger compaction failed: %s", e)
+    
+    async def get_velocity(self, product_id: str, days: int = 30) -> StockVelocity:
+        """Units sold/restocked/adjusted over the last `days` days.
+        
+        Reads snapshots for the compacted part of the window and raw movements
+        for the rest.
+        """
+        start = ledger_day(datetime.utcnow() - timedelta(days=days - 1))
+        covered = await self._covered_seq(product_id)
+        
+        snapshot_pipeline = [
+            {"$match": {"product_id": product_id, "day": {"$gte": start}}},
+            {
+                "$group": {
+                    "_id": None,
+                    "vendidas": {"$sum": "$vendidas"},
+                    "repuestas": {"$sum": "$repuestas"},
+                    "ajustes": {"$sum": "$ajustes"}
+                }
+            }
+        ]
+        movement_pipeline = [
+            {"$match": {"product_id": product_id, "at": {"$gte": start}, "seq": {"$gt": covered}}},
+            {
+                "$group": {
+                    "_id": None,
+                    "vendidas": {"$sum": {"$cond": [{"$eq": ["$kind", "sale"]}, {"$multiply": ["$delta", -1]}, 0]}},
+                    "repuestas": {"$sum": {"$cond": [{"$in": ["$kind", ["restock", "initial"]]}, "$delta", 0]}},
+                    "ajustes": {"$sum": {"$cond": [{"$eq": ["$kind", "adjustment"]}, "$delta", 0]}}
+                }
+            }
+        ]
+        snapshots, movements = await asyncio.gather(
+            self.db.stock_snapshots.aggregate(snapshot_pipeline).to_list(length=1),
+            self.db.stock_movements.aggregate(movement_pipeline).to_list(length=1)
+        )
+        
+        totals = {"vendidas": 0, "repuestas": 0, "ajustes": 0}
+        for result in (snapshots, movements):
+            if result:
+                for field in totals:
+                    totals[field] += result[0][field]
+        
+        return StockVelocity(
+            product_id=product_id,
+            days=days,
+            unidades_vendidas=totals["vendidas"],
+            unidades_repuestas=totals["repuestas"],
+            ajustes=totals["ajustes"],
+            ventas_diarias=round(totals["vendidas"] / days, 3)
+        )
+    
+    async def reconcile(self, product_id: str) -> Optional[StockReconciliation]:
+        """Check the product's stock against the latest ledger balance and seq gaps."""
+        product = await self.db.products.find_one(
+            {"_id": product_id}, {"stock_actual": 1, "ledger_seq": 1}
+        )
+        if not product:
+            return None
+        
+        last_seq = product.get("ledger_seq", 0)
+        covered = await self._covered_seq(product_id)
+        latest, snapshot, movement_count, snapshot_count = await asyncio.gather(
+            self.db.stock_movements.find_one({"product_id": product_id}, sort=[("seq", -1)]),
+            self.db.stock_snapshots.find_one({"product_id": product_id}, sort=[("last_seq", -1)]),
+            self.db.stock_movements.count_documents({"product_id": product_id, "seq": {"$gt": covered}}),
+            self._snapshot_movement_count(product_id)
+        )
+        
+        if latest is not None:
+            ledger_balance = latest["balance"]
+        elif snapshot is not None:
+            ledger_balance = snapshot["closing_balance"]
+        else:
+            ledger_balance = None
+        
+        missing = max(last_seq - movement_count - snapshot_count, 0)
+        return StockReconciliation(
+            product_id=product_id,
+            stock_actual=product.get("stock_actual", 0),
+            ledger_balance=ledger_balance,
+            last_seq=last_seq,
+            missing_movements=missing,
+            consistent=missing == 0 and ledger_balance in (None, product.get("stock_actual", 0))
+        )
+    
+    async def _covered_seq(self, product_id: str) -> int:
+        """Highest seq folded into a snapshot; movements up to it may still await deletion."""
+        snapshot = await self.db.stock_snapshots.find_one(
+            {"product_id": product_id}, {"last_seq": 1}, sort=[("last_seq", -1)]
+        )
+        return snapshot["last_seq"] if snapshot else 0
+    
+    async def _snapshot_movement_count(self, product_id: str) -> int:
+        result = await self.db.stock_snapshots.aggregate([
+            {"$match": {"product_id": product_id}},
+            {"$group": {"_id": None, "movimientos": {"$sum": "$movimientos"}}}
+        ]).to_list(length=1)
+        return result[0]["movimientos"] if result else 0
+
+
+# Global service instance
+stock_ledger_service = StockLedgerService()
@@ -2,19 +2,23 @@
 Stock/Product service with business logic.
 """
 import uuid
-import os
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from ..models.product import Product, ProductCreate, ProductUpdate, ProductSalesStats, StockAlert
 from ..core.database import get_database
+from ..utils.changes import notify_change
+from .sales_rollup_service import SalesRollupService, business_today
+from .stock_ledger_service import StockLedgerService
 
 
 class StockService:
     """Stock/Product service for business logic."""
     
     def __init__(self, db: AsyncIOMotorDatabase = None):
-        self.db = db or get_database()
+        self.db = db if db is not None else get_database()
+        self.sales_rollup = SalesRollupService(self.db)
+        self.ledger = StockLedgerService(self.db)
     
     async def create_product(self, product_data: ProductCreate) -> Product:
         """Create a new product."""
@@ -30,10 +34,16 @@ class StockService:
             "_id": str(uuid.uuid4()),
             "stock_actual": product_dict.pop("stock_inicial", 0),
             "fecha_creacion": datetime.utcnow(),
-            "imagen_url": None
+            "imagen_url": None,
+            "ledger_seq": 1,
+            "updated_at": datetime.utcnow()
         })
         
         await self.db.products.insert_one(product_dict)
+        await self.db.stock_movements.insert_one(
+            self.ledger.initial_movement(product_dict["_id"], product_dict["stock_actual"])
+        )
+        await notify_change("products", self.db)
         return Product(**product_dict)
     
     async def get_product(self, product_id: str) -> Optional[Product]:
@@ -63,47 +73,70 @@ class StockService:
             if existing_product:
                 raise ValueError("Product name already exists")
         
+        # Stock levels only change through the ledger
+        if "stock_actual" in update_data:
+            movement = await self.ledger.set_balance(product_id, update_data.pop("stock_actual"))
+            if not movement:
+                return None
+            if not update_data:
+                return await self.get_product(product_id)
+        
         result = await self.db.products.update_one(
             {"_id": product_id},
-            {"$set": update_data}
+            {"$set": {**update_data, "updated_at": datetime.utcnow()}}
         )
         
-        if result.modified_count:
+        if result.matched_count:
+            await notify_change("products", self.db)
             return await self.get_product(product_id)
         return None
     
     async def delete_product(self, product_id: str) -> bool:
         """Delete product."""
         result = await self.db.products.delete_one({"_id": product_id})
+        if result.deleted_count:
+            await notify_change("products", self.db)
         return result.deleted_count > 0
     
-    async def upload_product_image(self, product_id: str, image_path: str) -> Optional[Product]:
+    async def upload_product_image(
+        self,
+        product_id: str,
+        image_path: str,
+        image_hash: Optional[str] = None
+    ) -> Optional[Product]:
         """Update product image URL."""
         result = await self.db.products.update_one(
             {"_id": product_id},
-            {"$set": {"imagen_url": image_path}}
+            {"$set": {"imagen_url": image_path, "imagen_hash": image_hash, "updated_at": datetime.utcnow()}}
         )
         
-        if result.modified_count:
+        if result.matched_count:
+            await notify_change("products", self.db)
             return await self.get_product(product_id)
         return None
     
-    async def get_low_stock_products(self) -> List[Product]:
-        """Get products with low stock."""
-        cursor = self.db.products.find({
+    def low_stock_products_cursor(self):
+        """Cursor over products at or below their minimum stock."""
+        return self.db.products.find({
             "$expr": {"$lte": ["$stock_actual", "$stock_minimo"]}
         })
-        products = await cursor.to_list(length=None)
+    
+    async def get_low_stock_products(self) -> List[Product]:
+        """Get products with low stock."""
+        products = await self.low_stock_products_cursor().to_list(length=None)
         return [Product(**product) for product in products]
     
     async def get_stock_alerts(self) -> List[StockAlert]:
         """Get stock alerts."""
+        return self.build_stock_alerts(await self.get_low_stock_products())
+    
+    def build_stock_alerts(self, low_stock_products: List[Product]) -> List[StockAlert]:
+        """Stock alerts from an already loaded list of low-stock products."""
         alerts = []
         
         # Low stock alerts
-        low_stock_products = await self.get_low_stock_products()
         for product in low_stock_products:
-            if product.stock_actual == 0:
+            if product.stock_actual <= 0:
                 alert_type = "out_of_stock"
                 message = f"Producto '{product.nombre_producto}' sin stock"
             else:
@@ -120,43 +153,30 @@ class StockService:
     
     async def get_product_sales_stats(self, limit: int = 10) -> List[ProductSalesStats]:
         """Get product sales statistics."""
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$producto_comprado",
-                    "total_vendido": {"$sum": "$cantidad"},
-                    "ingresos_totales": {"$sum": "$total"},
-                    "ventas_ultimo_mes": {
-                        "$sum": {
-                            "$cond": [
-                                {
-                                    "$gte": [
-                                        "$fecha",
-                                        datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                                    ]
-                                },
-                                "$cantidad",
-                                0
-                            ]
-                        }
-                    }
-                }
-            },
-            {"$sort": {"total_vendido": -1}},
-            {"$limit": limit}
-        ]
+        month_start = business_today().replace(day=1)
+        sales_data = await self.sales_rollup.get_product_totals(limit=limit, month_start=month_start)
         
-        sales_data = await self.db.purchases.aggregate(pipeline).to_list(length=limit)
+        # Resolve every product in one query, by primary key where the rollup has it
+        product_ids = [data["product_id"] for data in sales_data if data.get("product_id")]
+        product_names = [data["_id"] for data in sales_data if not data.get("product_id")]
+        cursor = self.db.products.find({
+            "$or": [
+                {"_id": {"$in": product_ids}},
+                {"nombre_producto": {"$in": product_names}}
+            ]
+        })
+        products = await cursor.to_list(length=None)
+        products_by_id = {product["_id"]: product for product in products}
+        products_by_name = {product["nombre_producto"]: product for product in products}
         
         result = []
         for data in sales_data:
-            # Get product info
-            product = await self.db.products.find_one({"nombre_producto": data["_id"]})
+            product = products_by_id.get(data.get("product_id")) or products_by_name.get(data["_id"])
             if product:
                 result.append(ProductSalesStats(
                     product=Product(**product),
                     total_vendido=data["total_vendido"],
-                    ingresos_totales=data["ingresos_totales"],
+                    ingresos_totales=data["ingresos"],
                     ventas_ultimo_mes=data["ventas_ultimo_mes"]
                 ))
         
@@ -165,17 +185,7 @@ class StockService:
     async def get_stock_chart_data(self) -> Dict[str, Any]:
         """Get stock chart data."""
         # Most sold products
-        most_sold_pipeline = [
-            {
-                "$group": {
-                    "_id": "$producto_comprado",
-                    "total_vendido": {"$sum": "$cantidad"}
-                }
-            },
-            {"$sort": {"total_vendido": -1}},
-            {"$limit": 10}
-        ]
-        most_sold = await self.db.purchases.aggregate(most_sold_pipeline).to_list(length=10)
+        most_sold = await self.sales_rollup.get_product_totals(limit=10)
         
         # Current stock levels
         products = await self.get_products(limit=20)
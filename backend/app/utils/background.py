@@ -0,0 +1,36 @@
+"""
+Fire-and-forget background task helpers.
+"""
+import asyncio
+import logging
+from typing import Any, Coroutine, Set
+
+logger = logging.getLogger(__name__)
+
+# Strong references to running tasks so they are not garbage collected
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _on_task_done(task: asyncio.Task):
+    """Release the task reference and log unexpected failures."""
+    _background_tasks.discard(task)
+    if task.cancelled():
+        return
+    
+    exc = task.exception()
+    if exc is not None:
+        logger.error("Background task %s failed: %s", task.get_name(), exc)
+
+
+def run_in_background(coro: Coroutine[Any, Any, Any], name: str = None) -> asyncio.Task:
+    """Schedule a coroutine on the running loop without awaiting it."""
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_task_done)
+    return task
+
+
+async def drain_background_tasks():
+    """Wait for all pending background tasks (used on shutdown and in scripts)."""
+    while _background_tasks:
+        await asyncio.gather(*list(_background_tasks), return_exceptions=True)
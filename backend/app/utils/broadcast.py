@@ -0,0 +1,44 @@
+"""
+In-process publish/subscribe fan-out for live update streams.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Set, Tuple
+
+Event = Tuple[str, Any]
+
+
+class Broadcaster:
+    """Fans published events out to one bounded queue per subscriber.
+    
+    A subscriber that falls `queue_size` events behind has its backlog dropped
+    and receives a single "resync" event, so one slow client never holds
+    memory or blocks publishers.
+    """
+    
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Set["asyncio.Queue[Event]"] = set()
+    
+    def publish(self, event: str, data: Any = None):
+        """Queue an event for every current subscriber."""
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("resync", None))
+    
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator["asyncio.Queue[Event]"]:
+        """Register a subscriber queue for the duration of the block."""
+        queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+    
+    def __len__(self) -> int:
+        return len(self._subscribers)
@@ -0,0 +1,159 @@
+"""
+In-process caching utilities.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from .background import run_in_background
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Size-bounded LRU cache with optional per-entry TTL."""
+    
+    def __init__(self, maxsize: int = 1024, ttl_seconds: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value and mark it as recently used."""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store a value, evicting the least recently used entries if full."""
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a key and return its value."""
+        entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+    
+    def clear(self):
+        """Drop every entry."""
+        self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/eviction counters."""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class SingleFlightCache:
+    """
+    Async cache that coalesces concurrent loads of the same key.
+    
+    Entries are fresh for `ttl_seconds`; for a further `stale_seconds` the old
+    value is served while a single background load refreshes it. `invalidate`
+    drops every entry and detaches in-flight loads so their results are not
+    stored.
+    """
+    
+    def __init__(self, ttl_seconds: float, stale_seconds: float = 0):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+    
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """
+        Return `(value, state)` where state is "hit", "stale", "coalesced" or "miss".
+        
+        Only one `loader()` call runs per key at a time; other callers await it.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl_seconds:
+                self.hits += 1
+                return value, "hit"
+            if age < self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self._load(key, loader)
+                return value, "stale"
+        
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            state = "coalesced"
+        else:
+            self.misses += 1
+            state = "miss"
+            task = self._load(key, loader)
+        
+        # Shield so a disconnecting caller does not cancel the load for everyone else
+        return await asyncio.shield(task), state
+    
+    def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        generation = self._generation
+        
+        async def load() -> Any:
+            try:
+                value = await loader()
+                if generation == self._generation:
+                    self._entries[key] = (value, time.monotonic())
+                return value
+            finally:
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+        
+        task = run_in_background(load(), name=f"cache-load:{key}")
+        self._inflight[key] = task
+        return task
+    
+    def invalidate(self, *args: Any):
+        """Drop every entry (accepts and ignores listener arguments)."""
+        self._generation += 1
+        self._entries.clear()
+        self._inflight.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/stale/miss/coalesced counters."""
+        return {
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced
+        }
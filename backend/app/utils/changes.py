@@ -0,0 +1,55 @@
+"""
+Change notifications and persisted version counters for collections
+written by the services.
+"""
+import logging
+import uuid
+from typing import Callable, Dict, List
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from ..core.database import get_database
+
+logger = logging.getLogger(__name__)
+
+ChangeListener = Callable[[str], None]
+
+_listeners: Dict[str, List[ChangeListener]] = {}
+
+
+def on_change(listener: ChangeListener, *collections: str):
+    """Call `listener(collection)` after every write to one of `collections` in this process."""
+    for collection in collections:
+        _listeners.setdefault(collection, []).append(listener)
+
+
+async def notify_change(collection: str, db: AsyncIOMotorDatabase = None):
+    """Bump the collection's version and tell this process's listeners it was written to.
+    
+    Versions live in the `change_versions` collection (one document per
+    collection), so every worker and the maintenance scripts share them. The
+    epoch is set when a counter document is created, so a reset counter never
+    repeats old versions.
+    """
+    db = db if db is not None else get_database()
+    try:
+        await db.change_versions.update_one(
+            {"_id": collection},
+            {"$inc": {"version": 1}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error("Could not bump the version of %s: %s", collection, e)
+    
+    for listener in _listeners.get(collection, []):
+        try:
+            listener(collection)
+        except Exception as e:
+            logger.error("Change listener for %s failed: %s", collection, e)
+
+
+async def collection_versions(*collections: str, db: AsyncIOMotorDatabase = None) -> Dict[str, str]:
+    """Current `<epoch>.<version>` of each collection, read in one query ("0" if never written)."""
+    db = db if db is not None else get_database()
+    versions = {collection: "0" for collection in collections}
+    async for doc in db.change_versions.find({"_id": {"$in": list(collections)}}):
+        versions[doc["_id"]] = f"{doc.get('epoch', '')}.{doc.get('version', 0)}"
+    return versions
@@ -0,0 +1,70 @@
+"""
+Conditional GET (ETag / If-None-Match) driven by collection versions.
+"""
+import hashlib
+from typing import Dict, Optional
+from fastapi import Request, Response
+from .changes import collection_versions
+from ..services.sales_rollup_service import business_today
+
+
+def versions_etag(request: Request, versions: Dict[str, str], daily: bool = False) -> str:
+    """Weak ETag over the URL and collection `versions` (and the business day if `daily`)."""
+    parts = [str(request.url.path), str(request.url.query)]
+    if daily:
+        # Same day boundary as the rollup buckets the daily bodies are built from
+        parts.append(business_today().date().isoformat())
+    parts.extend(f"{collection}={version}" for collection, version in sorted(versions.items()))
+    digest = hashlib.sha1("|".join(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an `If-None-Match` header against `etag`."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+async def conditional_response(
+    request: Request,
+    response: Response,
+    *collections: str,
+    daily: bool = False
+) -> Optional[Response]:
+    """
+    Set the ETag for a response built from `collections`.
+    
+    Pass `daily=True` when the body also depends on the current date (rolling
+    windows). Returns a 304 response when the client already has it, after a
+    single lookup of the persisted versions instead of the endpoint's queries;
+    otherwise returns None and the endpoint continues.
+    """
+    return check_not_modified(request, response, await collection_versions(*collections), daily=daily)
+
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    versions: Dict[str, str],
+    daily: bool = False
+) -> Optional[Response]:
+    """`conditional_response` for versions the caller has already read.
+    
+    Use it when the body must be matched to the same versions as the ETag
+    (e.g. a cached payload that is dropped when they move).
+    """
+    etag = versions_etag(request, versions, daily=daily)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,133 @@
+"""
+File responses with HTTP caching and byte-range support.
+"""
+import os
+from typing import Dict, Optional, Tuple
+import aiofiles
+from fastapi import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+ZERO_COPY_EXTENSION = "http.response.zerocopysend"
+
+
+def _parse_range(header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into an inclusive (start, end) pair.
+    
+    Returns None for a syntactically invalid or multi-range header, including a
+    last position before the first (RFC 9110: served as a full response), and
+    raises ValueError for an unsatisfiable range: a first position at or past
+    the end of the file, or an empty suffix.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    
+    start_text, _, end_text = spec.strip().partition("-")
+    start_text, end_text = start_text.strip(), end_text.strip()
+    if not all(text.isdigit() for text in (start_text, end_text) if text) or not (start_text or end_text):
+        return None
+    
+    if not start_text:
+        # Suffix range: the last N bytes
+        length = int(end_text)
+        if length == 0 or file_size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(file_size - length, 0), file_size - 1
+    
+    start = int(start_text)
+    if end_text and int(end_text) < start:
+        return None
+    if start >= file_size:
+        raise ValueError("Unsatisfiable range")
+    end = int(end_text) if end_text else file_size - 1
+    return start, min(end, file_size - 1)
+
+
+class StaticFileResponse(Response):
+    """Sends part or all of a file, via the server's zero-copy extension when offered."""
+    
+    chunk_size = 64 * 1024
+    
+    def __init__(
+        self,
+        path: str,
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+        media_type: Optional[str] = None,
+        offset: int = 0,
+        length: int = 0
+    ):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        headers = dict(headers or {})
+        headers["content-length"] = str(length)
+        super().__init__(content=None, status_code=status_code, headers=headers, media_type=media_type)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        
+        if scope["method"] == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        
+        if ZERO_COPY_EXTENSION in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": ZERO_COPY_EXTENSION,
+                    "file": file.fileno(),
+                    "offset": self.offset,
+                    "count": self.length,
+                    "more_body": False
+                })
+            return
+        
+        async with aiofiles.open(self.path, "rb") as file:
+            await file.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        
+        if remaining > 0:
+            # File shrank underneath us; close the body cleanly
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def cached_file_response(
+    request: Request,
+    path: str,
+    etag: str,
+    cache_control: str,
+    media_type: Optional[str] = None
+) -> Response:
+    """Serve a file with a strong ETag, `304` revalidation and single byte ranges."""
+    headers = {"etag": etag, "cache-control": cache_control, "accept-ranges": "bytes"}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    file_size = os.stat(path).st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, file_size)
+        except ValueError:
+            headers["content-range"] = f"bytes */{file_size}"
+            return Response(status_code=416, headers=headers)
+        
+        if byte_range is not None:
+            start, end = byte_range
+            headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+            return StaticFileResponse(
+                path, status_code=206, headers=headers, media_type=media_type,
+                offset=start, length=end - start + 1
+            )
+    
+    return StaticFileResponse(path, headers=headers, media_type=media_type, length=file_size)
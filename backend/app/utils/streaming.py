@@ -0,0 +1,48 @@
+"""
+Streaming response helpers for large result sets and live updates.
+"""
+import json
+from typing import Any, AsyncIterator, Type
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from ..core.config import settings
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+async def iter_ndjson(cursor: Any, model: Type[BaseModel], batch_size: int = None) -> AsyncIterator[str]:
+    """Serialize a Motor cursor as NDJSON, flushing one chunk per batch."""
+    batch_size = batch_size or settings.stream_batch_size
+    cursor.batch_size(batch_size)
+    
+    lines = []
+    async for document in cursor:
+        lines.append(model(**document).model_dump_json(by_alias=True))
+        if len(lines) >= batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def ndjson_response(cursor: Any, model: Type[BaseModel], batch_size: int = None) -> StreamingResponse:
+    """Build a streaming NDJSON response from a Motor cursor."""
+    return StreamingResponse(iter_ndjson(cursor, model, batch_size), media_type=NDJSON_MEDIA_TYPE)
+
+
+def sse_event(event: str, data: Any = None) -> str:
+    """Format one Server-Sent Events message with a JSON payload."""
+    payload = json.dumps(jsonable_encoder(data), separators=(",", ":"))
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """Build an unbuffered Server-Sent Events response."""
+    return StreamingResponse(
+        events,
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
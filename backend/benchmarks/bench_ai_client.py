@@ -0,0 +1,146 @@
+"""
+Load-test the AI completion client against the local OpenAI stub.
+
+Fires `--requests` completions with `--concurrency` callers and reports
+throughput, latency percentiles, retries and how long the event loop was
+blocked (the largest lateness of a 10 ms ticker). `--legacy` runs the old
+synchronous `openai.OpenAI` call inside the coroutine for comparison.
+
+Starts `benchmarks.openai_stub` in a subprocess unless `--base-url` is given.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_ai_client --requests 500 --concurrency 50
+    python -m benchmarks.bench_ai_client --requests 50 --concurrency 50 --legacy
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from app.core.llm_client import LLMClient
+
+MESSAGES = [{"role": "user", "content": "¿Cómo reduzco el churn?"}]
+
+
+def wait_for_port(host: str, port: int, timeout: float = 15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"stub did not start on {host}:{port}")
+
+
+async def loop_lag_monitor(samples: list, interval: float = 0.01):
+    """Record how late each tick fires; large values mean the loop was blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - expected)
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+async def run(args, base_url: str):
+    if args.legacy:
+        import openai
+        sync_client = openai.OpenAI(api_key="stub", base_url=base_url)
+        
+        async def call():
+            # The pre-async implementation: a blocking call inside a coroutine
+            return sync_client.chat.completions.create(model="stub", messages=MESSAGES).choices[0].message.content
+    else:
+        client = LLMClient(
+            api_key="stub",
+            base_url=base_url,
+            max_connections=args.concurrency,
+            max_concurrency=args.concurrency,
+            timeout=args.timeout,
+            deadline=args.deadline
+        )
+        
+        async def call():
+            return await client.complete(MESSAGES, model="stub")
+    
+    latencies, errors, lag = [], 0, []
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(args.requests):
+        queue.put_nowait(None)
+    
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                await call()
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+    
+    monitor = asyncio.create_task(loop_lag_monitor(lag))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    monitor.cancel()
+    
+    mode = "legacy sync" if args.legacy else "async pooled"
+    print(f"{mode}: {args.requests} requests, concurrency {args.concurrency}, {elapsed:.1f}s")
+    print(f"  throughput {args.requests / elapsed:8.1f} req/s, errors {errors}")
+    if latencies:
+        print(
+            f"  latency p50 {percentile(latencies, 50) * 1000:7.0f} ms | p95 {percentile(latencies, 95) * 1000:7.0f} ms"
+            f" | p99 {percentile(latencies, 99) * 1000:7.0f} ms | max {max(latencies) * 1000:7.0f} ms"
+        )
+    if lag:
+        print(f"  event loop lag median {statistics.median(lag) * 1000:6.1f} ms | max {max(lag) * 1000:7.1f} ms")
+    if not args.legacy:
+        print(f"  client stats {client.stats}")
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--deadline", type=float, default=30)
+    parser.add_argument("--legacy", action="store_true", help="use the blocking synchronous client")
+    parser.add_argument("--base-url", help="existing stub or API endpoint (skips starting the stub)")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+    
+    stub = None
+    base_url = args.base_url
+    if base_url is None:
+        stub = subprocess.Popen([
+            sys.executable, "-m", "benchmarks.openai_stub",
+            "--port", str(args.port),
+            "--latency-ms", str(args.latency_ms),
+            "--error-rate", str(args.error_rate)
+        ])
+        base_url = f"http://127.0.0.1:{args.port}/v1"
+    
+    try:
+        if stub is not None:
+            wait_for_port("127.0.0.1", args.port)
+        asyncio.run(run(args, base_url))
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark knowledge base top-k retrieval.
+
+Compares the legacy scoring (re-normalize the whole matrix per query, as
+`cosine_similarity` does, then a full `argsort`) with a matrix-vector product
+over pre-normalized embeddings plus `argpartition`, and with the IVF
+approximate index (build time, latency and recall against the exact top-k).
+Uses synthetic clustered embeddings, so no model or PDFs are needed.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_retrieval --sizes 10000 100000 300000
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from app.core.vector_search import IVFIndex, exact_search, normalize_rows
+
+
+def make_corpus(size: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Gaussian blobs around random centers, like topical document chunks."""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    return centers[labels] + 0.5 * rng.standard_normal((size, dim)).astype(np.float32)
+
+
+def legacy_search(raw: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """Per-query normalization of the full matrix and a full sort."""
+    matrix = raw / np.linalg.norm(raw, axis=1, keepdims=True)
+    similarities = matrix @ (query / np.linalg.norm(query))
+    return np.argsort(similarities)[-k:][::-1]
+
+
+def timed_ms(fn, queries) -> float:
+    """Median latency in milliseconds over the queries."""
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run(size: int, dim: int, k: int, n_queries: int, probes: int, rng: np.random.Generator):
+    raw = make_corpus(size, dim, clusters=max(16, size // 500), rng=rng)
+    normalized = normalize_rows(raw)
+    queries = raw[rng.choice(size, n_queries, replace=False)] + 0.1 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    normalized_queries = normalize_rows(queries)
+    
+    legacy_ms = timed_ms(lambda q: legacy_search(raw, q, k), queries[: min(n_queries, 20)])
+    exact_ms = timed_ms(lambda q: exact_search(normalized, q, k), normalized_queries)
+    
+    started = time.perf_counter()
+    index = IVFIndex(int(np.sqrt(size)), n_probe=probes).train(normalized)
+    build_s = time.perf_counter() - started
+    ivf_ms = timed_ms(lambda q: index.search(normalized, q, k), normalized_queries)
+    
+    recalls = []
+    for query in normalized_queries:
+        expected = set(exact_search(normalized, query, k)[0].tolist())
+        found = set(index.search(normalized, query, k)[0].tolist())
+        recalls.append(len(expected & found) / k)
+    
+    print(
+        f"{size:>9,} chunks | legacy {legacy_ms:8.2f} ms | exact {exact_ms:7.2f} ms | "
+        f"ivf {ivf_ms:6.2f} ms (build {build_s:5.1f} s, recall@{k} {statistics.mean(recalls):.3f})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--probes", type=int, default=8)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        run(size, args.dim, args.k, args.queries, args.probes, rng)
+
+
+if __name__ == "__main__":
+    main()
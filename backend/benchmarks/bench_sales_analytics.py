@@ -0,0 +1,160 @@
+"""
+Benchmark sales analytics and dashboard metrics latency.
+
+Compares the legacy sequential queries over raw purchases (sales analytics
+and the seven dashboard metric queries) with the rollup-backed
+implementations. Needs a reachable MongoDB
+(`MONGO_URL`); data is written to a throwaway database that is dropped
+afterwards.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_sales_analytics --sizes 100000 1000000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.services.dashboard_service import DashboardService
+from app.services.purchase_service import PurchaseService
+from app.services.sales_rollup_service import SalesRollupService
+
+BENCH_DB = "loyallight_bench"
+PRODUCTS = [f"Producto {i}" for i in range(200)]
+CLIENTS = [str(uuid.uuid4()) for _ in range(5000)]
+
+
+async def seed_catalog(db):
+    """Insert the clients and products the purchases refer to, indexed like the app."""
+    now = datetime.utcnow()
+    await db.clients.drop()
+    await db.clients.create_index("fecha_registro")
+    await db.clients.insert_many([
+        {"_id": client_id, "fecha_registro": now - timedelta(days=random.randint(0, 2 * 365))}
+        for client_id in CLIENTS
+    ])
+    await db.products.drop()
+    await db.products.create_index("stock_actual")
+    await db.products.insert_many([
+        {"_id": str(uuid.uuid4()), "nombre_producto": name, "stock_actual": random.randint(0, 50), "stock_minimo": 10}
+        for name in PRODUCTS
+    ])
+
+
+async def seed(db, size: int, batch_size: int = 10000):
+    """Insert `size` random purchases spread over the last two years."""
+    await db.purchases.drop()
+    await db.purchases.create_index("fecha")
+    now = datetime.utcnow()
+    
+    for offset in range(0, size, batch_size):
+        batch = []
+        for _ in range(min(batch_size, size - offset)):
+            cantidad = random.randint(1, 5)
+            precio = round(random.uniform(1, 200), 2)
+            batch.append({
+                "_id": str(uuid.uuid4()),
+                "producto_comprado": random.choice(PRODUCTS),
+                "cliente_id": random.choice(CLIENTS),
+                "cantidad": cantidad,
+                "precio_unitario": precio,
+                "total": cantidad * precio,
+                "fecha": now - timedelta(minutes=random.randint(0, 2 * 365 * 24 * 60))
+            })
+        await db.purchases.insert_many(batch, ordered=False)
+    
+    await db.sales_daily.drop()
+    await db.sales_daily.create_index([("day", 1), ("product", 1)], unique=True)
+    await SalesRollupService(db).rebuild()
+
+
+async def legacy_sales_analytics(db):
+    """The pre-rollup implementation: four sequential round trips over purchases."""
+    await db.purchases.count_documents({})
+    await db.purchases.aggregate(
+        [{"$group": {"_id": None, "total_revenue": {"$sum": "$total"}}}]
+    ).to_list(length=1)
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    await db.purchases.aggregate([
+        {"$match": {"fecha": {"$gte": month_start}}},
+        {"$group": {"_id": None, "monthly_revenue": {"$sum": "$total"}}}
+    ]).to_list(length=1)
+    await db.purchases.aggregate([
+        {
+            "$group": {
+                "_id": "$producto_comprado",
+                "total_vendido": {"$sum": "$cantidad"},
+                "ingresos": {"$sum": "$total"}
+            }
+        },
+        {"$sort": {"total_vendido": -1}},
+        {"$limit": 10}
+    ]).to_list(length=10)
+
+
+async def legacy_dashboard_metrics(db):
+    """The pre-rollup dashboard metrics: seven sequential round trips."""
+    await db.clients.count_documents({})
+    await db.products.count_documents({})
+    await db.purchases.count_documents({})
+    await db.purchases.aggregate([{"$group": {"_id": None, "total": {"$sum": "$total"}}}]).to_list(length=1)
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    await db.purchases.aggregate([
+        {"$match": {"fecha": {"$gte": month_start}}},
+        {"$group": {"_id": None, "total": {"$sum": "$total"}}}
+    ]).to_list(length=1)
+    await db.clients.count_documents({"fecha_registro": {"$gte": month_start}})
+    await db.products.count_documents({"$expr": {"$lte": ["$stock_actual", "$stock_minimo"]}})
+
+
+async def timed(label: str, func, repeat: int):
+    """Run `func` `repeat` times and print median / worst latency."""
+    await func()  # warm up
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"  {label:<32} median {statistics.median(samples):9.2f} ms   max {max(samples):9.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    client = AsyncIOMotorClient(settings.mongo_url, serverSelectionTimeoutMS=5000)
+    try:
+        await client.admin.command("ping")
+    except Exception as e:
+        client.close()
+        raise SystemExit(f"MongoDB is not reachable at {settings.mongo_url}: {e}")
+    
+    db = client[BENCH_DB]
+    purchase_service = PurchaseService(db)
+    dashboard_service = DashboardService(db)
+    
+    try:
+        await seed_catalog(db)
+        for size in args.sizes:
+            print(f"Seeding {size:,} purchases...")
+            await seed(db, size)
+            print(f"{size:,} purchases:")
+            await timed("legacy get_sales_analytics", lambda: legacy_sales_analytics(db), args.repeat)
+            await timed("get_sales_analytics ($facet)", purchase_service.get_sales_analytics, args.repeat)
+            await timed("legacy get_dashboard_metrics", lambda: legacy_dashboard_metrics(db), args.repeat)
+            await timed("get_dashboard_metrics", dashboard_service.get_dashboard_metrics, args.repeat)
+    finally:
+        await client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Answers `POST /v1/chat/completions` with a canned completion after a
+log-normally distributed delay, and fails a configurable share of requests
+with 429 or 500, so the AI client's throughput, tail latency and retries
+can be exercised offline.
+
+Usage (from the backend directory):
+    python -m benchmarks.openai_stub --port 8001 --latency-ms 800 --error-rate 0.05
+
+Then point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8001/v1.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="OpenAI stub")
+
+# Overridden from the command line
+config = {"latency_ms": 800.0, "sigma": 0.5, "error_rate": 0.0}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """Sleep like a model would, then answer (or fail) in the OpenAI response format."""
+    body = await request.json()
+    await asyncio.sleep(random.lognormvariate(0, config["sigma"]) * config["latency_ms"] / 1000)
+    
+    if random.random() < config["error_rate"]:
+        status = random.choice([429, 500])
+        return JSONResponse(
+            status_code=status,
+            content={"error": {"message": "stub failure", "type": "server_error", "code": status}}
+        )
+    
+    content = "Sugerencia de prueba generada por el stub local."
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"], help="median response delay")
+    parser.add_argument("--sigma", type=float, default=config["sigma"], help="log-normal spread of the delay")
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"], help="share of 429/500 responses")
+    args = parser.parse_args()
+    
+    config.update(latency_ms=args.latency_ms, sigma=args.sigma, error_rate=args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Backfill denormalized fields on existing purchases.
+
+Fills client names and `product_id` references on purchases written
+before those fields existed.
+
+Usage (from the backend directory):
+    python -m scripts.backfill_purchases
+"""
+import asyncio
+
+from app.core.database import db_manager
+from app.services.purchase_service import PurchaseService
+
+
+async def main():
+    await db_manager.connect_to_database()
+    try:
+        service = PurchaseService(db_manager.database)
+        names = await service.backfill_client_names()
+        print(f"Client names: updated {names} purchases")
+        product_ids = await service.backfill_product_ids()
+        print(f"Product IDs: updated {product_ids} purchases")
+    finally:
+        await db_manager.close_database_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,17 @@
+"""
+Build (or refresh) the on-disk AI knowledge index ahead of starting workers.
+
+Usage (from the backend directory):
+    python -m scripts.build_knowledge_index
+"""
+from app.core.ai_service import get_ai_service
+
+
+def main():
+    service = get_ai_service()
+    service.load()
+    print(f"Knowledge index ready with {len(service.knowledge_base)} chunks at {service.index.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Fold old stock movements into daily snapshots.
+
+Usage (from the backend directory):
+    python -m scripts.compact_stock_ledger [--retention-days 90]
+"""
+import argparse
+import asyncio
+
+from app.core.database import db_manager
+from app.services.stock_ledger_service import StockLedgerService
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compact the stock movement ledger.")
+    parser.add_argument("--retention-days", type=int)
+    args = parser.parse_args()
+    
+    await db_manager.connect_to_database()
+    try:
+        compacted = await StockLedgerService(db_manager.database).compact(args.retention_days)
+        print(f"Compacted {compacted} stock movements")
+    finally:
+        await db_manager.close_database_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
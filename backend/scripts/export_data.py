@@ -0,0 +1,73 @@
+"""
+Export purchases, clients or products to CSV, Parquet or Arrow.
+
+Usage (from the backend directory):
+    python -m scripts.export_data purchases --format parquet -o purchases.parquet
+    python -m scripts.export_data purchases --format parquet -o delta.parquet \\
+        --watermark-file .purchases.watermark
+
+With --watermark-file the export only includes documents written (created
+or updated) after the stored watermark, and the file is updated after a
+successful export. Updated rows repeat in later exports; dedupe on `id`.
+--explain prints the query plan instead of exporting (it should be an
+IXSCAN of the `(updated_at, <date>)` index with no SORT stage).
+"""
+import argparse
+import asyncio
+import json
+import os
+from datetime import datetime
+
+from app.core.database import db_manager
+from app.services.export_service import EXPORT_FORMATS, EXPORT_SPECS, ExportService
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Export a collection for BI tools.")
+    parser.add_argument("collection", choices=sorted(EXPORT_SPECS))
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("-o", "--output")
+    parser.add_argument("--start", type=datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.fromisoformat)
+    parser.add_argument("--since", type=datetime.fromisoformat)
+    parser.add_argument("--watermark-file")
+    parser.add_argument("--explain", action="store_true", help="print the query plan and exit")
+    args = parser.parse_args()
+    if not args.output and not args.explain:
+        parser.error("the following arguments are required: -o/--output")
+    
+    since = args.since
+    if args.watermark_file and os.path.exists(args.watermark_file):
+        with open(args.watermark_file) as handle:
+            since = datetime.fromisoformat(handle.read().strip())
+    
+    await db_manager.connect_to_database()
+    try:
+        service = ExportService(db_manager.database)
+        if args.explain:
+            plan = await service.explain_export(args.collection, args.start, args.end, since)
+            print(json.dumps(plan.get("queryPlanner", plan), indent=2, default=str))
+            return
+        
+        watermark = await service.get_watermark(args.collection, args.start, args.end, since)
+        chunks = service.iter_export(
+            args.collection, args.format, start=args.start, end=args.end, since=since, upper=watermark
+        )
+        
+        written = 0
+        with open(args.output, "wb") as output:
+            async for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        
+        if args.watermark_file and watermark is not None:
+            with open(args.watermark_file, "w") as handle:
+                handle.write(watermark.isoformat())
+        
+        print(f"Wrote {written} bytes to {args.output} (watermark: {watermark})")
+    finally:
+        await db_manager.close_database_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
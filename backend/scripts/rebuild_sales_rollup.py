@@ -0,0 +1,23 @@
+"""
+Rebuild the sales_daily rollup from the purchases collection.
+
+Usage (from the backend directory):
+    python -m scripts.rebuild_sales_rollup
+"""
+import asyncio
+
+from app.core.database import db_manager
+from app.services.sales_rollup_service import SalesRollupService
+
+
+async def main():
+    await db_manager.connect_to_database()
+    try:
+        count = await SalesRollupService(db_manager.database).rebuild()
+        print(f"Rebuilt sales_daily with {count} documents")
+    finally:
+        await db_manager.close_database_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
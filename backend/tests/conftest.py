@@ -0,0 +1,39 @@
+"""
+Shared test helpers.
+"""
+import pytest
+
+
+class FakeClock:
+    """Stand-in for `time.monotonic` that only moves when told to."""
+    
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+    
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def motor_db():
+    """An unconnected Motor database, the type scripts pass to service constructors."""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    
+    client = AsyncIOMotorClient("mongodb://127.0.0.1:1", connect=False, serverSelectionTimeoutMS=100)
+    yield client["test"]
+    client.close()
+
+
+@pytest.fixture
+def mock_db():
+    """In-memory stand-in for the Motor database (skips when mongomock-motor is missing)."""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient()["test"]
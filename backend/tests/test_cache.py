@@ -0,0 +1,108 @@
+"""
+Tests for the in-process caches.
+"""
+import asyncio
+
+import app.utils.cache as cache_module
+from app.utils.cache import LRUCache, SingleFlightCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_expires_entries_after_ttl(monkeypatch, clock):
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    cache = LRUCache(maxsize=10, ttl_seconds=5)
+    cache.set("default", "x")
+    cache.set("custom", "y", ttl_seconds=20)
+    
+    clock.advance(4.9)
+    assert cache.get("default") == "x"
+    clock.advance(0.1)
+    assert cache.get("default") is None
+    assert cache.get("custom") == "y"
+    assert len(cache) == 1
+    
+    clock.advance(15)
+    assert cache.get("custom", "gone") == "gone"
+    assert cache.stats()["misses"] == 2
+
+
+def test_single_flight_coalesces_concurrent_loads():
+    calls = 0
+    
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+    
+    async def scenario():
+        cache = SingleFlightCache(ttl_seconds=60)
+        results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(5)))
+        cached = await cache.get_or_load("k", loader)
+        return cache, results, cached
+    
+    cache, results, cached = asyncio.run(scenario())
+    assert calls == 1
+    assert [value for value, _ in results] == ["value"] * 5
+    assert sorted(state for _, state in results) == ["coalesced"] * 4 + ["miss"]
+    assert cached == ("value", "hit")
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_single_flight_invalidate_discards_inflight_result():
+    release = None
+    calls = 0
+    
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return calls
+    
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        cache = SingleFlightCache(ttl_seconds=60)
+        first = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        cache.invalidate("purchases")
+        release.set()
+        old = await first
+        fresh = await cache.get_or_load("k", loader)
+        return old, fresh
+    
+    old, fresh = asyncio.run(scenario())
+    # The load started before invalidation is returned to its caller but not stored
+    assert old == (1, "miss")
+    assert fresh == (2, "miss")
+
+
+def test_single_flight_serves_stale_while_refreshing(monkeypatch, clock):
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    values = iter(["old", "new"])
+    
+    async def loader():
+        return next(values)
+    
+    async def scenario():
+        cache = SingleFlightCache(ttl_seconds=10, stale_seconds=10)
+        first = await cache.get_or_load("k", loader)
+        clock.advance(15)
+        stale = await cache.get_or_load("k", loader)
+        await asyncio.sleep(0)
+        refreshed = await cache.get_or_load("k", loader)
+        return first, stale, refreshed
+    
+    assert asyncio.run(scenario()) == (("old", "miss"), ("old", "stale"), ("new", "hit"))
@@ -0,0 +1,41 @@
+"""
+Tests for conditional (ETag) request handling.
+"""
+import asyncio
+
+from app.utils.changes import collection_versions, notify_change
+from app.utils.conditional import etag_matches
+
+ETAG = 'W/"abc123"'
+
+
+def test_missing_header_never_matches():
+    assert not etag_matches(None, ETAG)
+    assert not etag_matches("", ETAG)
+
+
+def test_star_matches_anything():
+    assert etag_matches("*", ETAG)
+
+
+def test_weak_comparison_ignores_w_prefix():
+    assert etag_matches('W/"abc123"', ETAG)
+    assert etag_matches('"abc123"', ETAG)
+    assert etag_matches('W/"abc123"', '"abc123"')
+
+
+def test_matches_any_listed_tag():
+    assert etag_matches('"other", W/"abc123"', ETAG)
+    assert not etag_matches('"other", W/"abc124"', ETAG)
+
+
+def test_versions_are_persisted_and_shared(mock_db):
+    async def scenario():
+        before = await collection_versions("purchases", "clients", db=mock_db)
+        await notify_change("purchases", mock_db)
+        await notify_change("purchases", mock_db)
+        return before, await collection_versions("purchases", "clients", db=mock_db)
+    
+    before, after = asyncio.run(scenario())
+    assert before == {"purchases": "0", "clients": "0"}
+    assert after["purchases"].endswith(".2") and after["clients"] == "0"
@@ -0,0 +1,58 @@
+"""
+Tests for the cached complete dashboard payload.
+"""
+import asyncio
+
+from app.services.dashboard_service import DashboardService
+from app.utils.changes import notify_change
+
+
+def counting_service(db) -> DashboardService:
+    service = DashboardService(db)
+    service.loads = 0
+    
+    async def compute(timings=None):
+        service.loads += 1
+        await asyncio.sleep(0.01)
+        return f"payload-{service.loads}"
+    
+    service.get_complete_dashboard_data = compute
+    return service
+
+
+def test_concurrent_requests_share_one_computation(mock_db):
+    service = counting_service(mock_db)
+    
+    async def scenario():
+        return await asyncio.gather(*(service.get_cached_dashboard_data() for _ in range(5)))
+    
+    results = asyncio.run(scenario())
+    assert service.loads == 1
+    assert {data for data, _, _ in results} == {"payload-1"}
+
+
+def test_writes_invalidate_the_cached_payload(mock_db):
+    service = counting_service(mock_db)
+    
+    async def scenario():
+        first, _, _ = await service.get_cached_dashboard_data()
+        cached, _, state = await service.get_cached_dashboard_data()
+        await notify_change("purchases", mock_db)
+        fresh, _, _ = await service.get_cached_dashboard_data()
+        return first, cached, state, fresh
+    
+    assert asyncio.run(scenario()) == ("payload-1", "payload-1", "hit", "payload-2")
+
+
+def test_moved_versions_drop_the_cached_payload(mock_db):
+    service = counting_service(mock_db)
+    
+    async def scenario():
+        seen = []
+        for versions in ({"purchases": "a.1"}, {"purchases": "a.1"}, {"purchases": "a.2"}):
+            data, _, _ = await service.get_cached_dashboard_data(versions)
+            seen.append(data)
+        return seen
+    
+    # The version moved without a local write, e.g. through another worker
+    assert asyncio.run(scenario()) == ["payload-1", "payload-1", "payload-2"]
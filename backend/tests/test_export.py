@@ -0,0 +1,75 @@
+"""
+Tests for columnar exports.
+"""
+import asyncio
+import csv
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.export_service import ExportService
+
+
+async def seed(db):
+    now = datetime.utcnow()
+    await db.purchases.insert_many([
+        {
+            "_id": f"p{i}",
+            "fecha": now - timedelta(days=i),
+            "cliente_id": "c1",
+            "producto_comprado": "Lámpara",
+            "cantidad": 1,
+            "precio_unitario": 10.0,
+            "total": 10.0,
+            # Written in reverse order of `fecha`; p4 predates `updated_at`
+            "updated_at": now - timedelta(minutes=10 * (4 - i))
+        }
+        for i in range(4)
+    ] + [{"_id": "p4", "fecha": now - timedelta(days=4), "cantidad": 1, "total": 5.0}])
+
+
+async def collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+def test_csv_export_filters_dates_and_orders_by_updated_at(mock_db):
+    service = ExportService(mock_db)
+    
+    async def scenario():
+        await seed(mock_db)
+        start = datetime.utcnow() - timedelta(days=2, hours=1)
+        return await collect(service.iter_export("purchases", "csv", start=start, batch_size=2))
+    
+    rows = list(csv.DictReader(io.StringIO(asyncio.run(scenario()).decode())))
+    assert [row["id"] for row in rows] == ["p0", "p1", "p2"]
+
+
+def test_incremental_pull_resumes_after_the_watermark(mock_db, monkeypatch):
+    monkeypatch.setattr("app.services.export_service.settings.export_watermark_lag_seconds", 0)
+    service = ExportService(mock_db)
+    
+    async def scenario():
+        await seed(mock_db)
+        watermark = await service.get_watermark("purchases")
+        full = await collect(service.iter_export("purchases", "csv", upper=watermark))
+        await mock_db.purchases.update_one({"_id": "p3"}, {"$set": {"total": 12.0, "updated_at": datetime.utcnow()}})
+        delta = await collect(service.iter_export("purchases", "csv", since=watermark))
+        return full, delta
+    
+    full, delta = asyncio.run(scenario())
+    assert [row["id"] for row in csv.DictReader(io.StringIO(full.decode()))] == ["p4", "p0", "p1", "p2", "p3"]
+    assert [row["id"] for row in csv.DictReader(io.StringIO(delta.decode()))] == ["p3"]
+
+
+def test_parquet_export_round_trips(mock_db):
+    pq = pytest.importorskip("pyarrow.parquet")
+    service = ExportService(mock_db)
+    
+    async def scenario():
+        await seed(mock_db)
+        return await collect(service.iter_export("purchases", "parquet", batch_size=2))
+    
+    table = pq.read_table(io.BytesIO(asyncio.run(scenario())))
+    assert table.num_rows == 5
+    assert table.column("total").to_pylist().count(10.0) == 4
@@ -0,0 +1,40 @@
+"""
+Tests for HTTP Range parsing of static file responses.
+"""
+import pytest
+
+from app.utils.file_response import _parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-4", (0, 4)),
+    ("bytes=3-", (3, 9)),
+    ("bytes=3-100", (3, 9)),
+    ("bytes=-4", (6, 9)),
+    ("bytes=-100", (0, 9)),
+    ("bytes=9-9", (9, 9)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert _parse_range(header, 10) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=5-3",
+    "bytes=0-1,4-5",
+    "items=0-4",
+    "bytes=a-4",
+    "bytes=-",
+])
+def test_ignored_ranges_serve_the_full_file(header):
+    assert _parse_range(header, 10) is None
+
+
+@pytest.mark.parametrize("header, file_size", [
+    ("bytes=10-", 10),
+    ("bytes=12-20", 10),
+    ("bytes=-0", 10),
+    ("bytes=-5", 0),
+])
+def test_unsatisfiable_ranges(header, file_size):
+    with pytest.raises(ValueError):
+        _parse_range(header, file_size)
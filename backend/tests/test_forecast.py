@@ -0,0 +1,30 @@
+"""
+Tests for demand forecasting.
+"""
+import numpy as np
+import pytest
+
+from app.services.forecast_service import exponential_smoothing
+
+
+def test_constant_demand_has_no_deviation():
+    result = exponential_smoothing(np.full((1, 30), 3.0), alpha=0.3)
+    assert result["level"][0] == pytest.approx(3.0)
+    assert result["sigma"][0] == pytest.approx(0.0)
+
+
+def test_series_start_at_the_first_sale():
+    series = np.zeros((3, 90))
+    series[0, 60:] = 4.0  # introduced two thirds into the window
+    series[1, :] = 4.0
+    
+    result = exponential_smoothing(series, alpha=0.3)
+    np.testing.assert_allclose(result["level"], [4.0, 4.0, 0.0])
+    np.testing.assert_allclose(result["sigma"], [0.0, 0.0, 0.0], atol=1e-9)
+
+
+def test_single_sale_forecasts_that_day():
+    series = np.zeros((1, 10))
+    series[0, 9] = 5.0
+    result = exponential_smoothing(series, alpha=0.3)
+    assert (result["level"][0], result["sigma"][0]) == (5.0, 0.0)
@@ -0,0 +1,146 @@
+"""
+Tests for Idempotency-Key handling.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.services.idempotency_service import IdempotencyError, IdempotencyService, _fingerprint
+
+
+class Body(BaseModel):
+    name: str
+
+
+class Created(BaseModel):
+    id: str
+    name: str
+
+
+def make_handler(calls: list, delay: float = 0, fail: bool = False):
+    async def handler() -> Created:
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if fail:
+            raise ValueError("boom")
+        return Created(id=f"id-{len(calls)}", name="Ana")
+    return handler
+
+
+def test_completed_key_replays_without_rerunning(mock_db):
+    service = IdempotencyService(mock_db)
+    calls = []
+    
+    async def scenario():
+        first = await service.run("clients", "k1", Body(name="Ana"), make_handler(calls))
+        service.cache.clear()
+        second = await service.run("clients", "k1", Body(name="Ana"), make_handler(calls))
+        return first, second
+    
+    first, second = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert second == first.model_dump(mode="json")
+
+
+def test_reused_key_with_another_body_is_rejected(mock_db):
+    service = IdempotencyService(mock_db)
+    
+    async def scenario():
+        await service.run("clients", "k1", Body(name="Ana"), make_handler([]))
+        await service.run("clients", "k1", Body(name="Eva"), make_handler([]))
+    
+    with pytest.raises(IdempotencyError) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 422
+
+
+def test_pending_key_conflicts_or_mismatches(mock_db):
+    service = IdempotencyService(mock_db)
+    calls = []
+    
+    async def scenario():
+        running = asyncio.create_task(service.run("clients", "k1", Body(name="Ana"), make_handler(calls, delay=0.05)))
+        await asyncio.sleep(0.01)
+        outcomes = []
+        for body in (Body(name="Ana"), Body(name="Eva")):
+            try:
+                await service.run("clients", "k1", body, make_handler(calls))
+            except IdempotencyError as e:
+                outcomes.append(e.status_code)
+        await running
+        return outcomes
+    
+    assert asyncio.run(scenario()) == [409, 422]
+    assert len(calls) == 1
+
+
+def test_expired_lease_is_taken_over(mock_db):
+    service = IdempotencyService(mock_db)
+    calls = []
+    now = datetime.utcnow()
+    
+    async def scenario():
+        # Left behind by a request whose process died mid-handler
+        await mock_db.idempotency_keys.insert_one({
+            "_id": "clients:k1",
+            "fingerprint": _fingerprint(Body(name="Ana")),
+            "status": "pending",
+            "lock": "dead",
+            "locked_until": now - timedelta(seconds=1),
+            "expires_at": now + timedelta(days=1)
+        })
+        result = await service.run("clients", "k1", Body(name="Ana"), make_handler(calls))
+        return result, await mock_db.idempotency_keys.find_one({"_id": "clients:k1"})
+    
+    result, record = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert record["status"] == "completed"
+    assert record["response"] == result.model_dump(mode="json")
+
+
+def test_failed_handler_releases_the_key(mock_db):
+    service = IdempotencyService(mock_db)
+    calls = []
+    
+    async def scenario():
+        with pytest.raises(ValueError):
+            await service.run("clients", "k1", Body(name="Ana"), make_handler(calls, fail=True))
+        return await service.run("clients", "k1", Body(name="Ana"), make_handler(calls))
+    
+    assert asyncio.run(scenario()).id == "id-2"
+
+
+def test_failed_completion_write_keeps_the_key(mock_db, monkeypatch):
+    service = IdempotencyService(mock_db)
+    
+    async def failing_complete(record_id, lock, response):
+        raise RuntimeError("write lost")
+    
+    async def scenario():
+        monkeypatch.setattr(service, "_complete", failing_complete)
+        with pytest.raises(RuntimeError):
+            await service.run("clients", "k1", Body(name="Ana"), make_handler([]))
+        return await mock_db.idempotency_keys.find_one({"_id": "clients:k1"})
+    
+    # The purchase/client exists now, so a retry must not be allowed to create it again
+    assert asyncio.run(scenario())["status"] == "pending"
+
+
+def test_running_request_renews_its_lease(mock_db, monkeypatch):
+    monkeypatch.setattr(settings, "idempotency_lock_seconds", 0.15)
+    service = IdempotencyService(mock_db)
+    calls = []
+    
+    async def scenario():
+        running = asyncio.create_task(service.run("clients", "k1", Body(name="Ana"), make_handler(calls, delay=0.4)))
+        await asyncio.sleep(0.3)
+        with pytest.raises(IdempotencyError) as error:
+            await service.run("clients", "k1", Body(name="Ana"), make_handler(calls))
+        await running
+        return error.value.status_code
+    
+    assert asyncio.run(scenario()) == 409
+    assert len(calls) == 1
@@ -0,0 +1,36 @@
+"""
+Tests for knowledge base chunking.
+"""
+import pytest
+
+from app.core.pdf_ingest import chunk_pages
+
+
+def words(start: int, count: int) -> str:
+    return " ".join(f"word{i}" for i in range(start, start + count))
+
+
+def test_windows_overlap_and_cover_all_words():
+    chunks = chunk_pages([words(0, 1200)], chunk_words=500, overlap_words=50)
+    
+    assert len(chunks) == 3
+    assert [len(chunk["text"].split()) for chunk in chunks] == [500, 500, 300]
+    assert chunks[0]["text"].split()[-50:] == chunks[1]["text"].split()[:50]
+    assert chunks[-1]["text"].split()[-1] == "word1199"
+
+
+def test_chunks_record_start_and_end_pages():
+    chunks = chunk_pages([words(0, 300), words(300, 300), words(600, 300)], chunk_words=500, overlap_words=100)
+    
+    assert [(chunk["page"], chunk["page_end"]) for chunk in chunks] == [(1, 2), (2, 3)]
+
+
+def test_short_chunks_are_dropped():
+    assert chunk_pages(["too short"], chunk_words=500, overlap_words=50) == []
+    assert chunk_pages([], chunk_words=500, overlap_words=50) == []
+
+
+@pytest.mark.parametrize("chunk_words, overlap_words", [(50, 60), (50, 50), (0, 0), (50, -1)])
+def test_rejects_windows_that_do_not_advance(chunk_words, overlap_words):
+    with pytest.raises(ValueError):
+        chunk_pages([words(0, 1200)], chunk_words=chunk_words, overlap_words=overlap_words)
@@ -0,0 +1,25 @@
+"""
+Tests for the client names denormalized onto purchases.
+"""
+import asyncio
+
+from app.services.purchase_service import PurchaseService
+
+
+def test_stale_name_sync_does_not_overwrite_a_newer_one(mock_db):
+    service = PurchaseService(mock_db)
+    
+    async def scenario():
+        await mock_db.purchases.insert_many([
+            {"_id": "a", "cliente_id": "c1", "cliente_nombre": "Ana", "cliente_nombre_version": 0},
+            # Written before names were versioned
+            {"_id": "b", "cliente_id": "c1", "cliente_nombre": "Ana"},
+            {"_id": "c", "cliente_id": "c2", "cliente_nombre": "Eva"}
+        ])
+        # Two quick renames whose background syncs finish out of order
+        newer = await service.sync_client_names("c1", "Anabel", "Ruiz", 2)
+        stale = await service.sync_client_names("c1", "Ana María", "Ruiz", 1)
+        purchases = await mock_db.purchases.find({}, {"cliente_nombre": 1}).sort("_id", 1).to_list(length=None)
+        return newer, stale, [purchase["cliente_nombre"] for purchase in purchases]
+    
+    assert asyncio.run(scenario()) == (2, 0, ["Anabel", "Anabel", "Eva"])
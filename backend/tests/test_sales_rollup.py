@@ -0,0 +1,50 @@
+"""
+Tests for sales rollup bucketing.
+"""
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import app.services.sales_rollup_service as sales_rollup_service
+from app.services.sales_rollup_service import SalesRollupService, bucket_start, business_day_start, iter_buckets
+
+
+def test_bucket_start():
+    day = datetime(2026, 10, 15)  # Thursday
+    assert bucket_start(day, "day") == day
+    assert bucket_start(day, "week") == datetime(2026, 10, 12)
+    assert bucket_start(day, "month") == datetime(2026, 10, 1)
+
+
+def test_daily_buckets_include_both_ends():
+    buckets = list(iter_buckets(datetime(2026, 10, 13), datetime(2026, 10, 19), "day"))
+    assert buckets[0] == datetime(2026, 10, 13)
+    assert buckets[-1] == datetime(2026, 10, 19)
+    assert len(buckets) == 7
+
+
+def test_weekly_buckets_start_on_monday():
+    buckets = list(iter_buckets(datetime(2026, 9, 20), datetime(2026, 10, 19), "week"))
+    assert buckets[0] == datetime(2026, 9, 14)
+    assert buckets[-1] == datetime(2026, 10, 19)
+    assert all(bucket.weekday() == 0 for bucket in buckets)
+
+
+def test_monthly_buckets_cross_year_end():
+    buckets = list(iter_buckets(datetime(2025, 10, 20), datetime(2026, 10, 19), "month"))
+    assert buckets[0] == datetime(2025, 10, 1)
+    assert datetime(2026, 1, 1) in buckets
+    assert buckets[-1] == datetime(2026, 10, 1)
+    assert len(buckets) == 13
+
+
+def test_service_accepts_an_explicit_database(motor_db):
+    # Motor databases refuse truth-value testing, so `db or ...` would raise here
+    assert SalesRollupService(motor_db).db is motor_db
+
+
+def test_business_day_start_is_the_utc_instant_of_local_midnight(monkeypatch):
+    monkeypatch.setattr(sales_rollup_service, "BUSINESS_TZ", ZoneInfo("America/Mexico_City"))
+    day = datetime(2026, 10, 1)
+    
+    assert business_day_start(day) == datetime(2026, 10, 1, 6)
+    assert sales_rollup_service.business_day(business_day_start(day)) == day
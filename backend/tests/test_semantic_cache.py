@@ -0,0 +1,53 @@
+"""
+Tests for the embedding-similarity AI response cache.
+"""
+import numpy as np
+
+import app.core.semantic_cache as semantic_cache_module
+from app.core.semantic_cache import SemanticCache
+
+
+def unit(*values: float) -> np.ndarray:
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_hit_requires_prompt_and_context_similarity():
+    cache = SemanticCache(dim=2, capacity=4, threshold=0.95)
+    cache.add(unit(1, 0), unit(0, 1), "answer")
+    
+    response, similarity = cache.lookup(unit(1, 0.1), unit(0, 1))
+    assert response == "answer"
+    assert similarity >= 0.95
+    assert cache.lookup(unit(1, 0), unit(1, 0)) is None
+    assert cache.lookup(unit(0, 1), unit(0, 1)) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_full_cache_evicts_least_recently_used():
+    cache = SemanticCache(dim=3, capacity=2, threshold=0.99)
+    context = unit(0, 0, 1)
+    cache.add(unit(1, 0, 0), context, "first")
+    cache.add(unit(0, 1, 0), context, "second")
+    assert cache.lookup(unit(1, 0, 0), context)[0] == "first"
+    
+    cache.add(unit(1, 1, 0), context, "third")
+    assert cache.lookup(unit(0, 1, 0), context) is None
+    assert cache.lookup(unit(1, 0, 0), context)[0] == "first"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_ignored_and_reused(monkeypatch, clock):
+    monkeypatch.setattr(semantic_cache_module.time, "monotonic", clock)
+    cache = SemanticCache(dim=2, capacity=2, threshold=0.99, ttl_seconds=60)
+    cache.add(unit(1, 0), unit(1, 0), "old")
+    clock.advance(30)
+    cache.add(unit(0, 1), unit(0, 1), "kept")
+    
+    clock.advance(31)
+    assert cache.lookup(unit(1, 0), unit(1, 0)) is None
+    assert cache.stats()["size"] == 1
+    
+    cache.add(unit(1, 1), unit(1, 1), "new")
+    assert cache.stats()["evictions"] == 0
+    assert cache.lookup(unit(0, 1), unit(0, 1))[0] == "kept"
@@ -0,0 +1,87 @@
+"""
+Tests for the stock movement ledger.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.stock_ledger_service import StockLedgerService, stock_transition
+
+
+@pytest.mark.parametrize("before, after, expected", [
+    (5, 0, "out_of_stock"),
+    (5, -2, "out_of_stock"),
+    (20, 10, "low_stock"),
+    (20, 5, "low_stock"),
+    (8, 15, "recovered"),
+    (0, 11, "recovered"),
+    (20, 15, None),
+    (8, 4, None),
+    (0, 5, None),
+    (0, -1, None),
+])
+def test_stock_transition(before, after, expected):
+    assert stock_transition(before, after, minimum=10) == expected
+
+
+def seed_product(db, stock: int = 10):
+    return db.products.insert_one({
+        "_id": "p1",
+        "nombre_producto": "Lámpara",
+        "stock_actual": stock,
+        "stock_minimo": 2,
+        "ledger_seq": 0
+    })
+
+
+def test_record_rejects_decrements_below_zero(mock_db):
+    ledger = StockLedgerService(mock_db)
+    
+    async def scenario():
+        await seed_product(mock_db, stock=3)
+        movement = await ledger.record("p1", -3, "sale", reference="a")
+        with pytest.raises(ValueError):
+            await ledger.record("p1", -1, "sale", reference="b")
+        missing = await ledger.record("nope", -1, "sale")
+        product = await mock_db.products.find_one({"_id": "p1"})
+        return movement, missing, product
+    
+    movement, missing, product = asyncio.run(scenario())
+    assert (movement.seq, movement.balance) == (1, 0)
+    assert missing is None
+    assert (product["stock_actual"], product["ledger_seq"]) == (0, 1)
+
+
+def test_compaction_folds_old_days_and_keeps_velocity(mock_db):
+    ledger = StockLedgerService(mock_db)
+    old = datetime.utcnow() - timedelta(days=5)
+    
+    async def scenario():
+        await mock_db.stock_snapshots.create_index([("product_id", 1), ("day", 1)], unique=True)
+        await seed_product(mock_db, stock=20)
+        for delta, kind in ((-2, "sale"), (5, "restock"), (-1, "sale"), (-4, "sale")):
+            await ledger.record("p1", delta, kind)
+        # The first three movements happened five days ago
+        await mock_db.stock_movements.update_many({"seq": {"$lte": 3}}, {"$set": {"at": old}})
+        before = await ledger.get_velocity("p1", days=30)
+        old_movements = await mock_db.stock_movements.find({"seq": {"$lte": 3}}).to_list(length=None)
+        
+        compacted = await ledger.compact(retention_days=2)
+        after = await ledger.get_velocity("p1", days=30)
+        
+        # A run that died between the snapshot upsert and the delete leaves both behind
+        await mock_db.stock_movements.insert_many(old_movements)
+        interrupted = await ledger.get_velocity("p1", days=30)
+        rerun = await ledger.compact(retention_days=2)
+        snapshots = await mock_db.stock_snapshots.find().to_list(length=None)
+        reconciliation = await ledger.reconcile("p1")
+        return before, compacted, after, interrupted, rerun, snapshots, reconciliation
+    
+    before, compacted, after, interrupted, rerun, snapshots, reconciliation = asyncio.run(scenario())
+    assert compacted == 3 and rerun == 3
+    assert (before.unidades_vendidas, before.unidades_repuestas) == (7, 5)
+    assert after == before and interrupted == before
+    assert len(snapshots) == 1
+    assert (snapshots[0]["vendidas"], snapshots[0]["movimientos"], snapshots[0]["last_seq"]) == (3, 3, 3)
+    assert reconciliation.consistent and reconciliation.missing_movements == 0
@@ -18,8 +18,34 @@ const Dashboard = () => {
 
   useEffect(() => {
     loadDashboardData();
+    return dashboardAPI.subscribe(applyDashboardEvent);
   }, []);
 
+  // Apply live updates pushed by the backend instead of polling
+  const applyDashboardEvent = (event, data) => {
+    if (event === 'resync') {
+      loadDashboardData();
+      return;
+    }
+    setDashboardData((current) => {
+      if (!current) return current;
+      switch (event) {
+        case 'snapshot':
+          return { ...current, metrics: data.metrics, alerts: data.alerts };
+        case 'metrics':
+          return { ...current, metrics: { ...current.metrics, ...data } };
+        case 'alerts': {
+          // Changed alerts arrive in `upserted` too, so replace by id
+          const replaced = new Set([...data.removed, ...data.upserted.map((alert) => alert.id)]);
+          const kept = (current.alerts || []).filter((alert) => !replaced.has(alert.id));
+          return { ...current, alerts: [...kept, ...data.upserted] };
+        }
+        default:
+          return current;
+      }
+    });
+  };
+
   const loadDashboardData = async () => {
     try {
       const response = await dashboardAPI.getCompleteData();
@@ -93,6 +93,69 @@ export const dashboardAPI = {
   getAlerts: () => api.get('/dashboard/alerts'),
   getSalesChart: () => api.get('/dashboard/sales-chart'),
   getCompleteData: () => api.get('/dashboard'),
+  // Server-Sent Events read through fetch so the bearer token can be sent.
+  // Calls onEvent(event, data) per message and reconnects with backoff when the
+  // stream fails or ends (the server starts every connection with a snapshot).
+  // Returns a function that closes the stream.
+  subscribe: (onEvent) => {
+    let controller = null;
+    let retryTimer = null;
+    let closed = false;
+    let attempt = 0;
+
+    const scheduleReconnect = () => {
+      if (closed) return;
+      const delay = Math.min(30000, 1000 * 2 ** attempt) * (0.5 + Math.random() / 2);
+      attempt += 1;
+      retryTimer = setTimeout(connect, delay);
+    };
+
+    const connect = () => {
+      controller = new AbortController();
+      const token = localStorage.getItem('token');
+      fetch(`${API_BASE_URL}/dashboard/stream`, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+        signal: controller.signal,
+      })
+        .then(async (response) => {
+          if (!response.ok) {
+            // Not signed in (any more): reconnecting won't help
+            if (response.status === 401 || response.status === 403) {
+              closed = true;
+            }
+            throw new Error(`Dashboard stream failed with status ${response.status}`);
+          }
+          const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+          let buffer = '';
+          for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            attempt = 0;
+            buffer += value;
+            const messages = buffer.split('\n\n');
+            buffer = messages.pop();
+            messages.forEach((message) => {
+              const event = message.match(/^event: (.*)$/m);
+              const data = message.match(/^data: (.*)$/m);
+              if (event && data) onEvent(event[1], JSON.parse(data[1]));
+            });
+          }
+          scheduleReconnect();
+        })
+        .catch((error) => {
+          if (error.name === 'AbortError') return;
+          console.error('Dashboard stream error:', error);
+          scheduleReconnect();
+        });
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (controller) controller.abort();
+    };
+  },
 };
 
 // AI API